@@ -1,8 +1,12 @@
+import time
 import tkinter as tk
 import tkinter.filedialog as tkFileDialog
 import tkinter.messagebox as tkMessageBox
+from collections import deque
 from pathlib import Path
 
+from romlibrary import RomLibrary
+
 CHIP8_KEY_GRID = [
     ["1", "2", "3", "C"],
     ["4", "5", "6", "D"],
@@ -29,11 +33,30 @@ DEFAULT_KEY_MAPPING = {
     "v": 0xF
 }
 
-ROM_LIBRARY_ROOT = Path("ROMs")
+DISPLAY_WIDTH = 64
+DISPLAY_HEIGHT = 32
+PIXEL_COLORS = ("#000000", "#FFFFFF")
+FRAME_STATS_INTERVAL = 0.5
+LIBRARY_SCAN_SLICE = 0.02
+SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0)
+FAST_FORWARD_KEY = "Tab"
+# Key auto-repeat sends release/press pairs while a key is held; a release only
+# counts if no press follows within this many milliseconds.
+KEY_RELEASE_DEBOUNCE_MS = 40
+QUIRK_PROFILE_LABELS = {
+    "auto": "Auto (per ROM)",
+    "vip": "COSMAC VIP",
+    "chip48": "CHIP-48",
+    "schip": "SUPER-CHIP",
+    "modern": "Modern",
+}
 
 
 class GUI(tk.Frame):
-    def __init__(self, chip8, master=None, scale=10, on_rom_loaded=None, on_reset=None):
+    def __init__(self, chip8, master=None, scale=10, on_rom_loaded=None, on_reset=None, on_save_state=None, on_load_state=None, on_rewind=None,
+                 on_profiler_toggled=None, on_export_profile=None, on_key_event=None, on_speed_changed=None, on_uncapped_toggled=None,
+                 on_fast_forward=None, on_timing_changed=None, on_quirks_changed=None, on_remember_quirks=None,
+                 on_start_recording=None, on_stop_recording=None, on_latency_report=None, timing="fixed", quirks="auto"):
         if master is None:
             master = tk.Tk()
         tk.Frame.__init__(self, master)
@@ -41,9 +64,51 @@ class GUI(tk.Frame):
         self.scale = scale
         self.on_rom_loaded = on_rom_loaded
         self.on_reset = on_reset
+        self.on_save_state = on_save_state
+        self.on_load_state = on_load_state
+        self.on_rewind = on_rewind
+        self.on_profiler_toggled = on_profiler_toggled
+        self.on_export_profile = on_export_profile
+        self.on_key_event = on_key_event
+        self.on_speed_changed = on_speed_changed
+        self.on_uncapped_toggled = on_uncapped_toggled
+        self.on_fast_forward = on_fast_forward
+        self.on_timing_changed = on_timing_changed
+        self.on_quirks_changed = on_quirks_changed
+        self.on_remember_quirks = on_remember_quirks
+        self.on_start_recording = on_start_recording
+        self.on_stop_recording = on_stop_recording
+        self.on_latency_report = on_latency_report
         self.canvas = None
+        self.screen_image = None
+        self.screen_item = None
+        self.screen_size = (DISPLAY_WIDTH, DISPLAY_HEIGHT)
+        self.pixel_size = scale
+        self.last_rows = None
+        self.frame_times = deque(maxlen=120)
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+        self.show_frame_stats = tk.BooleanVar(master, value=False)
+        self.frame_stats_label = None
+        self.show_profiler = tk.BooleanVar(master, value=False)
+        self.profiler_label = None
+        self.speed = tk.DoubleVar(master, value=1.0)
+        self.uncapped = tk.BooleanVar(master, value=False)
+        self.vip_timing = tk.BooleanVar(master, value=timing == "vip")
+        self.quirk_profile = tk.StringVar(master, value=quirks)
+        self.fast_forwarding = False
+        self.fast_forward_release = None
+        self.last_stats_refresh = 0.0
         self.menu = None
+        self.file_menu = None
+        self.record_menu_index = None
+        self.recording = False
         self.library_menu = None
+        self.library = RomLibrary()
+        self.library_categories = None
+        self.library_submenus = {}
+        self.current_rom_path = None
+        self.notes_window = None
         self.help_menu = None
         self.controls_menu = None
         self.controls_window = None
@@ -57,30 +122,74 @@ class GUI(tk.Frame):
         self.createWidgets()
         self.bind_all("<KeyPress>", self.handle_key_press)
         self.bind_all("<KeyRelease>", self.handle_key_release)
+        # Hotkeys go on the main window's binding tag, so they stay out of the keymap editor and dialogs.
+        window = self.winfo_toplevel()
+        window.bind("<F5>", lambda event: self.save_state())
+        window.bind("<F9>", lambda event: self.load_state())
+        window.bind("<BackSpace>", lambda event: self.rewind())
+        # Tk's default <Tab> binding moves the focus; holding it fast-forwards here instead.
+        window.bind(f"<KeyPress-{FAST_FORWARD_KEY}>", self.press_fast_forward)
+        window.bind(f"<KeyRelease-{FAST_FORWARD_KEY}>", self.release_fast_forward)
 
     def createWidgets(self):
-        width = 64 * self.scale
-        height = 32 * self.scale
+        width = DISPLAY_WIDTH * self.scale
+        height = DISPLAY_HEIGHT * self.scale
         self.canvas = tk.Canvas(self, width=width, height=height, bg="#1A1A1A", highlightthickness=0)
         self.canvas.pack(side="top")
+        self.screen_image = tk.PhotoImage(width=width, height=height)
+        self.screen_image.put(PIXEL_COLORS[0], to=(0, 0, width, height))
+        self.screen_item = self.canvas.create_image(0, 0, image=self.screen_image, anchor="nw")
+        self.frame_stats_label = tk.Label(self, anchor="w", font=("Courier New", 9))
+        self.profiler_label = tk.Label(self, anchor="w", justify="left", font=("Courier New", 9))
 
         self.menu = tk.Menu(self.master)
         file_menu = tk.Menu(self.menu, tearoff=0)
         file_menu.add_command(label="Open ROM...", command=self.openFile)
         file_menu.add_command(label="Reload ROM", command=self.saveFile)
+        file_menu.add_command(label="Save State", accelerator="F5", command=self.save_state)
+        file_menu.add_command(label="Load State", accelerator="F9", command=self.load_state)
+        file_menu.add_command(label="Rewind", accelerator="Backspace", command=self.rewind)
+        file_menu.add_separator()
+        file_menu.add_command(label="Record Video...", command=self.toggle_recording)
+        self.record_menu_index = file_menu.index("end")
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.quit)
         self.menu.add_cascade(label="File", menu=file_menu)
+        self.file_menu = file_menu
         self.library_menu = tk.Menu(self.menu, tearoff=0)
         self.menu.add_cascade(label="Library", menu=self.library_menu)
         self.controls_menu = tk.Menu(self.menu, tearoff=0)
         self.controls_menu.add_command(label="Remap Keys...", command=self.open_keymap_editor)
         self.controls_menu.add_command(label="Restore Default Keys", command=self.reset_key_mapping)
         self.menu.add_cascade(label="Controls", menu=self.controls_menu)
+        view_menu = tk.Menu(self.menu, tearoff=0)
+        view_menu.add_checkbutton(label="Show Frame Stats", variable=self.show_frame_stats, command=self.toggle_frame_stats)
+        view_menu.add_checkbutton(label="Profiler Overlay", variable=self.show_profiler, command=self.toggle_profiler)
+        view_menu.add_command(label="Export Profile...", command=self.export_profile)
+        view_menu.add_command(label="Input Latency...", command=self.show_latency_report,
+                              state=tk.NORMAL if on_latency_report else tk.DISABLED)
+        self.menu.add_cascade(label="View", menu=view_menu)
+        emulation_menu = tk.Menu(self.menu, tearoff=0)
+        speed_menu = tk.Menu(emulation_menu, tearoff=0)
+        for speed in SPEEDS:
+            speed_menu.add_radiobutton(label=f"{speed:g}x", variable=self.speed, value=speed, command=self.change_speed)
+        emulation_menu.add_cascade(label="Speed", menu=speed_menu)
+        emulation_menu.add_checkbutton(label="Uncapped", variable=self.uncapped, command=self.toggle_uncapped)
+        emulation_menu.add_command(label="Fast Forward (hold)", accelerator=FAST_FORWARD_KEY, state=tk.DISABLED)
+        emulation_menu.add_separator()
+        emulation_menu.add_checkbutton(label="COSMAC VIP Timing", variable=self.vip_timing, command=self.toggle_vip_timing)
+        quirks_menu = tk.Menu(emulation_menu, tearoff=0)
+        for profile, label in QUIRK_PROFILE_LABELS.items():
+            quirks_menu.add_radiobutton(label=label, variable=self.quirk_profile, value=profile, command=self.change_quirks)
+        quirks_menu.add_separator()
+        quirks_menu.add_command(label="Remember For This ROM", command=self.remember_quirks)
+        emulation_menu.add_cascade(label="Quirks", menu=quirks_menu)
+        self.menu.add_cascade(label="Emulation", menu=emulation_menu)
         self.help_menu = tk.Menu(self.menu, tearoff=0)
         self.help_menu.add_command(label="Chip-8 Controls", command=self.show_controls_help)
+        self.help_menu.add_command(label="ROM Notes", command=self.show_rom_notes)
         self.menu.add_cascade(label="Help", menu=self.help_menu)
-        self.refresh_library_menu()
+        self.scan_library()
         self.master.config(menu=self.menu)
 
     def openFile(self):
@@ -105,82 +214,270 @@ class GUI(tk.Frame):
         except Exception as exc:
             tkMessageBox.showerror("Reload Failed", str(exc))
 
+    def save_state(self):
+        if not self.on_save_state:
+            return
+        try:
+            self.on_save_state()
+        except Exception as exc:
+            tkMessageBox.showerror("Save State Failed", str(exc))
+
+    def load_state(self):
+        if not self.on_load_state:
+            return
+        try:
+            self.on_load_state()
+        except Exception as exc:
+            tkMessageBox.showerror("Load State Failed", str(exc))
+
+    def rewind(self):
+        if self.on_rewind:
+            self.on_rewind()
+
     def quit(self):
         if tkMessageBox.askokcancel("Quit", "Do you really want to quit?"):
             tk.Frame.quit(self)
 
-    def draw_rect(self, x, y, width, height, fill="white"):
-        self.canvas.create_rectangle(x, y, x + width, y + height, fill=fill, outline="", tags="pixel")
+    def resize_screen(self, width, height):
+        """Swap in a screen image for a new display mode, keeping the canvas the same size.
+
+        Pixels stay square: the largest whole pixel size that fits is used and
+        the image is centred. Only called when the mode actually changes.
+        """
+        canvas_width = DISPLAY_WIDTH * self.scale
+        canvas_height = DISPLAY_HEIGHT * self.scale
+        pixel_size = max(1, min(canvas_width // width, canvas_height // height))
+        image_width = width * pixel_size
+        image_height = height * pixel_size
+        self.screen_image = tk.PhotoImage(width=image_width, height=image_height)
+        self.screen_image.put(PIXEL_COLORS[0], to=(0, 0, image_width, image_height))
+        self.canvas.itemconfig(self.screen_item, image=self.screen_image)
+        self.canvas.coords(self.screen_item, (canvas_width - image_width) // 2, (canvas_height - image_height) // 2)
+        self.screen_size = (width, height)
+        self.pixel_size = pixel_size
+        self.last_rows = None
+
+    def update_canvas(self, display_rows, width=DISPLAY_WIDTH):
+        """Repaint only the pixels that changed since the previous frame.
+
+        ``display_rows`` holds one ``width``-bit int per row, as returned by
+        ``Chip8.frame_rows``. Identical frames are skipped without touching Tk
+        at all.
+        """
+        if (width, len(display_rows)) != self.screen_size:
+            self.resize_screen(width, len(display_rows))
+        last_rows = self.last_rows
+        if last_rows is not None and last_rows == display_rows:
+            self.frames_skipped += 1
+            return
+        started = time.perf_counter()
+        put = self.screen_image.put
+        scale = self.pixel_size
+        for y, row in enumerate(display_rows):
+            changed = row ^ last_rows[y] if last_rows is not None else (1 << width) - 1
+            if not changed:
+                continue
+            top = y * scale
+            x = 0
+            while x < width:
+                shift = width - 1 - x
+                if not (changed >> shift) & 1:
+                    x += 1
+                    continue
+                # Paint a run of changed pixels that share a colour with a single put.
+                value = (row >> shift) & 1
+                end = x + 1
+                while end < width:
+                    shift = width - 1 - end
+                    if not (changed >> shift) & 1 or ((row >> shift) & 1) != value:
+                        break
+                    end += 1
+                put(PIXEL_COLORS[value], to=(x * scale, top, end * scale, top + scale))
+                x = end
+        self.last_rows = display_rows[:]
+        self.frames_drawn += 1
+        self.frame_times.append(time.perf_counter() - started)
+        if self.show_frame_stats.get() and started - self.last_stats_refresh >= FRAME_STATS_INTERVAL:
+            self.refresh_frame_stats()
+            self.last_stats_refresh = started
+
+    def average_frame_time_ms(self):
+        if not self.frame_times:
+            return 0.0
+        return 1000.0 * sum(self.frame_times) / len(self.frame_times)
+
+    def refresh_frame_stats(self):
+        self.frame_stats_label.config(
+            text=f"frame {self.average_frame_time_ms():.3f} ms | drawn {self.frames_drawn} | skipped {self.frames_skipped}"
+        )
+
+    def toggle_frame_stats(self):
+        if self.show_frame_stats.get():
+            self.refresh_frame_stats()
+            self.frame_stats_label.pack(side="top", fill="x")
+        else:
+            self.frame_stats_label.pack_forget()
+
+    def toggle_profiler(self):
+        enabled = self.show_profiler.get()
+        if self.on_profiler_toggled:
+            self.on_profiler_toggled(enabled)
+        if enabled:
+            self.profiler_label.config(text="Profiling...")
+            self.profiler_label.pack(side="top", fill="x")
+        else:
+            self.profiler_label.pack_forget()
+
+    def change_speed(self):
+        if self.on_speed_changed:
+            self.on_speed_changed(self.speed.get())
+
+    def toggle_uncapped(self):
+        if self.on_uncapped_toggled:
+            self.on_uncapped_toggled(self.uncapped.get())
+
+    def press_fast_forward(self, event):
+        if self.fast_forward_release is not None:
+            self.after_cancel(self.fast_forward_release)
+            self.fast_forward_release = None
+        if not self.fast_forwarding:
+            self.fast_forwarding = True
+            if self.on_fast_forward:
+                self.on_fast_forward(True)
+        return "break"
+
+    def release_fast_forward(self, event):
+        if self.fast_forward_release is None:
+            self.fast_forward_release = self.after(KEY_RELEASE_DEBOUNCE_MS, self.end_fast_forward)
+        return "break"
+
+    def end_fast_forward(self):
+        self.fast_forward_release = None
+        self.fast_forwarding = False
+        if self.on_fast_forward:
+            self.on_fast_forward(False)
+
+    def toggle_vip_timing(self):
+        if self.on_timing_changed:
+            self.on_timing_changed("vip" if self.vip_timing.get() else "fixed")
+
+    def change_quirks(self):
+        if self.on_quirks_changed:
+            self.on_quirks_changed(self.quirk_profile.get())
+
+    def remember_quirks(self):
+        if not self.on_remember_quirks:
+            return
+        try:
+            profile = self.on_remember_quirks()
+        except Exception as exc:
+            tkMessageBox.showerror("Remember Quirks Failed", str(exc))
+            return
+        tkMessageBox.showinfo("Quirks", f"{QUIRK_PROFILE_LABELS[profile]} quirks will be used for this ROM.")
 
-    def stretch_pixel_array_to_canvas(self, pixel_array):
-        # print(len(pixel_array), len(pixel_array[0]))
-        self.canvas.delete("pixel")
-        for y in range(32):
-            for x in range(64):
-                # print(y, x)
-                color = "white" if pixel_array[y][x] == 1 else "black"
-                self.draw_rect(x * self.scale, y * self.scale, self.scale, self.scale, fill=color)
+    def update_profiler_overlay(self, text):
+        self.profiler_label.config(text=text)
 
-    def update_canvas(self, display):
-        self.stretch_pixel_array_to_canvas(display)
-        self.canvas.update_idletasks()
+    def export_profile(self):
+        if not self.on_export_profile:
+            return
+        filename = tkFileDialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not filename:
+            return
+        try:
+            self.on_export_profile(filename)
+        except Exception as exc:
+            tkMessageBox.showerror("Export Failed", str(exc))
+
+    def show_latency_report(self):
+        if self.on_latency_report:
+            tkMessageBox.showinfo("Input Latency", self.on_latency_report())
+
+    def toggle_recording(self):
+        if self.recording:
+            self.set_recording(False)
+            try:
+                self.on_stop_recording()
+            except Exception as exc:
+                tkMessageBox.showerror("Recording Failed", str(exc))
+            return
+        if not self.on_start_recording:
+            return
+        filename = tkFileDialog.asksaveasfilename(
+            defaultextension=".gif", filetypes=[("Animated GIF", "*.gif"), ("Raw frame stream", "*.c8v")]
+        )
+        if not filename:
+            return
+        try:
+            self.on_start_recording(filename)
+        except Exception as exc:
+            tkMessageBox.showerror("Recording Failed", str(exc))
+            return
+        self.set_recording(True)
+
+    def set_recording(self, recording):
+        self.recording = recording
+        self.file_menu.entryconfig(self.record_menu_index, label="Stop Recording" if recording else "Record Video...")
 
     def update_window_title(self, path):
+        self.current_rom_path = path
         name = Path(path).name
         self.master.title(f"Chip-8 Emulator - {name}")
 
-    def refresh_library_menu(self):
+    def scan_library(self):
+        """Update the library index a slice at a time so startup never waits on a large collection."""
+        finished = self.library.scan(LIBRARY_SCAN_SLICE)
+        if finished or self.library_categories is None:
+            self.refresh_library_menu(scanning=not finished)
+        if not finished:
+            self.after(1, self.scan_library)
+
+    def refresh_library_menu(self, scanning=False):
         if not self.library_menu:
             return
-        self.library_menu.delete(0, tk.END)
-        roms = self.discover_rom_library()
-        if not roms:
-            self.library_menu.add_command(label="No bundled ROMs found", state=tk.DISABLED)
-            self.library_menu.add_separator()
-            self.library_menu.add_command(label="Browse...", command=self.openFile)
+        categories = self.library.categories()
+        if categories == self.library_categories and (categories or not scanning):
             return
-        for category in self.sorted_categories(list(roms.keys())):
+        self.library_categories = categories
+        self.library_menu.delete(0, tk.END)
+        self.library_submenus = {}
+        if not categories:
+            label = "Scanning ROMs..." if scanning else "No bundled ROMs found"
+            self.library_menu.add_command(label=label, state=tk.DISABLED)
+        for category in categories:
+            # Submenus are filled when they are opened, not up front.
             submenu = tk.Menu(self.library_menu, tearoff=0)
-            for display_name, rom_path in roms[category]:
-                submenu.add_command(label=display_name, command=lambda p=rom_path: self.quick_load_rom(p))
+            submenu.configure(postcommand=lambda menu=submenu, name=category: self.fill_library_submenu(menu, name))
             self.library_menu.add_cascade(label=category, menu=submenu)
         self.library_menu.add_separator()
         self.library_menu.add_command(label="Browse...", command=self.openFile)
 
-    def discover_rom_library(self):
-        if not ROM_LIBRARY_ROOT.exists():
-            return {}
-        roms = {}
-        for path in sorted(ROM_LIBRARY_ROOT.rglob("*.ch8")):
-            if not path.is_file():
-                continue
-            category = self.categorize_rom(path)
-            label = path.stem.replace("_", " ").title()
-            roms.setdefault(category, []).append((label, str(path)))
-        for values in roms.values():
-            values.sort(key=lambda item: item[0].lower())
-        return roms
-
-    def categorize_rom(self, path):
-        try:
-            relative = path.relative_to(ROM_LIBRARY_ROOT)
-            if relative.parts and len(relative.parts) > 1:
-                folder = relative.parts[0].replace("_", " ")
-                return folder.title()
-        except ValueError:
-            pass
-        name = path.stem.lower()
-        if any(keyword in name for keyword in ("demo", "logo", "intro")):
-            return "Demos"
-        if any(keyword in name for keyword in ("test", "opcode", "bench")):
-            return "Other"
-        return "Games"
-
-    def sorted_categories(self, categories):
-        preferred = ["Games", "Demos", "Other"]
-        ordered = [category for category in preferred if category in categories]
-        remaining = sorted({category for category in categories if category not in preferred})
-        return ordered + remaining
+    def fill_library_submenu(self, submenu, category):
+        entries = self.library.entries(category)
+        if self.library_submenus.get(category) is entries:
+            return
+        self.library_submenus[category] = entries
+        submenu.delete(0, tk.END)
+        for display_name, rom_path in entries:
+            submenu.add_command(label=display_name, command=lambda p=rom_path: self.quick_load_rom(p))
+
+    def show_rom_notes(self):
+        entry = self.library.lookup(self.current_rom_path) if self.current_rom_path else None
+        if not entry or not entry["notes"]:
+            tkMessageBox.showinfo("ROM Notes", "The current ROM has no notes in the library.")
+            return
+        if self.notes_window and tk.Toplevel.winfo_exists(self.notes_window):
+            self.notes_window.destroy()
+        window = tk.Toplevel(self.master)
+        window.title(f"ROM Notes - {entry['name']}")
+        text = tk.Text(window, width=80, height=24, wrap="word", font=("Courier New", 10))
+        scrollbar = tk.Scrollbar(window, command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        text.insert("1.0", entry["notes"])
+        text.configure(state=tk.DISABLED)
+        scrollbar.pack(side="right", fill="y")
+        text.pack(side="left", fill="both", expand=True)
+        self.notes_window = window
 
     def quick_load_rom(self, path):
         try:
@@ -331,10 +628,14 @@ class GUI(tk.Frame):
         key = event.keysym.lower()
         mapped = self.key_mapping.get(key)
         if mapped is not None:
-            self.chip8.set_key_state(mapped, True)
+            self.chip8.queue_key_event(mapped, True, time.perf_counter())
+            if self.on_key_event:
+                self.on_key_event()
 
     def handle_key_release(self, event):
         key = event.keysym.lower()
         mapped = self.key_mapping.get(key)
         if mapped is not None:
-            self.chip8.set_key_state(mapped, False)
+            self.chip8.queue_key_event(mapped, False, time.perf_counter())
+            if self.on_key_event:
+                self.on_key_event()
@@ -0,0 +1,406 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from chip8emulator import MEMORY_SIZE, PROGRAM_START, QUIRK_PROFILES, VIP_HIRES_ENTRY, VIP_HIRES_SIGNATURE, RomImage
+
+ANALYZER_VERSION = 1
+# Next to the bundled ROMs, wherever the emulator is started from.
+ROMS_DIR = Path(__file__).resolve().parent / "ROMs"
+ANALYSIS_CACHE_DIR = ROMS_DIR / ".analysis"
+# Hand-picked quirk profiles, keyed by ROM SHA-1, for ROMs the analysis cannot place.
+QUIRK_OVERRIDES_PATH = ROMS_DIR / "quirks.json"
+# Cost model for picking an engine: translating a block costs about BLOCK_TRANSLATE_SECONDS once,
+# and each recompiled instruction then saves about INSTRUCTION_SAVING_SECONDS over the
+# interpreter. The recompiler is chosen when it pays for itself within RECOMPILER_PAYBACK_SECONDS
+# of running at the core's clock rate.
+BLOCK_TRANSLATE_SECONDS = 100e-6
+INSTRUCTION_SAVING_SECONDS = 0.5e-6
+RECOMPILER_PAYBACK_SECONDS = 2.0
+
+SCHIP_OPCODES = {
+    0x00FB: "00FB", 0x00FC: "00FC", 0x00FD: "00FD", 0x00FE: "00FE", 0x00FF: "00FF",
+    **{0x00C0 | N: "00CN" for N in range(16)},
+}
+SCHIP_MISC_OPCODES = {0x30: "FX30", 0x75: "FX75", 0x85: "FX85"}
+
+
+def skips(instruction):
+    family = instruction >> 12
+    if family in (0x3, 0x4):
+        return True
+    if family in (0x5, 0x9):
+        return instruction & 0xF == 0
+    return family == 0xE and instruction & 0xFF in (0x9E, 0xA1)
+
+
+def ends_block(instruction):
+    family = instruction >> 12
+    return family in (0x1, 0x2, 0xB) or instruction in (0x00EE, 0x00FD) or skips(instruction)
+
+
+def trace_code(memory, entry=PROGRAM_START):
+    """Follow jumps, calls and skips from ``entry``; return ``(instructions, leaders)``.
+
+    ``instructions`` maps each reachable address to its instruction; block
+    leaders are the entry point, every jump, call and skip target, and the
+    instruction after every call. BNNN targets depend on V0 and are not
+    followed.
+    """
+    instructions = {}
+    leaders = {entry}
+    pending = [entry]
+    while pending:
+        address = pending.pop()
+        while address not in instructions and address + 1 < MEMORY_SIZE:
+            instruction = (memory[address] << 8) | memory[address + 1]
+            instructions[address] = instruction
+            family = instruction >> 12
+            following = address + 2
+            if family == 0x1:
+                leaders.add(instruction & 0xFFF)
+                pending.append(instruction & 0xFFF)
+                break
+            if family == 0x2:
+                leaders.update((instruction & 0xFFF, following))
+                pending.append(instruction & 0xFFF)
+            elif instruction in (0x00EE, 0x00FD) or family == 0xB:
+                break
+            elif skips(instruction):
+                leaders.update((following, following + 2))
+                pending.append(following + 2)
+            address = following
+    return instructions, leaders
+
+
+def build_blocks(instructions, leaders):
+    """Split the reachable code into basic blocks: ``{start: {"end", "length", "successors"}}``."""
+    blocks = {}
+    for start in sorted(leader for leader in leaders if leader in instructions):
+        address = start
+        length = 0
+        while True:
+            instruction = instructions[address]
+            length += 1
+            address += 2
+            if ends_block(instruction) or address in leaders or address not in instructions:
+                break
+        family = instruction >> 12
+        if family == 0x1:
+            successors = [instruction & 0xFFF]
+        elif family == 0x2:
+            successors = [instruction & 0xFFF, address]
+        elif skips(instruction):
+            successors = [address, address + 2]
+        elif family == 0xB or instruction in (0x00EE, 0x00FD):
+            successors = []
+        else:
+            successors = [address] if address in instructions else []
+        blocks[start] = {"end": address, "length": length, "successors": successors}
+    return blocks
+
+
+def known_index(instructions, blocks, address):
+    """The value of I at ``address`` if the same block set it with ANNN, else None."""
+    start = max(block for block in blocks if block <= address)
+    value = None
+    for previous in range(start, address, 2):
+        instruction = instructions.get(previous)
+        if instruction is None:
+            value = None
+        elif instruction >> 12 == 0xA:
+            value = instruction & 0xFFF
+        elif instruction >> 12 == 0xF and instruction & 0xFF in (0x1E, 0x29, 0x30, 0x55, 0x65):
+            value = None
+    return value
+
+
+def find_writes(instructions, blocks):
+    """Split FX33/FX55 into writes that land on reachable code, and writes whose target is unknown."""
+    code = set()
+    for address in instructions:
+        code.update((address, address + 1))
+    self_modifying = []
+    unresolved = []
+    for address, instruction in sorted(instructions.items()):
+        if instruction >> 12 != 0xF or instruction & 0xFF not in (0x33, 0x55):
+            continue
+        size = 3 if instruction & 0xFF == 0x33 else ((instruction >> 8) & 0xF) + 1
+        target = known_index(instructions, blocks, address)
+        if target is None:
+            unresolved.append(address)
+        elif code.intersection(range(target, target + size)):
+            self_modifying.append({"pc": address, "target": target, "size": size})
+    return self_modifying, unresolved
+
+
+def reads_flag(instruction):
+    """Whether an instruction reads VF."""
+    family = instruction >> 12
+    X = (instruction >> 8) & 0xF
+    Y = (instruction >> 4) & 0xF
+    if family in (0x3, 0x4, 0xE):
+        return X == 0xF
+    if family in (0x5, 0x9, 0xD):
+        return 0xF in (X, Y)
+    if family == 0x8:
+        return Y == 0xF or (X == 0xF and instruction & 0xF != 0)
+    if family == 0xF:
+        return X == 0xF and instruction & 0xFF in (0x15, 0x18, 0x1E, 0x29, 0x30, 0x33, 0x55, 0x75)
+    return False
+
+
+def quirk_hints(instructions, blocks):
+    """Behaviours where interpreters disagree that this ROM exercises, as ``{quirk: [addresses]}``.
+
+    These are hints rather than verdicts: they say which quirk settings the
+    ROM could notice, not which ones it expects.
+    """
+    hints = {}
+    reads_vf = False
+    for address, instruction in sorted(instructions.items()):
+        family = instruction >> 12
+        X = (instruction >> 8) & 0xF
+        Y = (instruction >> 4) & 0xF
+        N = instruction & 0xF
+        if family == 0x8 and N in (0x6, 0xE) and X != Y:
+            # The VIP shifts VY into VX; SUPER-CHIP and this core shift VX in place.
+            hints.setdefault("shift", []).append(address)
+        elif family == 0x8 and N in (0x1, 0x2, 0x3):
+            hints.setdefault("vf_reset", []).append(address)
+        elif family == 0xB:
+            hints.setdefault("jump", []).append(address)
+        elif family == 0xF and instruction & 0xFF in (0x55, 0x65):
+            # The VIP leaves I past the last register; a ROM that goes on using I notices.
+            end = blocks[max(block for block in blocks if block <= address)]["end"]
+            for following in range(address + 2, end, 2):
+                after = instructions.get(following, 0)
+                if after >> 12 == 0xA:
+                    break
+                if after >> 12 == 0xD or (after >> 12 == 0xF and after & 0xFF in (0x1E, 0x33, 0x55, 0x65)):
+                    hints.setdefault("load_store", []).append(address)
+                    break
+        reads_vf = reads_vf or reads_flag(instruction)
+    if "vf_reset" in hints and not reads_vf:
+        del hints["vf_reset"]
+    return hints
+
+
+def hires_opcodes(instructions):
+    used = {}
+    for address, instruction in sorted(instructions.items()):
+        name = SCHIP_OPCODES.get(instruction)
+        if name is None and instruction >> 12 == 0xD and instruction & 0xF == 0:
+            name = "DXY0"
+        if name is None and instruction >> 12 == 0xF:
+            name = SCHIP_MISC_OPCODES.get(instruction & 0xFF)
+        if name:
+            used.setdefault(name, []).append(address)
+    return used
+
+
+def recompiler_min_clock_hz(block_count):
+    """Clock rate above which translating ``block_count`` blocks pays off within the payback window."""
+    return round(block_count * BLOCK_TRANSLATE_SECONDS / (INSTRUCTION_SAVING_SECONDS * RECOMPILER_PAYBACK_SECONDS))
+
+
+def choose_engine(analysis, clock_hz):
+    """The faster engine for an analysed ROM at ``clock_hz``; both run every ROM exactly the same."""
+    return "recompiler" if clock_hz >= analysis["recompiler_min_clock_hz"] else "interpreter"
+
+
+# Parsed override files by absolute path, as (mtime_ns, size, overrides); every boot asks for them.
+_quirk_overrides_cache = {}
+
+
+def load_quirk_overrides(path=QUIRK_OVERRIDES_PATH):
+    """``{sha1: {"profile": ..., "rom": ...}}`` for ROMs whose quirk profile was picked by hand.
+
+    The file is parsed again only when its mtime or size changes; treat the result as read-only.
+    """
+    key = os.path.abspath(path)
+    try:
+        stat = os.stat(key)
+    except OSError:
+        _quirk_overrides_cache.pop(key, None)
+        return {}
+    cached = _quirk_overrides_cache.get(key)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    try:
+        with open(key) as f:
+            overrides = json.load(f)
+    except (OSError, ValueError):
+        overrides = {}
+    if not isinstance(overrides, dict):
+        overrides = {}
+    _quirk_overrides_cache[key] = (stat.st_mtime_ns, stat.st_size, overrides)
+    return overrides
+
+
+def save_quirk_override(rom, profile, name="", path=QUIRK_OVERRIDES_PATH):
+    """Pin ``rom`` (its bytes) to a quirk profile, or drop its override when ``profile`` is None."""
+    path = Path(path)
+    overrides = dict(load_quirk_overrides(path))
+    digest = hashlib.sha1(rom).hexdigest()
+    if profile is None:
+        overrides.pop(digest, None)
+    else:
+        overrides[digest] = {"profile": profile, "rom": name}
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "w") as f:
+        json.dump(overrides, f, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+    # A rewrite within the filesystem's timestamp resolution could keep the same mtime and size.
+    _quirk_overrides_cache.pop(os.path.abspath(path), None)
+
+
+def choose_quirks(analysis, overrides=None):
+    """Quirk profile for an analysed ROM.
+
+    A hand-picked override wins. Otherwise SUPER-CHIP opcodes mark a
+    SUPER-CHIP program, and anything else keeps the modern behaviour the
+    core has always had. The VIP hires signature is no guide: most of those
+    programs were written for emulators long after the VIP.
+    """
+    if overrides is None:
+        overrides = load_quirk_overrides()
+    override = overrides.get(analysis["sha1"])
+    if isinstance(override, dict) and override.get("profile") in QUIRK_PROFILES:
+        return override["profile"]
+    if analysis["hires_opcodes"]:
+        return "schip"
+    return "modern"
+
+
+def analyze(rom):
+    """Static analysis of one ROM image, as a JSON-ready dict."""
+    memory = RomImage(rom).boot_image
+    vip_hires = rom[:2] == VIP_HIRES_SIGNATURE
+    # Chip8 stands in for the VIP hires display routine and enters these programs at 0x2C0.
+    instructions, leaders = trace_code(memory, VIP_HIRES_ENTRY if vip_hires else PROGRAM_START)
+    blocks = build_blocks(instructions, leaders)
+    self_modifying, unresolved = find_writes(instructions, blocks)
+    hires = hires_opcodes(instructions)
+    hints = quirk_hints(instructions, blocks)
+    if hires:
+        # SUPER-CHIP clips sprites at the screen edges instead of wrapping them.
+        hints["clip"] = sorted(address for addresses in hires.values() for address in addresses)
+    return {
+        "version": ANALYZER_VERSION,
+        "sha1": hashlib.sha1(rom).hexdigest(),
+        "size": len(rom),
+        "instructions": len(instructions),
+        "blocks": {f"{start:#05x}": {
+            "end": f"{block['end']:#05x}",
+            "length": block["length"],
+            "successors": [f"{successor:#05x}" for successor in block["successors"]],
+        } for start, block in blocks.items()},
+        "vip_hires": vip_hires,
+        "hires_opcodes": {name: [f"{address:#05x}" for address in addresses] for name, addresses in hires.items()},
+        "computed_jumps": [f"{address:#05x}" for address, instruction in sorted(instructions.items()) if instruction >> 12 == 0xB],
+        "self_modifying_writes": [{
+            "pc": f"{write['pc']:#05x}", "target": f"{write['target']:#05x}", "size": write["size"],
+        } for write in self_modifying],
+        "unresolved_writes": [f"{address:#05x}" for address in unresolved],
+        "quirks": {quirk: [f"{address:#05x}" for address in addresses] for quirk, addresses in sorted(hints.items())},
+        "recompiler_min_clock_hz": recompiler_min_clock_hz(len(blocks)),
+    }
+
+
+def cache_path(digest, cache_dir=ANALYSIS_CACHE_DIR):
+    return Path(cache_dir) / f"{digest}.json"
+
+
+def load_analysis(rom, cache_dir=ANALYSIS_CACHE_DIR, force=False):
+    """The analysis for ``rom``, from ``cache_dir`` when it is there and current, else computed and saved."""
+    path = cache_path(hashlib.sha1(rom).hexdigest(), cache_dir)
+    if not force:
+        try:
+            with open(path) as f:
+                analysis = json.load(f)
+            if isinstance(analysis, dict) and analysis.get("version") == ANALYZER_VERSION:
+                return analysis
+        except (OSError, ValueError):
+            pass
+    analysis = analyze(rom)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Workers analysing the same ROM may write at once; each renames its own complete file into place.
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(analysis, indent=1))
+        os.replace(temporary, path)
+    except OSError:
+        # Unwritable cache: the analysis is simply redone next time.
+        pass
+    return analysis
+
+
+def analyze_path(job):
+    """Analyse one ROM file inside a worker process."""
+    rom_path, cache_dir, force = job
+    analysis = load_analysis(Path(rom_path).read_bytes(), cache_dir, force)
+    return str(rom_path), analysis
+
+
+def find_roms(paths):
+    roms = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            roms.extend(sorted(path.rglob("*.ch8")))
+        else:
+            roms.append(path)
+    return roms
+
+
+def describe(analysis):
+    flags = []
+    if analysis["self_modifying_writes"]:
+        flags.append("self-modifying")
+    if analysis["hires_opcodes"] or analysis["vip_hires"]:
+        flags.append("hires")
+    if analysis["computed_jumps"]:
+        flags.append("BNNN")
+    if analysis["quirks"]:
+        flags.append("quirks: " + ",".join(analysis["quirks"]))
+    summary = f"{len(analysis['blocks'])} blocks, recompiler from {analysis['recompiler_min_clock_hz']} Hz"
+    return summary + (f", {'; '.join(flags)}" if flags else "")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Statically analyse Chip-8 ROMs and cache the results for the emulator.")
+    parser.add_argument("paths", nargs="+", help="ROM files or directories to search for *.ch8")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument("--cache", default=str(ANALYSIS_CACHE_DIR), help=f"analysis cache directory (default {ANALYSIS_CACHE_DIR})")
+    parser.add_argument("--force", action="store_true", help="reanalyse ROMs that are already cached")
+    parser.add_argument("--json", action="store_true", help="print the full analyses as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    roms = find_roms(args.paths)
+    if not roms:
+        print("No ROMs found.", file=sys.stderr)
+        return 1
+    started = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for rom_path, analysis in pool.map(analyze_path, [(rom, args.cache, args.force) for rom in roms], chunksize=16):
+            results[rom_path] = analysis
+            if not args.json:
+                print(f"{Path(rom_path).name}: {describe(analysis)}")
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{len(results)} ROMs analysed in {time.perf_counter() - started:.2f}s with {args.workers} workers")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,465 @@
+import argparse
+import hashlib
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from chip8emulator import (
+    BIG_FONT_ADDRESS, BOOT_RAM, DISPLAY_HEIGHT, DISPLAY_WIDTH, DISPLAY_WORDS, MEMORY_SIZE, NO_WAITING_REGISTER,
+    PROGRAM_START, ROW_MASK, RPL_FLAG_COUNT, SPRITE_SHIFT, STATE_HEADER, STATE_MAGIC, STATE_VERSION, VIP_HIRES_ENTRY, VIP_HIRES_HEIGHT,
+    VIP_HIRES_SIGNATURE, Chip8,
+)
+from imaging import frame_bytes
+
+ROW_BITS = np.uint64(ROW_MASK)
+NO_WAITING = -1
+
+
+class BatchChip8:
+    """Runs many instances of one ROM in lockstep with NumPy arrays.
+
+    Instance ``i`` behaves exactly like ``Chip8(seed=seeds[i])`` with the
+    ROM loaded: same frames, same timers, same CXNN draws. ``state(i)``
+    returns the same bytes as that machine's ``save_state()``. Every step
+    fetches one instruction for every runnable instance, groups the
+    instances by opcode family, and runs each group with array operations.
+
+    Instructions that only make sense on a single machine hand that
+    instance over to a scalar ``Chip8``, which takes over from the same
+    point in the frame. These are the SUPER-CHIP 128x64 mode, scrolling,
+    16x16 sprites and 00FD exit. An instance that would raise in the
+    scalar core, by reading or writing past the end of RAM, is marked
+    crashed and stops; ``errors`` says why.
+    """
+
+    def __init__(self, rom, seeds, clock_hz=700):
+        rom = bytes(rom)
+        Chip8().check_ROM_size(rom)
+        self.seeds = list(seeds)
+        count = len(self.seeds)
+        self.count = count
+        self.clock_hz = clock_hz
+        self.ms_per_timer = 1000 / 60
+        self.timer_accumulator = 0.0
+        self.cycle_accumulator = 0.0
+        self.cycle_count = 0
+        self.rngs = [random.Random(seed) for seed in self.seeds]
+
+        boot = bytearray(BOOT_RAM)
+        boot[PROGRAM_START:PROGRAM_START + len(rom)] = rom
+        self.RAM = np.tile(np.frombuffer(bytes(boot), dtype=np.uint8), (count, 1))
+        self.V = np.zeros((count, 16), dtype=np.uint8)
+        self.rpl_flags = np.zeros((count, RPL_FLAG_COUNT), dtype=np.uint8)
+        self.stack = np.zeros((count, 16), dtype=np.uint16)
+        self.keys = np.zeros((count, 16), dtype=np.uint8)
+        self.display_rows = np.zeros((count, DISPLAY_WORDS), dtype=np.uint64)
+        self.PC = np.full(count, PROGRAM_START, dtype=np.int64)
+        self.I = np.zeros(count, dtype=np.int64)
+        self.SP = np.full(count, -1, dtype=np.int64)
+        self.DT = np.zeros(count, dtype=np.int64)
+        self.ST = np.zeros(count, dtype=np.int64)
+        self.waiting = np.full(count, NO_WAITING, dtype=np.int64)
+        self.height = np.full(count, DISPLAY_HEIGHT, dtype=np.int64)
+        if rom[:2] == VIP_HIRES_SIGNATURE:
+            self.height[:] = VIP_HIRES_HEIGHT
+            self.PC[:] = VIP_HIRES_ENTRY
+
+        self.crashed = np.zeros(count, dtype=bool)
+        self.errors = {}
+        # Instances handed over to a scalar Chip8, and those handed over during the current frame.
+        self.scalar = {}
+        self.handed_over = []
+        self.steps_left = 0
+
+    def runnable(self):
+        runnable = ~self.crashed & (self.waiting == NO_WAITING)
+        if self.scalar:
+            runnable[list(self.scalar)] = False
+        return np.flatnonzero(runnable)
+
+    def run_frame(self):
+        """Advance every instance by one 60 Hz frame, as ``Chip8.run_frame`` does."""
+        ms_delay = self.ms_per_timer
+        for index, chip in self.scalar.items():
+            self.run_scalar(index, chip.run_frame)
+        self.cycle_accumulator += (ms_delay / 1000.0) * self.clock_hz
+        cycles = int(self.cycle_accumulator + 1e-9)
+        self.cycle_accumulator -= cycles
+        self.cycle_count += cycles
+        self.handed_over = []
+        for step in range(cycles):
+            self.steps_left = cycles - step
+            self.step()
+        for index, remaining in self.handed_over:
+            chip = self.scalar[index]
+            self.run_scalar(index, lambda: (chip.run_cycles(remaining), chip._update_timers(ms_delay)))
+        self.update_timers(ms_delay)
+
+    def run_frames(self, frames):
+        for _ in range(frames):
+            self.run_frame()
+
+    def run_scalar(self, index, run):
+        if self.crashed[index]:
+            return
+        try:
+            run()
+        except Exception as exc:
+            self.crash([index], f"{type(exc).__name__}: {exc}")
+
+    def update_timers(self, ms_delay):
+        self.timer_accumulator += ms_delay
+        ticks = 0
+        while self.timer_accumulator >= self.ms_per_timer:
+            ticks += 1
+            self.timer_accumulator -= self.ms_per_timer
+        if ticks:
+            # A scalar machine that raised never reaches its timer update.
+            live = ~self.crashed
+            self.DT[live] = np.maximum(self.DT[live] - ticks, 0)
+            self.ST[live] = np.maximum(self.ST[live] - ticks, 0)
+
+    def set_key_state(self, indices, key_index, pressed):
+        """Press or release one key on the given instances (an index or an array of them)."""
+        indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+        if key_index < 0 or key_index >= 16:
+            return
+        for index in [index for index in indices.tolist() if index in self.scalar]:
+            self.scalar[index].set_key_state(key_index, pressed)
+        self.keys[indices, key_index] = 1 if pressed else 0
+        if pressed:
+            released = indices[self.waiting[indices] != NO_WAITING]
+            self.V[released, self.waiting[released]] = key_index
+            self.waiting[released] = NO_WAITING
+
+    def crash(self, rows, message):
+        self.crashed[rows] = True
+        for index in np.atleast_1d(rows).tolist():
+            self.errors.setdefault(index, message)
+
+    def hand_over(self, rows):
+        """Move instances to scalar Chip8s just before the instruction they have fetched."""
+        self.PC[rows] -= 2
+        for index in rows.tolist():
+            chip = Chip8(seed=self.seeds[index])
+            chip.clock_hz = self.clock_hz
+            chip.load_state(self.state(index))
+            chip.rng = self.rngs[index]
+            chip.keys[:] = self.keys[index].tobytes()
+            chip.cycle_count = self.cycle_count
+            self.scalar[index] = chip
+            self.handed_over.append((index, self.steps_left))
+
+    def step(self):
+        live = self.runnable()
+        if not live.size:
+            return
+        PC = self.PC[live]
+        past_end = PC >= MEMORY_SIZE - 1
+        if past_end.any():
+            self.crash(live[past_end], "IndexError: bytearray index out of range")
+            live = live[~past_end]
+            PC = PC[~past_end]
+        RAM = self.RAM
+        instructions = (RAM[live, PC].astype(np.int64) << 8) | RAM[live, PC + 1]
+        self.PC[live] = PC + 2
+        families = instructions >> 12
+        for family in np.flatnonzero(np.bincount(families, minlength=16)).tolist():
+            selected = families == family
+            self.FAMILIES[family](self, live[selected], instructions[selected])
+
+    def _op_0NNN(self, rows, instructions):
+        for instruction in np.unique(instructions).tolist():
+            group = rows[instructions == instruction]
+            if instruction == 0x00E0:
+                self.display_rows[group] = 0
+            elif instruction == 0x00EE:
+                group = group[self.SP[group] >= 0]
+                self.PC[group] = self.stack[group, self.SP[group]]
+                self.SP[group] -= 1
+            elif instruction == 0x00FE:
+                self.height[group] = DISPLAY_HEIGHT
+                self.display_rows[group] = 0
+            elif instruction == 0x0230:
+                self.display_rows[group[self.height[group] == VIP_HIRES_HEIGHT]] = 0
+            elif instruction in (0x00FB, 0x00FC, 0x00FD, 0x00FF) or instruction & 0xFFF0 == 0x00C0:
+                self.hand_over(group)
+
+    def _op_1NNN(self, rows, instructions):
+        self.PC[rows] = instructions & 0xFFF
+
+    def _op_2NNN(self, rows, instructions):
+        SP = (self.SP[rows] + 1) % 16
+        self.SP[rows] = SP
+        self.stack[rows, SP] = self.PC[rows]
+        self.PC[rows] = instructions & 0xFFF
+
+    def skip_if(self, rows, condition):
+        self.PC[rows[condition]] += 2
+
+    def _op_3XNN(self, rows, instructions):
+        self.skip_if(rows, self.V[rows, (instructions >> 8) & 0xF] == (instructions & 0xFF))
+
+    def _op_4XNN(self, rows, instructions):
+        self.skip_if(rows, self.V[rows, (instructions >> 8) & 0xF] != (instructions & 0xFF))
+
+    def _op_5XY0(self, rows, instructions):
+        valid = (instructions & 0xF) == 0
+        rows = rows[valid]
+        instructions = instructions[valid]
+        self.skip_if(rows, self.V[rows, (instructions >> 8) & 0xF] == self.V[rows, (instructions >> 4) & 0xF])
+
+    def _op_9XY0(self, rows, instructions):
+        valid = (instructions & 0xF) == 0
+        rows = rows[valid]
+        instructions = instructions[valid]
+        self.skip_if(rows, self.V[rows, (instructions >> 8) & 0xF] != self.V[rows, (instructions >> 4) & 0xF])
+
+    def _op_6XNN(self, rows, instructions):
+        self.V[rows, (instructions >> 8) & 0xF] = instructions & 0xFF
+
+    def _op_7XNN(self, rows, instructions):
+        X = (instructions >> 8) & 0xF
+        self.V[rows, X] = (self.V[rows, X].astype(np.int64) + (instructions & 0xFF)) & 0xFF
+
+    def _op_8XYN(self, rows, instructions):
+        V = self.V
+        for N in np.unique(instructions & 0xF).tolist():
+            selected = (instructions & 0xF) == N
+            group = rows[selected]
+            X = (instructions[selected] >> 8) & 0xF
+            Y = (instructions[selected] >> 4) & 0xF
+            # VF is written first, exactly as in the scalar handlers, so X or Y being F reads the new flag.
+            if N == 0x0:
+                V[group, X] = V[group, Y]
+            elif N == 0x1:
+                V[group, X] = V[group, X] | V[group, Y]
+            elif N == 0x2:
+                V[group, X] = V[group, X] & V[group, Y]
+            elif N == 0x3:
+                V[group, X] = V[group, X] ^ V[group, Y]
+            elif N == 0x4:
+                result = V[group, X].astype(np.int64) + V[group, Y]
+                V[group, 0xF] = result > 0xFF
+                V[group, X] = result & 0xFF
+            elif N == 0x5:
+                V[group, 0xF] = V[group, X] >= V[group, Y]
+                V[group, X] = (V[group, X].astype(np.int64) - V[group, Y]) & 0xFF
+            elif N == 0x6:
+                V[group, 0xF] = V[group, X] & 1
+                V[group, X] = V[group, X] >> 1
+            elif N == 0x7:
+                V[group, 0xF] = V[group, Y] >= V[group, X]
+                V[group, X] = (V[group, Y].astype(np.int64) - V[group, X]) & 0xFF
+            elif N == 0xE:
+                V[group, 0xF] = (V[group, X] & 0x80) != 0
+                V[group, X] = (V[group, X].astype(np.int64) << 1) & 0xFF
+
+    def _op_ANNN(self, rows, instructions):
+        self.I[rows] = instructions & 0xFFF
+
+    def _op_BNNN(self, rows, instructions):
+        self.PC[rows] = (self.V[rows, 0].astype(np.int64) + (instructions & 0xFFF)) & 0xFFF
+
+    def _op_CXNN(self, rows, instructions):
+        # Each instance draws from its own generator, in the same order as the scalar core.
+        rngs = self.rngs
+        values = np.array([rngs[index].getrandbits(8) for index in rows.tolist()], dtype=np.int64)
+        self.V[rows, (instructions >> 8) & 0xF] = values & (instructions & 0xFF)
+
+    def _op_DXYN(self, rows, instructions):
+        N = instructions & 0xF
+        if not N.all():
+            self.hand_over(rows[N == 0])
+            rows = rows[N != 0]
+            instructions = instructions[N != 0]
+            N = N[N != 0]
+        V = self.V
+        V[rows, 0xF] = 0
+        I = self.I[rows]
+        past_end = I + N > MEMORY_SIZE
+        if past_end.any():
+            self.crash(rows[past_end], "IndexError: bytearray index out of range")
+            rows, instructions, N, I = rows[~past_end], instructions[~past_end], N[~past_end], I[~past_end]
+        height = self.height[rows]
+        start_x = V[rows, (instructions >> 8) & 0xF].astype(np.int64) % DISPLAY_WIDTH
+        start_y = V[rows, (instructions >> 4) & 0xF].astype(np.int64) % height
+        shift = SPRITE_SHIFT - start_x
+        # Left shift for sprites that fit, rotation for those that run off the right edge.
+        fits = shift >= 0
+        left = np.where(fits, shift, 0).astype(np.uint64)
+        right = np.where(fits, 0, -shift).astype(np.uint64)
+        wrap = np.where(fits, 0, DISPLAY_WIDTH + shift).astype(np.uint64)
+        collided = np.zeros(rows.size, dtype=bool)
+        display_rows = self.display_rows
+        for i in range(int(N.max()) if N.size else 0):
+            drawing = N > i
+            group = rows[drawing]
+            sprite = self.RAM[group, I[drawing] + i].astype(np.uint64)
+            bits = np.where(
+                fits[drawing],
+                sprite << left[drawing],
+                ((sprite >> right[drawing]) | (sprite << wrap[drawing])) & ROW_BITS,
+            )
+            row = (start_y[drawing] + i) % height[drawing]
+            current = display_rows[group, row]
+            collided[drawing] |= (current & bits) != 0
+            display_rows[group, row] = current ^ bits
+        V[rows, 0xF] = collided
+
+    def _op_EXNN(self, rows, instructions):
+        NN = instructions & 0xFF
+        pressed = self.keys[rows, self.V[rows, (instructions >> 8) & 0xF] & 0xF] == 1
+        self.skip_if(rows, ((NN == 0x9E) & pressed) | ((NN == 0xA1) & ~pressed))
+
+    def _op_FXNN(self, rows, instructions):
+        V = self.V
+        for NN in np.unique(instructions & 0xFF).tolist():
+            selected = (instructions & 0xFF) == NN
+            group = rows[selected]
+            X = (instructions[selected] >> 8) & 0xF
+            if NN == 0x07:
+                V[group, X] = self.DT[group]
+            elif NN == 0x0A:
+                self.waiting[group] = X
+            elif NN == 0x15:
+                self.DT[group] = V[group, X]
+            elif NN == 0x18:
+                self.ST[group] = V[group, X]
+            elif NN == 0x1E:
+                I = self.I[group] + V[group, X]
+                V[group, 0xF] = I > 0xFFF
+                self.I[group] = I & 0xFFF
+            elif NN == 0x29:
+                self.I[group] = (V[group, X].astype(np.int64) & 0xF) * 5
+            elif NN == 0x30:
+                self.I[group] = BIG_FONT_ADDRESS + 10 * (V[group, X].astype(np.int64) & 0xF)
+            elif NN == 0x33:
+                group, X = self.within_ram(group, X, 2)
+                number = V[group, X].astype(np.int64)
+                I = self.I[group]
+                self.RAM[group, I] = number // 100
+                self.RAM[group, I + 1] = (number // 10) % 10
+                self.RAM[group, I + 2] = number % 10
+            elif NN in (0x55, 0x65):
+                group, X = self.within_ram(group, X, X)
+                I = self.I[group]
+                for register in range(int(X.max()) + 1 if X.size else 0):
+                    copying = X >= register
+                    if NN == 0x55:
+                        self.RAM[group[copying], I[copying] + register] = V[group[copying], register]
+                    else:
+                        V[group[copying], register] = self.RAM[group[copying], I[copying] + register]
+            elif NN in (0x75, 0x85):
+                for register in range(int(X.max()) + 1):
+                    copying = group[X >= register]
+                    if NN == 0x75:
+                        self.rpl_flags[copying, register] = V[copying, register]
+                    else:
+                        V[copying, register] = self.rpl_flags[copying, register]
+
+    def within_ram(self, rows, X, last_offset):
+        """Crash the instances whose access would run past the end of RAM; return the rest."""
+        past_end = self.I[rows] + last_offset >= MEMORY_SIZE
+        if past_end.any():
+            self.crash(rows[past_end], "IndexError: bytearray index out of range")
+            return rows[~past_end], X[~past_end]
+        return rows, X
+
+    FAMILIES = (
+        _op_0NNN, _op_1NNN, _op_2NNN, _op_3XNN, _op_4XNN, _op_5XY0, _op_6XNN, _op_7XNN,
+        _op_8XYN, _op_9XY0, _op_ANNN, _op_BNNN, _op_CXNN, _op_DXYN, _op_EXNN, _op_FXNN,
+    )
+
+    def state(self, index):
+        """The instance's state in ``Chip8.save_state`` format."""
+        if index in self.scalar:
+            return self.scalar[index].save_state()
+        waiting = int(self.waiting[index])
+        header = STATE_HEADER.pack(
+            STATE_MAGIC, STATE_VERSION, int(self.PC[index]), int(self.I[index]), int(self.SP[index]),
+            int(self.DT[index]), int(self.ST[index]), NO_WAITING_REGISTER if waiting == NO_WAITING else waiting,
+            self.timer_accumulator, self.cycle_accumulator, DISPLAY_WIDTH, int(self.height[index]),
+        )
+        return b"".join((
+            header, self.RAM[index].tobytes(), self.V[index].tobytes(), self.rpl_flags[index].tobytes(),
+            self.stack[index].astype("<u2").tobytes(), self.display_rows[index].astype("<u8").tobytes(),
+            np.array(self.rngs[index].getstate()[1], dtype="<u4").tobytes(),
+        ))
+
+    def frame_rows(self, index):
+        if index in self.scalar:
+            return self.scalar[index].frame_rows()
+        return [int(row) for row in self.display_rows[index, :int(self.height[index])]]
+
+    def frame_width(self, index):
+        return self.scalar[index].display_width if index in self.scalar else DISPLAY_WIDTH
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run many seeded instances of one ROM in lockstep and report crashes and distinct end screens.")
+    parser.add_argument("rom", help="ROM to run")
+    parser.add_argument("--instances", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=600, help="60 Hz frames to run (default 600)")
+    parser.add_argument("--seed", type=int, default=0, help="instance i uses CXNN seed SEED + i")
+    parser.add_argument("--key-rate", type=float, default=0.0, help="chance per frame that each instance presses or releases a random key")
+    parser.add_argument("--check", type=int, default=0, metavar="K", help="replay the first K instances on the scalar core and compare states")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rom = Path(args.rom).read_bytes()
+    seeds = range(args.seed, args.seed + args.instances)
+    batch = BatchChip8(rom, seeds)
+    inputs = np.random.default_rng(args.seed)
+    events = []
+    started = time.perf_counter()
+    for frame in range(args.frames):
+        if args.key_rate:
+            toggling = np.flatnonzero(inputs.random(batch.count) < args.key_rate)
+            keys = inputs.integers(0, 16, toggling.size)
+            for key in np.unique(keys).tolist():
+                indices = toggling[keys == key]
+                pressed = batch.keys[indices, key] == 0
+                for state in (True, False):
+                    chosen = indices[pressed == state]
+                    if chosen.size:
+                        batch.set_key_state(chosen, key, state)
+                        events.append((frame, chosen, key, state))
+        batch.run_frame()
+    wall_time = time.perf_counter() - started
+    cycles = batch.cycle_count * batch.count
+    print(f"{batch.count} instances x {args.frames} frames in {wall_time:.2f}s: {cycles / wall_time:,.0f} emulated cycles/s")
+    print(f"{len(batch.scalar)} handed to the scalar core, {int(batch.crashed.sum())} crashed")
+    for index, error in sorted(batch.errors.items())[:10]:
+        print(f"  seed {batch.seeds[index]}: {error}")
+    screens = {hashlib.sha1(frame_bytes(batch.frame_rows(index), batch.frame_width(index))).hexdigest() for index in range(batch.count)}
+    print(f"{len(screens)} distinct final screens")
+    mismatches = 0
+    for index in range(min(args.check, batch.count)):
+        cpu = Chip8(seed=batch.seeds[index])
+        cpu.load_ROM(rom)
+        failed = False
+        pending = [(frame, key, state) for frame, chosen, key, state in events if index in chosen]
+        try:
+            for frame in range(args.frames):
+                while pending and pending[0][0] == frame:
+                    cpu.set_key_state(pending[0][1], pending[0][2])
+                    pending.pop(0)
+                cpu.run_frame()
+        except Exception:
+            failed = True
+        if failed != bool(batch.crashed[index]) or (not failed and cpu.save_state() != batch.state(index)):
+            mismatches += 1
+            print(f"  seed {batch.seeds[index]}: batch and scalar states differ")
+    if args.check:
+        print(f"checked {min(args.check, batch.count)} instances against the scalar core, {mismatches} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import math
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+SAMPLE_RATE = 44100
+# 441 Hz is exactly 100 samples per period at 44.1 kHz, so every frame's slice of the
+# pre-rendered table joins the next one without a phase glitch.
+TONE_HZ = 441
+AMPLITUDE = 6000
+FRAME_RATE = 60
+SAMPLE_WIDTH = 2
+# Frames the emulator may run ahead of the writer before new frames are dropped (about 67 ms).
+QUEUE_FRAMES = 4
+PIPE_BUFFER_BYTES = 4096
+PLAYER_COMMANDS = (
+    ("pw-cat", "--playback", "--format", "s16", "--rate", "{rate}", "--channels", "1", "--latency", "20ms", "-"),
+    ("paplay", "--raw", "--format=s16le", "--rate={rate}", "--channels=1", "--latency-msec=20"),
+    ("aplay", "-q", "-t", "raw", "-f", "S16_LE", "-r", "{rate}", "-c", "1", "--buffer-time=20000"),
+)
+PLAYER_BUFFER_SECONDS = 0.02
+
+
+def render_square_wave(sample_rate=SAMPLE_RATE, tone_hz=TONE_HZ, amplitude=AMPLITUDE, samples=0):
+    """Signed 16-bit little-endian PCM of a square wave at least ``samples`` long, whole periods only."""
+    period = round(sample_rate / tone_hz)
+    high = amplitude.to_bytes(SAMPLE_WIDTH, "little", signed=True)
+    low = (-amplitude).to_bytes(SAMPLE_WIDTH, "little", signed=True)
+    cycle = high * (period // 2) + low * (period - period // 2)
+    return cycle * max(1, math.ceil(samples / period)), period
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class NullSink:
+    """Discards audio; counts what it was given."""
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, pcm):
+        self.bytes_written += len(pcm)
+
+    def latency(self):
+        return 0.0
+
+    def close(self):
+        pass
+
+
+class WavSink:
+    """Writes the audio stream to a mono 16-bit WAV file, e.g. for headless runs."""
+
+    def __init__(self, path, sample_rate=SAMPLE_RATE):
+        self.file = wave.open(str(path), "wb")
+        self.file.setnchannels(1)
+        self.file.setsampwidth(SAMPLE_WIDTH)
+        self.file.setframerate(sample_rate)
+
+    def write(self, pcm):
+        self.file.writeframesraw(pcm)
+
+    def latency(self):
+        return 0.0
+
+    def close(self):
+        self.file.close()
+
+
+class PlayerSink:
+    """Pipes raw PCM into a command-line audio player (PipeWire, PulseAudio or ALSA).
+
+    The pipe is shrunk to PIPE_BUFFER_BYTES where the platform allows it, so
+    writes block, and so pace the writer thread, after a few milliseconds of
+    audio instead of the usual 64 KB (three quarters of a second).
+    """
+
+    def __init__(self, command, sample_rate=SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.pipe = self.process.stdin
+        self.fd = self.pipe.fileno()
+        try:
+            import fcntl
+            fcntl.fcntl(self.fd, getattr(fcntl, "F_SETPIPE_SZ", 1031), PIPE_BUFFER_BYTES)
+        except (ImportError, OSError):
+            pass
+
+    @classmethod
+    def find(cls, sample_rate=SAMPLE_RATE):
+        """A sink for the first player found on PATH, or None."""
+        for command in PLAYER_COMMANDS:
+            if shutil.which(command[0]):
+                return cls([part.format(rate=sample_rate) for part in command], sample_rate)
+        return None
+
+    def write(self, pcm):
+        try:
+            self.pipe.write(pcm)
+            self.pipe.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+
+    def buffered_bytes(self):
+        try:
+            import fcntl
+            import termios
+            return int.from_bytes(fcntl.ioctl(self.fd, termios.FIONREAD, bytes(4)), sys.byteorder)
+        except (ImportError, OSError):
+            return PIPE_BUFFER_BYTES
+
+    def latency(self):
+        return self.buffered_bytes() / (SAMPLE_WIDTH * self.sample_rate) + PLAYER_BUFFER_SECONDS
+
+    def close(self):
+        try:
+            self.pipe.close()
+        except OSError:
+            pass
+        self.process.terminate()
+        self.process.wait()
+
+
+class Beeper:
+    """Turns the sound timer into audio without ever blocking the emulation thread.
+
+    ``on_frame`` is called after every emulated frame. It picks one frame's
+    worth of pre-rendered samples, a slice of a square-wave table while
+    ``ST`` is nonzero and silence otherwise, and queues it for a writer
+    thread that feeds the sink. If the writer falls QUEUE_FRAMES behind,
+    new frames are dropped rather than waited for; with ``realtime=False``
+    (offline rendering, where every frame must reach the sink) they wait.
+
+    Latency is measured at every beep start and stop: from the end of the
+    frame that changed the timer to the moment the sink accepted the
+    samples, plus whatever the sink still has buffered ahead of them.
+    """
+
+    def __init__(self, sink, sample_rate=SAMPLE_RATE, tone_hz=TONE_HZ, frame_rate=FRAME_RATE, realtime=True):
+        self.sink = sink
+        self.realtime = realtime
+        self.samples_per_frame = round(sample_rate / frame_rate)
+        frame_bytes = SAMPLE_WIDTH * self.samples_per_frame
+        tone, period = render_square_wave(sample_rate, tone_hz, samples=self.samples_per_frame + round(sample_rate / tone_hz))
+        self.tone = memoryview(tone)
+        self.period_bytes = SAMPLE_WIDTH * period
+        self.frame_bytes = frame_bytes
+        self.silence = bytes(frame_bytes)
+        self.phase = 0
+        self.sounding = False
+        self.frames = 0
+        self.tone_frames = 0
+        self.dropped_frames = 0
+        self.latencies = []
+        self.queue = queue.Queue(maxsize=QUEUE_FRAMES)
+        self.thread = threading.Thread(target=self.write_loop, name="chip8-audio", daemon=True)
+        self.thread.start()
+
+    def on_frame(self, chip8):
+        sounding = chip8.ST > 0
+        if sounding:
+            pcm = self.tone[self.phase:self.phase + self.frame_bytes]
+            self.phase = (self.phase + self.frame_bytes) % self.period_bytes
+            self.tone_frames += 1
+        else:
+            pcm = self.silence
+        edge = time.perf_counter() if sounding != self.sounding else None
+        self.sounding = sounding
+        self.frames += 1
+        try:
+            self.queue.put((pcm, edge), block=not self.realtime)
+        except queue.Full:
+            self.dropped_frames += 1
+
+    def write_loop(self):
+        sink = self.sink
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            pcm, edge = item
+            sink.write(pcm)
+            if edge is not None:
+                self.latencies.append(time.perf_counter() - edge + sink.latency())
+
+    def report(self):
+        latencies = list(self.latencies)
+        report = {
+            "frames": self.frames,
+            "tone_frames": self.tone_frames,
+            "dropped_frames": self.dropped_frames,
+            "edges": len(latencies),
+        }
+        if latencies:
+            report["latency_ms"] = {
+                "mean": 1000 * sum(latencies) / len(latencies),
+                "p50": 1000 * percentile(latencies, 0.5),
+                "p95": 1000 * percentile(latencies, 0.95),
+                "max": 1000 * max(latencies),
+            }
+        return report
+
+    def close(self):
+        """Flush the queued audio, stop the writer and close the sink."""
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+
+
+def open_sink(spec):
+    """Build a sink from a command-line value: "none", "device" or a .wav path."""
+    if spec in (None, "none"):
+        return NullSink()
+    if spec == "device":
+        sink = PlayerSink.find()
+        if sink is None:
+            print("No audio player (pw-cat, paplay or aplay) found; sound is off.", file=sys.stderr)
+            return NullSink()
+        return sink
+    return WavSink(os.fspath(spec))
@@ -0,0 +1,302 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from chip8emulator import Chip8
+
+BENCHMARK_VERSION = 1
+# Resolved next to this file, so the suite can be run from any directory.
+ROOT = Path(__file__).resolve().parent
+ROMS_DIR = ROOT / "ROMs"
+DEFAULT_OUTPUT = ROOT / "benchmarks" / "latest.json"
+DEFAULT_REPEATS = 5
+# A benchmark whose throughput falls more than this fraction below the baseline is a regression.
+DEFAULT_THRESHOLD = 0.10
+GROUPS = ("micro", "macro", "render")
+
+MICRO_OPS = 100_000
+# Each program runs through Chip8.run_opcode in a loop; run_opcode never fetches,
+# so jumps, calls and skips only move PC and the same instructions repeat.
+MICRO_PROGRAMS = {
+    "00E0": [0x00E0],
+    "00EE-2NNN": [0x2300, 0x00EE],
+    "1NNN": [0x1200],
+    "3XNN-9XY0": [0x3012, 0x4012, 0x5010, 0x9010],
+    "6XNN-7XNN": [0x6012, 0x7101],
+    "8XYN": [0x8010, 0x8011, 0x8012, 0x8013, 0x8014, 0x8015, 0x8016, 0x8017, 0x801E],
+    "ANNN-BNNN": [0xA300, 0xB200],
+    "CXNN": [0xC0FF],
+    "DXYN": [0xA000, 0xD015],
+    "EX9E-EXA1": [0xE09E, 0xE0A1],
+    "FX07-FX18": [0xF007, 0xF015, 0xF018],
+    "FX1E-FX29": [0xF01E, 0xF029],
+    "FX33-FX65": [0xA300, 0xF033, 0xF255, 0xF265],
+}
+# (name, display mode switch, sprite height): 0 is the SUPER-CHIP 16x16 sprite.
+DRAW_CASES = (("lores", None, 5), ("hires", 0x00FF, 15), ("hires-16x16", 0x00FF, 0))
+# Positions cycled through by the draw benchmarks, including sprites that wrap or clip at the edges.
+DRAW_POSITIONS = ((0, 0), (13, 7), (60, 28), (125, 60), (3, 30))
+
+MACRO_CYCLES = 200_000
+# ROMs that keep the CPU busy without any input, so idle-loop skipping does not dominate.
+MACRO_ROMS = (
+    ROMS_DIR / "games/Tetris [Fran Dachille, 1991].ch8",
+    ROMS_DIR / "games/Space Invaders [David Winter].ch8",
+    ROMS_DIR / "demos/Trip8 Demo (2008) [Revival Studios].ch8",
+    ROMS_DIR / "demos/Particle Demo [zeroZshadow, 2008].ch8",
+    ROMS_DIR / "hires/Astro Dodge Hires [Revival Studios, 2008].ch8",
+)
+MACRO_ENGINES = ("interpreter", "recompiler")
+
+RENDER_FRAMES = 600
+RENDER_ROMS = (
+    ROMS_DIR / "games/Space Invaders [David Winter].ch8",
+    ROMS_DIR / "hires/Astro Dodge Hires [Revival Studios, 2008].ch8",
+)
+XVFB_DISPLAYS = range(90, 100)
+XVFB_START_SECONDS = 5.0
+
+
+def best_of(repeats, run):
+    """Call ``run()`` ``repeats`` times with the GC off; each call returns ``(work, seconds)``."""
+    rates = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            work, seconds = run()
+            rates.append(work / seconds)
+    finally:
+        if enabled:
+            gc.enable()
+    return rates
+
+
+def micro_chip8():
+    cpu = Chip8(engine="interpreter", seed=0)
+    cpu.load_rom_from_path(MACRO_ROMS[0])
+    return cpu
+
+
+def micro_benchmarks():
+    """``(name, unit, run)`` for each opcode family through run_opcode, then for draw_sprite itself."""
+    for family, program in MICRO_PROGRAMS.items():
+        def run(program=program):
+            cpu = micro_chip8()
+            run_opcode = cpu.run_opcode
+            loops = MICRO_OPS // len(program)
+            started = time.perf_counter()
+            for _ in range(loops):
+                for instruction in program:
+                    run_opcode(instruction)
+            return loops * len(program), time.perf_counter() - started
+        yield f"micro.opcode.{family}", "ops/s", run
+    for case, mode, height in DRAW_CASES:
+        def run(mode=mode, height=height):
+            cpu = micro_chip8()
+            if mode is not None:
+                cpu.run_opcode(mode)
+            cpu.I = 0
+            V = cpu.V
+            draw_sprite = cpu.draw_sprite
+            loops = MICRO_OPS // len(DRAW_POSITIONS)
+            started = time.perf_counter()
+            for _ in range(loops):
+                for x, y in DRAW_POSITIONS:
+                    V[0] = x
+                    V[1] = y
+                    draw_sprite(0, 1, height)
+            return loops * len(DRAW_POSITIONS), time.perf_counter() - started
+        yield f"micro.draw_sprite.{case}", "draws/s", run
+
+
+def macro_benchmarks():
+    """Whole ROMs per engine; cycle_count includes cycles skipped in idle loops, which these ROMs rarely have."""
+    for rom in MACRO_ROMS:
+        for engine in MACRO_ENGINES:
+            def run(rom=rom, engine=engine):
+                cpu = Chip8(engine=engine, seed=0)
+                cpu.load_rom_from_path(rom)
+                started = time.perf_counter()
+                while cpu.cycle_count < MACRO_CYCLES:
+                    cpu.run_frame()
+                return cpu.cycle_count, time.perf_counter() - started
+            yield f"macro.{Path(rom).stem}.{engine}", "emulated cycles/s", run
+
+
+def recorded_frames(rom, frames=RENDER_FRAMES):
+    cpu = Chip8(engine="interpreter", seed=0)
+    cpu.load_rom_from_path(rom)
+    recorded = []
+    for _ in range(frames):
+        cpu.run_frame()
+        recorded.append((cpu.frame_rows(), cpu.display_width))
+    return recorded
+
+
+@contextmanager
+def virtual_display():
+    """Yield a usable X display name, starting Xvfb if there is none; yields None if neither works."""
+    if os.environ.get("DISPLAY"):
+        yield os.environ["DISPLAY"]
+        return
+    if not shutil.which("Xvfb"):
+        yield None
+        return
+    for number in XVFB_DISPLAYS:
+        if not Path(f"/tmp/.X11-unix/X{number}").exists():
+            break
+    else:
+        yield None
+        return
+    display = f":{number}"
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.perf_counter() + XVFB_START_SECONDS
+        while not Path(f"/tmp/.X11-unix/X{number}").exists():
+            if process.poll() is not None or time.perf_counter() > deadline:
+                yield None
+                return
+            time.sleep(0.05)
+        os.environ["DISPLAY"] = display
+        try:
+            yield display
+        finally:
+            del os.environ["DISPLAY"]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def render_benchmarks(application):
+    for rom in RENDER_ROMS:
+        frames = recorded_frames(rom)
+
+        def run(frames=frames):
+            application.last_rows = None
+            update_canvas = application.update_canvas
+            update_idletasks = application.update_idletasks
+            started = time.perf_counter()
+            for rows, width in frames:
+                update_canvas(rows, width)
+                update_idletasks()
+            return len(frames), time.perf_counter() - started
+        yield f"render.{Path(rom).stem}", "frames/s", run
+
+
+def run_group(benchmarks, repeats, results, only=None):
+    for name, unit, run in benchmarks:
+        if only and only not in name:
+            continue
+        rates = sorted(best_of(repeats, run))
+        results[name] = {"unit": unit, "throughput": rates[-1], "median": rates[len(rates) // 2]}
+        print(f"{name:60} {rates[-1]:>16,.0f} {unit}", flush=True)
+
+
+def run_benchmarks(groups, repeats=DEFAULT_REPEATS, only=None):
+    report = {
+        "version": BENCHMARK_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "benchmarks": {},
+        "skipped": {},
+    }
+    results = report["benchmarks"]
+    if "micro" in groups:
+        run_group(micro_benchmarks(), repeats, results, only)
+    if "macro" in groups:
+        run_group(macro_benchmarks(), repeats, results, only)
+    if "render" in groups:
+        with virtual_display() as display:
+            if display is None:
+                report["skipped"]["render"] = "no X display and Xvfb could not be started"
+            else:
+                import tkinter as tk
+                from GUI import GUI
+                try:
+                    application = GUI(Chip8())
+                except tk.TclError as exc:
+                    report["skipped"]["render"] = f"Tk could not open {display}: {exc}"
+                else:
+                    application.update()
+                    run_group(render_benchmarks(application), repeats, results, only)
+                    application.master.destroy()
+    for group, reason in report["skipped"].items():
+        print(f"{group} benchmarks skipped: {reason}", file=sys.stderr)
+    return report
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Print each benchmark's change against the baseline and return the names that regressed past ``threshold``."""
+    regressions = []
+    base = baseline["benchmarks"]
+    now = current["benchmarks"]
+    for name in sorted(base.keys() & now.keys()):
+        change = now[name]["throughput"] / base[name]["throughput"] - 1
+        regressed = change < -threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:60} {change:>+10.1%}{'  REGRESSION' if regressed else ''}")
+    missing = len(base.keys() - now.keys())
+    added = len(now.keys() - base.keys())
+    if missing or added:
+        print(f"{missing} baseline benchmarks not run, {added} with no baseline")
+    return regressions
+
+
+def load_report(path):
+    report = json.loads(Path(path).read_text())
+    if report.get("version") != BENCHMARK_VERSION:
+        raise ValueError(f"{path} was written by an incompatible version of bench.py")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the emulator and compare against stored baselines.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run benchmarks and write the results as JSON")
+    run_parser.add_argument("--group", choices=GROUPS, action="append", help="benchmark group to run (repeatable; default: all)")
+    run_parser.add_argument("--filter", metavar="TEXT", help="only run benchmarks whose name contains TEXT")
+    run_parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help=f"runs per benchmark; the best is kept (default {DEFAULT_REPEATS})")
+    run_parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="results file (default benchmarks/latest.json next to bench.py)")
+    run_parser.add_argument("--compare", metavar="BASELINE", help="compare against BASELINE afterwards and fail on a regression")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"allowed throughput drop as a fraction (default {DEFAULT_THRESHOLD})")
+    compare_parser = commands.add_parser("compare", help="compare two results files and fail on a regression")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help=f"allowed throughput drop as a fraction (default {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        baseline = load_report(args.compare) if args.compare else None
+        current = run_benchmarks(args.group or GROUPS, args.repeats, args.filter)
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(current, indent=2))
+        print(f"{len(current['benchmarks'])} benchmarks written to {output}")
+    else:
+        baseline = load_report(args.baseline)
+        current = load_report(args.current)
+    if baseline is None:
+        return 0
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
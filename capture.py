@@ -0,0 +1,336 @@
+import argparse
+import queue
+import struct
+import sys
+import threading
+from pathlib import Path
+
+from chip8emulator import HIRES_HEIGHT, HIRES_WIDTH, visible_rows
+from imaging import encode_png, frame_bytes
+
+FRAME_RATE = 60
+# Changed frames the emulator may run ahead of the encoder before new ones are dropped.
+QUEUE_FRAMES = 64
+RAW_MAGIC = b"C8FV"
+RAW_VERSION = 1
+# magic, version, frame rate
+RAW_HEADER = struct.Struct("<4sBB")
+# emulated frame number, width, height; followed by the rows packed as imaging.frame_bytes does
+RAW_FRAME = struct.Struct("<IHH")
+# Encoding cost grows with the pixel count; at 2 a lores pixel is a 4x4 block on a 256x128 canvas.
+GIF_SCALE = 2
+GIF_PALETTE = bytes((0x1A, 0x1A, 0x1A, 0xF2, 0xF2, 0xF2))
+GIF_MAX_CODE = 4096
+
+
+def lzw_encode(pixels, min_code_size):
+    """GIF-flavoured variable-width LZW of a byte string of palette indices."""
+    clear = 1 << min_code_size
+    end = clear + 1
+    code_size = min_code_size + 1
+    next_code = end + 1
+    table = {}
+    out = bytearray()
+    buffer = 0
+    bits = 0
+
+    def emit(code):
+        nonlocal buffer, bits
+        buffer |= code << bits
+        bits += code_size
+        while bits >= 8:
+            out.append(buffer & 0xFF)
+            buffer >>= 8
+            bits -= 8
+
+    emit(clear)
+    lookup = table.get
+    prefix = pixels[0]
+    for pixel in pixels[1:]:
+        key = (prefix << 8) | pixel
+        code = lookup(key)
+        if code is not None:
+            prefix = code
+            continue
+        emit(prefix)
+        prefix = pixel
+        if next_code == GIF_MAX_CODE:
+            emit(clear)
+            table.clear()
+            code_size = min_code_size + 1
+            next_code = end + 1
+            continue
+        table[key] = next_code
+        next_code += 1
+        if next_code > (1 << code_size) and code_size < 12:
+            code_size += 1
+    emit(prefix)
+    emit(end)
+    if bits:
+        out.append(buffer & 0xFF)
+    return bytes(out)
+
+
+def gif_sub_blocks(data):
+    return b"".join(bytes((len(data[i:i + 255]),)) + data[i:i + 255] for i in range(0, len(data), 255)) + b"\x00"
+
+
+class RawWriter:
+    """Packed-bit frame stream: a header, then one record per distinct frame.
+
+    Each record holds the emulated frame number it first appeared on and
+    the display mode, followed by the rows, so repeated frames cost nothing
+    and the timing can be rebuilt exactly with ``read_raw``.
+    """
+
+    def __init__(self, path, frame_rate=FRAME_RATE):
+        self.file = open(path, "wb")
+        self.file.write(RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, frame_rate))
+
+    def write(self, frame, rows, width, height):
+        self.file.write(RAW_FRAME.pack(frame, width, height) + frame_bytes(rows, width))
+
+    def close(self, frames):
+        self.file.close()
+
+
+def read_raw(path):
+    """``(frame_rate, frames)`` for a raw frame stream, each frame a ``(frame, rows, width, height)`` tuple."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, frame_rate = RAW_HEADER.unpack_from(data)
+    if magic != RAW_MAGIC or version != RAW_VERSION:
+        raise ValueError("Not a Chip-8 frame stream, or one written by an incompatible version")
+    frames = []
+    offset = RAW_HEADER.size
+    while offset < len(data):
+        frame, width, height = RAW_FRAME.unpack_from(data, offset)
+        offset += RAW_FRAME.size
+        row_bytes = (width + 7) // 8
+        rows = [int.from_bytes(data[start:start + row_bytes], "big") for start in range(offset, offset + row_bytes * height, row_bytes)]
+        offset += row_bytes * height
+        frames.append((frame, rows, width, height))
+    return frame_rate, frames
+
+
+class PngSequenceWriter:
+    """One PNG per distinct frame, named after the emulated frame it appeared on."""
+
+    def __init__(self, directory, scale=1):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.scale = scale
+
+    def write(self, frame, rows, width, height):
+        (self.directory / f"frame_{frame:06d}.png").write_bytes(encode_png(rows, width, self.scale))
+
+    def close(self, frames):
+        pass
+
+
+class GifWriter:
+    """Animated GIF on a fixed 128x64 canvas (times ``scale``).
+
+    Each display mode is drawn with the largest whole pixel size that fits,
+    centred, as the window does. Only the rectangle that changed since the
+    previous frame is encoded, found by XORing the packed rows, and a
+    frame's delay covers every emulated frame it stayed on screen, rounded
+    to GIF's 1/100 s without drift.
+    """
+
+    def __init__(self, path, scale=GIF_SCALE, frame_rate=FRAME_RATE):
+        self.file = open(path, "wb")
+        self.frame_rate = frame_rate
+        self.canvas_width = HIRES_WIDTH * scale
+        self.canvas_height = HIRES_HEIGHT * scale
+        self.previous = None
+        self.pending = None
+        self.centiseconds_written = 0
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", self.canvas_width, self.canvas_height, 0x80, 0, 0) + GIF_PALETTE)
+        # Loop forever.
+        self.file.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def write(self, frame, rows, width, height):
+        rows = list(rows)
+        pixel = max(1, min(self.canvas_width // width, self.canvas_height // height))
+        if self.previous is None or self.previous[1:] != (width, height):
+            # First frame or a new display mode: repaint the whole canvas, border included.
+            image = self.render(rows, width, pixel, 0, width)
+            left = (self.canvas_width - width * pixel) // 2
+            top = (self.canvas_height - height * pixel) // 2
+            blank = bytes(self.canvas_width)
+            lines = [blank] * top
+            side = bytes(left)
+            for start in range(0, len(image), width * pixel):
+                line = side + image[start:start + width * pixel]
+                lines.append(line + bytes(self.canvas_width - len(line)))
+            lines.extend([blank] * (self.canvas_height - len(lines)))
+            self.flush(frame)
+            self.pending = (frame, 0, 0, self.canvas_width, self.canvas_height, b"".join(lines))
+        else:
+            changes = [a ^ b for a, b in zip(rows, self.previous[0])]
+            changed = [y for y, change in enumerate(changes) if change]
+            if not changed:
+                return
+            mask = 0
+            for change in changes:
+                mask |= change
+            first, last = changed[0], changed[-1] + 1
+            x_start = width - mask.bit_length()
+            x_stop = width - ((mask & -mask).bit_length() - 1)
+            image = self.render(rows[first:last], width, pixel, x_start, x_stop)
+            left = (self.canvas_width - width * pixel) // 2 + x_start * pixel
+            top = (self.canvas_height - height * pixel) // 2 + first * pixel
+            self.flush(frame)
+            self.pending = (frame, left, top, (x_stop - x_start) * pixel, (last - first) * pixel, image)
+        self.previous = (rows, width, height)
+
+    def render(self, rows, width, pixel, x_start, x_stop):
+        """Columns ``x_start``-``x_stop`` of ``rows`` as palette indices, each pixel a ``pixel``-sized block."""
+        span = x_stop - x_start
+        shift = width - x_stop
+        mask = (1 << span) - 1
+        blocks = (bytes(pixel), b"\x01" * pixel)
+        lines = []
+        for row in rows:
+            bits = format((row >> shift) & mask, f"0{span}b").encode().translate(BITS_TO_INDEX)
+            lines.append(b"".join(map(blocks.__getitem__, bits)) * pixel)
+        return b"".join(lines)
+
+    def flush(self, until_frame):
+        """Write the pending image now that the frame which replaces it is known."""
+        if self.pending is None:
+            return
+        frame, left, top, width, height, pixels = self.pending
+        end = round(until_frame * 100 / self.frame_rate)
+        delay = max(1, end - self.centiseconds_written)
+        self.centiseconds_written += delay
+        self.file.write(b"\x21\xF9\x04" + struct.pack("<BHBB", 0x04, delay, 0, 0))
+        self.file.write(b"\x2C" + struct.pack("<HHHHB", left, top, width, height, 0))
+        self.file.write(b"\x02" + gif_sub_blocks(lzw_encode(pixels, 2)))
+        self.pending = None
+
+    def close(self, frames):
+        self.flush(frames)
+        self.file.write(b"\x3B")
+        self.file.close()
+
+
+BITS_TO_INDEX = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def open_writer(path, scale=None):
+    """A writer for a capture path: ``.gif``, ``.c8v`` (raw frames), or a directory of PNGs."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".gif":
+        return GifWriter(path, scale or GIF_SCALE)
+    if suffix == ".c8v":
+        return RawWriter(path)
+    if suffix:
+        raise ValueError(f"Unknown capture format '{suffix}'; use .gif, .c8v or a directory for PNGs")
+    return PngSequenceWriter(path, scale or 1)
+
+
+class FrameCapture:
+    """Records frames to a writer without ever making the emulation thread wait.
+
+    ``on_frame`` is called after every emulated frame. It copies just the
+    visible display words (a few hundred bytes) and, unless they match the
+    previous frame, queues them for a writer thread that does the encoding
+    and disk I/O. If the writer falls QUEUE_FRAMES behind, new frames are
+    dropped rather than waited for; with ``realtime=False`` (headless runs,
+    where every frame must be kept) they wait.
+    """
+
+    def __init__(self, writer, realtime=True, queue_frames=QUEUE_FRAMES):
+        self.writer = writer
+        self.realtime = realtime
+        self.frame = 0
+        self.last = None
+        self.written = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.error = None
+        self.queue = queue.Queue(maxsize=queue_frames)
+        self.thread = threading.Thread(target=self.write_loop, name="chip8-capture", daemon=True)
+        self.thread.start()
+
+    def on_frame(self, chip8):
+        frame = self.frame
+        self.frame += 1
+        width = chip8.display_width
+        height = chip8.display_height
+        words = chip8.display_rows[:height * chip8.row_words]
+        if self.last is not None and self.last[0] == words and self.last[1] == width and self.last[2] == height:
+            self.duplicates += 1
+            return
+        try:
+            self.queue.put((frame, words, width, height), block=not self.realtime)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.last = (words, width, height)
+
+    def write_loop(self):
+        writer = self.writer
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue
+            frame, words, width, height = item
+            try:
+                writer.write(frame, visible_rows(words, width, height), width, height)
+                self.written += 1
+            except Exception as exc:
+                # Keep draining so the emulator never blocks on a dead writer; close() reports it.
+                self.error = exc
+
+    def report(self):
+        return {
+            "frames": self.frame,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+        }
+
+    def close(self):
+        """Flush the queued frames, finish the file and raise any error the writer hit."""
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            if self.error is None:
+                self.writer.close(self.frame)
+        finally:
+            # A writer that failed is never finished, but its file must not stay open.
+            file = getattr(self.writer, "file", None)
+            if file is not None:
+                file.close()
+        if self.error is not None:
+            raise self.error
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a raw Chip-8 frame stream (.c8v) to a GIF or a PNG sequence.")
+    parser.add_argument("stream", help="frame stream written with --capture out.c8v")
+    parser.add_argument("output", help="output .gif, or a directory for PNGs")
+    parser.add_argument("--scale", type=int, help=f"pixel scale (default {GIF_SCALE} for GIFs, 1 for PNGs)")
+    args = parser.parse_args(argv)
+    frame_rate, frames = read_raw(args.stream)
+    if not frames:
+        print("The stream holds no frames.", file=sys.stderr)
+        return 1
+    writer = open_writer(args.output, args.scale)
+    if isinstance(writer, GifWriter):
+        writer.frame_rate = frame_rate
+    for frame, rows, width, height in frames:
+        writer.write(frame, rows, width, height)
+    writer.close(frames[-1][0] + 1)
+    print(f"{len(frames)} frames written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,30 @@
+import os
 import random
+import struct
+import sys
+from array import array
+from collections import OrderedDict, deque
+from functools import partial
 from pathlib import Path
 
 MAX8BIT = int("FF", base=16)
 DISPLAY_WIDTH = 64
 DISPLAY_HEIGHT = 32
+HIRES_WIDTH = 128
+HIRES_HEIGHT = 64
+VIP_HIRES_HEIGHT = 64
+RESOLUTIONS = ((DISPLAY_WIDTH, DISPLAY_HEIGHT), (DISPLAY_WIDTH, VIP_HIRES_HEIGHT), (HIRES_WIDTH, HIRES_HEIGHT))
+# Display rows are packed into 64-bit words with the leftmost pixel in the most significant
+# bit. A 128-pixel SUPER-CHIP row takes two consecutive words, left half first.
+ROW_MASK = (1 << DISPLAY_WIDTH) - 1
+SPRITE_SHIFT = DISPLAY_WIDTH - 8
+DISPLAY_WORDS = HIRES_WIDTH * HIRES_HEIGHT // DISPLAY_WIDTH
+ENGINES = ("interpreter", "recompiler", "auto")
+TIMINGS = ("fixed", "vip")
+MEMORY_SIZE = 4096
+PROGRAM_START = 0x200
+MAX_ROM_SIZE = MEMORY_SIZE - PROGRAM_START
+ROM_CACHE_CAPACITY = 64
 
 FONT_SET = [
 	['F0', '90', '90', '90', 'F0'],
@@ -24,60 +45,508 @@ FONT_SET = [
 	['F0', '80', 'F0', '80', '80']
 ]
 
+# SUPER-CHIP 8x10 digits for FX30, with A-F added the way later interpreters do.
+BIG_FONT_SET = [
+	['FF', 'FF', 'C3', 'C3', 'C3', 'C3', 'C3', 'C3', 'FF', 'FF'],
+	['18', '78', '78', '18', '18', '18', '18', '18', 'FF', 'FF'],
+	['FF', 'FF', '03', '03', 'FF', 'FF', 'C0', 'C0', 'FF', 'FF'],
+	['FF', 'FF', '03', '03', 'FF', 'FF', '03', '03', 'FF', 'FF'],
+	['C3', 'C3', 'C3', 'C3', 'FF', 'FF', '03', '03', '03', '03'],
+	['FF', 'FF', 'C0', 'C0', 'FF', 'FF', '03', '03', 'FF', 'FF'],
+	['FF', 'FF', 'C0', 'C0', 'FF', 'FF', 'C3', 'C3', 'FF', 'FF'],
+	['FF', 'FF', '03', '03', '06', '0C', '18', '18', '18', '18'],
+	['FF', 'FF', 'C3', 'C3', 'FF', 'FF', 'C3', 'C3', 'FF', 'FF'],
+	['FF', 'FF', 'C3', 'C3', 'FF', 'FF', '03', '03', 'FF', 'FF'],
+	['7E', 'FF', 'C3', 'C3', 'C3', 'FF', 'FF', 'C3', 'C3', 'C3'],
+	['FC', 'FC', 'C3', 'C3', 'FC', 'FC', 'C3', 'C3', 'FC', 'FC'],
+	['3C', 'FF', 'C3', 'C0', 'C0', 'C0', 'C0', 'C3', 'FF', '3C'],
+	['FC', 'FE', 'C3', 'C3', 'C3', 'C3', 'C3', 'C3', 'FE', 'FC'],
+	['FF', 'FF', 'C0', 'C0', 'FF', 'FF', 'C0', 'C0', 'FF', 'FF'],
+	['FF', 'FF', 'C0', 'C0', 'FF', 'FF', 'C0', 'C0', 'C0', 'C0']
+]
+
+FONT_IMAGE = bytes(int(hex_value, base=16) for character in FONT_SET for hex_value in character)
+BIG_FONT_IMAGE = bytes(int(hex_value, base=16) for character in BIG_FONT_SET for hex_value in character)
+BIG_FONT_ADDRESS = len(FONT_IMAGE)
+# RAM as it looks straight after reset: the font at 0x000, the big font after it and zeros everywhere else.
+BOOT_RAM = FONT_IMAGE + BIG_FONT_IMAGE + bytes(MEMORY_SIZE - len(FONT_IMAGE) - len(BIG_FONT_IMAGE))
+BLANK_ROWS = array("Q", [0] * DISPLAY_WORDS)
+
+
+def row_pattern(row, width, height):
+	return int.from_bytes(row.to_bytes(width // 8, "big") * height, "big")
+
+
+# 00FB/00FC shift the whole frame as one big integer; these masks clear the
+# SCROLL_STEP bits that cross into the neighbouring row, for each display mode.
+SCROLL_STEP = 4
+SCROLL_MASKS = {
+	(width, height): (
+		row_pattern(((1 << width) - 1) >> SCROLL_STEP, width, height),
+		row_pattern(((1 << width) - 1) << SCROLL_STEP & ((1 << width) - 1), width, height),
+	)
+	for width, height in RESOLUTIONS
+}
+EMPTY_STACK = array("H", [0] * 16)
+
+RPL_FLAG_COUNT = 16
+# Two-page VIP hires programs open with a jump into their 64x64 display routine;
+# the program proper starts at 0x2C0.
+VIP_HIRES_SIGNATURE = b"\x12\x60"
+VIP_HIRES_ENTRY = 0x2C0
+
+# Save state layout: header, then RAM, V, the RPL flags, the stack (little-endian u16),
+# all DISPLAY_WORDS display words (little-endian u64) and the CXNN generator's
+# Mersenne Twister state (RNG_STATE_WORDS little-endian u32), so a loaded state draws
+# the same numbers the saved session went on to draw.
+STATE_MAGIC = b"C8ST"
+STATE_VERSION = 3
+STATE_HEADER = struct.Struct("<4sBHHbBBBddBB")
+RNG_STATE_WORDS = 625
+STATE_SIZE = STATE_HEADER.size + MEMORY_SIZE + 16 + RPL_FLAG_COUNT + 2 * len(EMPTY_STACK) + 8 * DISPLAY_WORDS + 4 * RNG_STATE_WORDS
+NO_WAITING_REGISTER = 0xFF
+
+# Handler names for the predecoder, grouped the same way the opcode families are.
+SYSTEM_OPCODES = {
+	0x00E0: "_op_00E0", 0x00EE: "_op_00EE", 0x00FB: "_op_00FB", 0x00FC: "_op_00FC",
+	0x00FD: "_op_00FD", 0x00FE: "_op_00FE", 0x00FF: "_op_00FF", 0x0230: "_op_0230",
+	**{0x00C0 | N: "_op_00CN" for N in range(16)}
+}
+NNN_OPCODES = {0x1000: "_op_1NNN", 0x2000: "_op_2NNN", 0xA000: "_op_ANNN", 0xB000: "_op_BNNN"}
+XNN_OPCODES = {0x3000: "_op_3XNN", 0x4000: "_op_4XNN", 0x6000: "_op_6XNN", 0x7000: "_op_7XNN", 0xC000: "_op_CXNN"}
+ARITHMETIC_OPCODES = {
+	0x0: "_op_8XY0", 0x1: "_op_8XY1", 0x2: "_op_8XY2", 0x3: "_op_8XY3",
+	0x4: "_op_8XY4", 0x5: "_op_8XY5", 0x6: "_op_8XY6", 0x7: "_op_8XY7", 0xE: "_op_8XYE"
+}
+KEY_OPCODES = {0x9E: "_op_EX9E", 0xA1: "_op_EXA1"}
+MISC_OPCODES = {
+	0x07: "_op_FX07", 0x0A: "_op_FX0A", 0x15: "_op_FX15", 0x18: "_op_FX18", 0x1E: "_op_FX1E",
+	0x29: "_op_FX29", 0x30: "_op_FX30", 0x33: "_op_FX33", 0x55: "_op_FX55", 0x65: "_op_FX65",
+	0x75: "_op_FX75", 0x85: "_op_FX85"
+}
+
+# Behaviours that Chip-8 interpreters disagree on, with the settings each platform used:
+#   shift       8XY6/8XYE shift VX in place ("vx") or shift VY into VX ("vy")
+#   load_store  how far FX55/FX65 move I: not at all (0), by X (CHIP-48) or by X + 1 (VIP)
+#   vf_reset    8XY1/8XY2/8XY3 also clear VF
+#   jump        BNNN adds V0, or BXNN adds VX
+#   fx1e_flag   FX1E sets VF when I passes 0xFFF
+#   clip        sprites are cut off at the screen edges instead of wrapping around
+#   dxy0_16x16  DXY0 draws a 16x16 sprite in lores mode too; otherwise it draws nothing there
+# "modern" is what this core has always done and stays the default.
+QUIRK_PROFILES = {
+	"vip": {"shift": "vy", "load_store": "x+1", "vf_reset": True, "jump": "v0", "fx1e_flag": False, "clip": True, "dxy0_16x16": False},
+	"chip48": {"shift": "vx", "load_store": "x", "vf_reset": False, "jump": "vx", "fx1e_flag": False, "clip": True, "dxy0_16x16": False},
+	"schip": {"shift": "vx", "load_store": "0", "vf_reset": False, "jump": "vx", "fx1e_flag": False, "clip": True, "dxy0_16x16": True},
+	"modern": {"shift": "vx", "load_store": "0", "vf_reset": False, "jump": "v0", "fx1e_flag": True, "clip": False, "dxy0_16x16": True},
+}
+QUIRK_PROFILE_NAMES = ("auto",) + tuple(QUIRK_PROFILES)
+DEFAULT_QUIRK_PROFILE = "modern"
+
+
+def compile_quirks(quirks):
+	"""Handler tables for one quirk setting: the default tables with the affected entries renamed.
+
+	Returns ``(nnn, arithmetic, misc, sprite, big_sprite)`` where the first
+	three replace NNN_OPCODES, ARITHMETIC_OPCODES and MISC_OPCODES and the
+	last two name the DXYN and DXY0 handlers.
+	"""
+	nnn = dict(NNN_OPCODES)
+	arithmetic = dict(ARITHMETIC_OPCODES)
+	misc = dict(MISC_OPCODES)
+	if quirks["shift"] == "vy":
+		arithmetic[0x6] = "_op_8XY6_vy"
+		arithmetic[0xE] = "_op_8XYE_vy"
+	if quirks["vf_reset"]:
+		for N in (0x1, 0x2, 0x3):
+			arithmetic[N] += "_vf_reset"
+	if quirks["jump"] == "vx":
+		nnn[0xB000] = "_op_BXNN"
+	if quirks["load_store"] == "x":
+		misc[0x55], misc[0x65] = "_op_FX55_advance_x", "_op_FX65_advance_x"
+	elif quirks["load_store"] == "x+1":
+		misc[0x55], misc[0x65] = "_op_FX55_advance", "_op_FX65_advance"
+	if not quirks["fx1e_flag"]:
+		misc[0x1E] = "_op_FX1E_no_flag"
+	sprite = "clip_sprite" if quirks["clip"] else "draw_sprite"
+	big_sprite = sprite if quirks["dxy0_16x16"] else "hires_big_sprite"
+	return nnn, arithmetic, misc, sprite, big_sprite
+
+
+COMPILED_QUIRK_PROFILES = {name: compile_quirks(quirks) for name, quirks in QUIRK_PROFILES.items()}
+
+
+class IdleLoop(Exception):
+	"""Raised by a backward jump that lands on a loop head in exactly the state it left it."""
+
+
+def check_rom_size(bytes_of_ROM):
+	if len(bytes_of_ROM) > MAX_ROM_SIZE:
+		raise ValueError(f"ROM is {len(bytes_of_ROM)} bytes; at most {MAX_ROM_SIZE} bytes fit above 0x200")
+
+
+class RomImage:
+	"""A ROM's bytes together with the RAM image it boots from (fonts, then the ROM at 0x200)."""
+
+	def __init__(self, data, mtime_ns=None, size=None):
+		check_rom_size(data)
+		self.data = bytes(data)
+		image = bytearray(BOOT_RAM)
+		image[PROGRAM_START:PROGRAM_START + len(data)] = data
+		self.boot_image = bytes(image)
+		self.mtime_ns = mtime_ns
+		self.size = size
+		# Static analysis (see analyzer.py), loaded the first time the auto engine boots this image.
+		self.analysis = None
+
+
+class RomCache:
+	"""Least-recently-used RomImages keyed by absolute path.
+
+	A cached image is reused only while the file's mtime and size are
+	unchanged, so editing a ROM on disk is picked up on the next load.
+	"""
+
+	def __init__(self, capacity=ROM_CACHE_CAPACITY):
+		self.capacity = capacity
+		self.images = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, path):
+		key = os.path.abspath(path)
+		stat = os.stat(key)
+		image = self.images.get(key)
+		if image and image.mtime_ns == stat.st_mtime_ns and image.size == stat.st_size:
+			self.images.move_to_end(key)
+			self.hits += 1
+			return image
+		with open(key, "rb") as f:
+			image = RomImage(f.read(), stat.st_mtime_ns, stat.st_size)
+		self.images[key] = image
+		self.images.move_to_end(key)
+		while len(self.images) > self.capacity:
+			self.images.popitem(last=False)
+		self.misses += 1
+		return image
+
+	def clear(self):
+		self.images.clear()
+
+
+ROM_CACHE = RomCache()
+
 
 class Chip8:
-	def __init__(self):
+	def __init__(self, engine="interpreter", seed=None, timing="fixed", quirks=DEFAULT_QUIRK_PROFILE):
 		self.characters = FONT_SET
+		# CXNN draws from a per-instance generator that is reseeded on every reset,
+		# so the same seed and the same input always replay the same session.
+		self.seed = random.getrandbits(64) if seed is None else seed
+		self.rng = random.Random(self.seed)
 		self.clock_hz = 700
 		self.ms_per_timer = 1000 / 60
 		self.timer_accumulator = 0.0
+		self.cycle_accumulator = 0.0
+		self.cycle_count = 0
+		self.timing = None
+		self.cycle_costs = None
+		self.frame_cycle_budget = 0
+		self.display_changed = True
+		self.side_effects = 0
+		self.loop_fingerprint = None
+		self.idle = False
+		self.idle_cycles_skipped = 0
 		self.waiting_register = None
+		self.input_events = deque()
 		self.rom_loaded = False
 		self.loaded_rom_bytes = None
+		self.rom_image = None
+		self.rom_cache = ROM_CACHE
 		self.rom_path = None
+		self.decode_cache = [None] * 0x10000
+		self.RAM = bytearray(MEMORY_SIZE)
+		self.V = bytearray(16)
+		self.stack = array("H", EMPTY_STACK)
+		self.keys = bytearray(16)
+		self.display_rows = array("Q", BLANK_ROWS)
+		self.display_width = DISPLAY_WIDTH
+		self.display_height = DISPLAY_HEIGHT
+		self.row_words = 1
+		self.rpl_flags = bytearray(RPL_FLAG_COUNT)
+		self.engine = None
+		self.auto_engine = False
+		self.recompiler = None
+		self.run_cycles = self._run_interpreted
+		self.engine_runner = self.run_cycles
+		self.notify_memory_write = self._ignore_memory_write
+		self.quirk_profile = None
+		self.auto_quirks = False
+		self.set_quirks(quirks)
+		self.set_timing(timing)
+		self.set_engine(engine)
 		self.reset()
 
-	def reset(self):
-		self.PC = 0x200
-		self.RAM = [0] * 4096
-		self.V = [0] * 16
+	def set_engine(self, engine):
+		"""Select an engine by name; "auto" picks one per ROM from its cached static analysis at boot."""
+		if engine not in ENGINES:
+			raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}")
+		self.auto_engine = engine == "auto"
+		if self.auto_engine:
+			engine = self.pick_engine(self.rom_image) if self.rom_image else "interpreter"
+		self.use_engine(engine)
+
+	def use_engine(self, engine):
+		if engine == self.engine:
+			return
+		if engine == "recompiler":
+			from recompiler import BlockRecompiler
+			self.recompiler = BlockRecompiler(self)
+			runner = self.recompiler.run
+			self.notify_memory_write = self.recompiler.invalidate
+		else:
+			self.recompiler = None
+			runner = self._run_interpreted
+			self.notify_memory_write = self._ignore_memory_write
+		# Leave a run loop swapped in by the profiler alone; it restores engine_runner when detached.
+		if self.run_cycles == self.engine_runner:
+			self.run_cycles = runner
+		self.engine_runner = runner
+		self.engine = engine
+
+	def set_timing(self, timing):
+		"""Select how instructions are paced (one of TIMINGS).
+
+		"fixed" runs ``clock_hz`` instructions a second whatever they are.
+		"vip" charges each instruction its approximate COSMAC VIP cost in
+		machine cycles against the cycles the VIP interpreter had per frame,
+		so sprite-heavy code slows down the way it did on the real machine.
+		"""
+		if timing not in TIMINGS:
+			raise ValueError(f"Unknown timing '{timing}', expected one of {', '.join(TIMINGS)}")
+		if timing == self.timing:
+			return
+		if timing == "vip":
+			from timing import VIP_CYCLE_COSTS, VIP_INTERPRETER_CYCLES_PER_FRAME
+			self.cycle_costs = VIP_CYCLE_COSTS
+			self.frame_cycle_budget = VIP_INTERPRETER_CYCLES_PER_FRAME
+		else:
+			self.cycle_costs = None
+			self.frame_cycle_budget = 0
+		self.timing = timing
+		self.cycle_accumulator = 0.0
+		if self.auto_engine and self.rom_image:
+			self.use_engine(self.pick_engine(self.rom_image))
+
+	def set_quirks(self, profile):
+		"""Select a quirk profile by name; "auto" picks one per ROM from its static analysis at boot."""
+		if profile not in QUIRK_PROFILE_NAMES:
+			raise ValueError(f"Unknown quirk profile '{profile}', expected one of {', '.join(QUIRK_PROFILE_NAMES)}")
+		self.auto_quirks = profile == "auto"
+		if self.auto_quirks:
+			profile = self.pick_quirks(self.rom_image) if self.rom_image else DEFAULT_QUIRK_PROFILE
+		self.use_quirks(profile)
+
+	def use_quirks(self, profile):
+		if profile == self.quirk_profile:
+			return
+		self.quirks = QUIRK_PROFILES[profile]
+		self.nnn_opcodes, self.arithmetic_opcodes, self.misc_opcodes, self.sprite_handler, self.big_sprite_handler = COMPILED_QUIRK_PROFILES[profile]
+		self.quirk_profile = profile
+		# Handlers are predecoded per instruction value, so the new tables take over from here.
+		self.clear_decode_cache()
+
+	def pick_quirks(self, rom_image):
+		from analyzer import choose_quirks
+		return choose_quirks(self.rom_analysis(rom_image))
+
+	def rom_analysis(self, rom_image):
+		from analyzer import load_analysis
+		if rom_image.analysis is None:
+			rom_image.analysis = load_analysis(rom_image.data)
+		return rom_image.analysis
+
+	def pick_engine(self, rom_image):
+		if self.cycle_costs is not None:
+			# Timed runs step one instruction at a time, which gives blocks nothing to win.
+			return "interpreter"
+		from analyzer import choose_engine
+		return choose_engine(self.rom_analysis(rom_image), self.clock_hz)
+
+	def reset(self, boot_image=BOOT_RAM):
+		# Buffers are cleared in place so memoryviews handed out by snapshot() stay valid.
+		self.PC = PROGRAM_START
+		self.RAM[:] = boot_image
+		self.V[:] = bytes(16)
 		self.DT = 0
 		self.ST = 0
 		self.I = 0
 		self.SP = -1
-		self.stack = [0] * 16
-		self.keys = [0] * 16
-		self.Display = [[0 for _ in range(DISPLAY_WIDTH)] for _ in range(DISPLAY_HEIGHT)]
+		self.stack[:] = EMPTY_STACK
+		self.keys[:] = bytes(16)
+		self.input_events.clear()
+		self.rpl_flags[:] = bytes(RPL_FLAG_COUNT)
+		self.set_resolution(DISPLAY_WIDTH, DISPLAY_HEIGHT)
 		self.timer_accumulator = 0.0
+		self.cycle_accumulator = 0.0
+		self.cycle_count = 0
 		self.waiting_register = None
 		self.rom_loaded = False
-		for i in range(len(self.characters)):
-			for j in range(5):
-				hex_value = self.characters[i][j]
-				self.RAM[(5 * i) + j] = int(hex_value, base=16)
+		self.rng.seed(self.seed)
+		self.notify_memory_write(0, MEMORY_SIZE)
 
 	def load_rom_from_path(self, path):
-		rom_path = Path(path)
-		bytes_of_ROM = self.open_ROM(rom_path)
-		self.reset()
-		self.load_ROM(bytes_of_ROM)
-		self.rom_path = str(rom_path)
+		self.boot(self.rom_cache.get(path))
+		self.rom_path = str(Path(path))
 
 	def reload_current_rom(self):
 		if self.loaded_rom_bytes is None:
 			return
-		data = bytes(self.loaded_rom_bytes)
-		self.reset()
-		self.load_ROM(data)
+		if self.rom_image is None:
+			self.rom_image = RomImage(self.loaded_rom_bytes)
+		self.boot(self.rom_image)
+
+	def boot(self, rom_image):
+		"""Reset into a RomImage, the same as ``reset()`` then ``load_ROM``, with one RAM copy.
+
+		Predecoded handlers are kept, and so are recompiled blocks whose code is unchanged.
+		"""
+		if self.auto_quirks:
+			self.use_quirks(self.pick_quirks(rom_image))
+		if self.auto_engine:
+			self.use_engine(self.pick_engine(rom_image))
+		self.reset(rom_image.boot_image)
+		self.rom_image = rom_image
+		self.loaded_rom_bytes = rom_image.data
+		self.rom_loaded = True
+		if rom_image.data[:2] == VIP_HIRES_SIGNATURE:
+			self.set_resolution(DISPLAY_WIDTH, VIP_HIRES_HEIGHT)
+			self.PC = VIP_HIRES_ENTRY
 
 	def update(self, ms_delay):
+		if self.input_events:
+			self.apply_input_events()
 		if not self.rom_loaded:
 			return
-		cycles = max(1, int((ms_delay / 1000.0) * self.clock_hz))
-		for _ in range(cycles):
-			self.one_tick()
+		if self.cycle_costs is None:
+			# Carry the fractional cycle over so the long-run rate is exactly clock_hz.
+			self.cycle_accumulator += (ms_delay / 1000.0) * self.clock_hz
+			cycles = int(self.cycle_accumulator + 1e-9)
+			self.cycle_accumulator -= cycles
+			self.cycle_count += cycles
+			self.run_cycles(cycles)
+		else:
+			# cycle_count advances by machine cycles of emulated time, spent or not,
+			# just as fixed timing counts clock slots while blocked on FX0A.
+			budget = ms_delay / self.ms_per_timer * self.frame_cycle_budget
+			self.cycle_count += round(budget)
+			self.run_timed(budget)
 		self._update_timers(ms_delay)
 
+	def run_timed(self, budget):
+		"""Run instructions until ``budget`` machine cycles, plus any overrun carried in, are spent.
+
+		Each instruction is charged from ``cycle_costs`` and run through
+		``run_cycles`` on its own, so the profiler still sees it. Like the VIP
+		interpreter, a sprite draw waits for the next display interrupt, so
+		only the first DXYN of a frame runs in it. Waiting for a key burns the
+		rest of the budget.
+		"""
+		budget += self.cycle_accumulator
+		costs = self.cycle_costs
+		RAM = self.RAM
+		run_cycles = self.run_cycles
+		executed = 0
+		while budget > 0:
+			if self.waiting_register is not None:
+				budget = 0.0
+				break
+			PC = self.PC
+			instruction = (RAM[PC] << 8) | RAM[PC + 1]
+			if executed and instruction & 0xF000 == 0xD000:
+				budget = 0.0
+				break
+			budget -= costs[instruction]
+			executed += 1
+			run_cycles(1)
+		self.cycle_accumulator = budget
+
+	def run_frame(self):
+		"""Advance one 60 Hz frame of emulated time."""
+		self.update(self.ms_per_timer)
+
+	def consume_display_changed(self):
+		"""Report whether the framebuffer changed since the last call, then clear the flag."""
+		changed = self.display_changed
+		self.display_changed = False
+		return changed
+
+	def is_waiting_for_input(self):
+		"""True when only a key event (or a new ROM or state) can change the machine.
+
+		That is the case with no ROM loaded, or while blocked on FX0A or spinning
+		in an idle loop with both timers at zero. The host can stop running
+		frames until the next key press or release.
+		"""
+		if not self.rom_loaded:
+			return True
+		if self.DT or self.ST or self.input_events:
+			return False
+		if self.waiting_register is not None:
+			return True
+		# The loop must have been spinning with the timers already at zero (fingerprint
+		# fields DT and ST); a DT poll that only saw DT reach zero after this frame's
+		# instructions will exit on the next one.
+		return self.idle and self.loop_fingerprint[4:6] == (0, 0)
+
+	def _run_interpreted(self, cycles):
+		self.loop_fingerprint = None
+		self.idle = False
+		executed = 0
+		try:
+			for executed in range(1, cycles + 1):
+				self._tick()
+		except IdleLoop:
+			self.skip_idle_loop(cycles - executed)
+
+	def check_idle_loop(self, target):
+		"""Called on every backward jump; raises IdleLoop when the loop cannot make progress.
+
+		Within one slice the keys and timers are fixed, so if a loop head is
+		reached twice with identical registers and no memory, display or RNG
+		side effects in between, the loop will repeat the same way until the
+		slice ends.
+		"""
+		fingerprint = (target, bytes(self.V), self.I, self.SP, self.DT, self.ST, self.side_effects)
+		if fingerprint == self.loop_fingerprint:
+			raise IdleLoop
+		self.loop_fingerprint = fingerprint
+
+	def skip_idle_loop(self, remaining):
+		"""Fast-forward through an idle loop that has just been detected at its head.
+
+		One more pass measures the loop's period; the whole periods that fit in
+		``remaining`` are skipped and the leftover instructions are run, so the
+		machine ends the slice exactly where it would have without skipping.
+		"""
+		period = 0
+		try:
+			while period < remaining:
+				period += 1
+				self._tick()
+			return
+		except IdleLoop:
+			pass
+		remaining -= period
+		skipped = remaining - remaining % period
+		self.idle = True
+		self.idle_cycles_skipped += skipped
+		for _ in range(remaining - skipped):
+			self._tick()
+
+	def _ignore_memory_write(self, start, end):
+		pass
+
 	def _update_timers(self, ms_delay):
 		self.timer_accumulator += ms_delay
 		while self.timer_accumulator >= self.ms_per_timer:
@@ -95,13 +564,38 @@ class Chip8:
 			self.V[self.waiting_register] = key_index
 			self.waiting_register = None
 
+	def queue_key_event(self, key_index, pressed, timestamp=None):
+		"""Queue a key event to be applied at the start of the next frame.
+
+		``timestamp`` is the ``time.perf_counter()`` time the host saw the
+		event, kept for latency tracing.
+		"""
+		self.input_events.append((key_index, pressed, timestamp))
+
+	def apply_input_events(self):
+		"""Apply queued key events in order; ``update`` calls this before each frame's instructions."""
+		events = self.input_events
+		while events:
+			key_index, pressed, _ = events.popleft()
+			self.set_key_state(key_index, pressed)
+
 	def one_tick(self):
+		"""Run a single instruction; safe for single-stepping, unlike the run loops' ``_tick``."""
+		try:
+			self._tick()
+		except IdleLoop:
+			# The jump has already landed; an idle loop only matters to a running slice.
+			pass
+
+	def _tick(self):
 		if not self.rom_loaded:
 			return
 		if self.waiting_register is not None:
 			return
-		instruction = self.get_next_opcode()
-		self.run_opcode(instruction)
+		PC = self.PC
+		instruction = (self.RAM[PC] << 8) | self.RAM[PC + 1]
+		self.PC = PC + 2
+		(self.decode_cache[instruction] or self.decode_instruction(instruction))()
 
 	def open_ROM(self, path):
 		"""
@@ -112,13 +606,28 @@ class Chip8:
 			bytes_of_ROM = f.read()
 		return bytes_of_ROM
 
+	def check_ROM_size(self, bytes_of_ROM):
+		check_rom_size(bytes_of_ROM)
+
 	def load_ROM(self, bytes_of_ROM):
-		start = 0x200
-		for byte in bytes_of_ROM:
-			self.RAM[start] = byte
-			start += 1
+		self.check_ROM_size(bytes_of_ROM)
+		end = PROGRAM_START + len(bytes_of_ROM)
+		self.RAM[PROGRAM_START:end] = bytes_of_ROM
+		self.notify_memory_write(PROGRAM_START, end)
 		self.loaded_rom_bytes = bytes(bytes_of_ROM)
+		self.rom_image = None
 		self.rom_loaded = True
+		if self.PC == PROGRAM_START and bytes_of_ROM[:2] == VIP_HIRES_SIGNATURE:
+			# Stand in for the ROM's own display routine: switch to 64x64 and enter the program.
+			self.set_resolution(DISPLAY_WIDTH, VIP_HIRES_HEIGHT)
+			self.PC = VIP_HIRES_ENTRY
+
+	def set_resolution(self, width, height):
+		"""Switch the display mode (one of RESOLUTIONS) and clear the screen."""
+		self.display_width = width
+		self.display_height = height
+		self.row_words = width // DISPLAY_WIDTH
+		self._op_00E0()
 
 	def get_byte_at_address(self, address):
 		return self.RAM[address]
@@ -135,6 +644,20 @@ class Chip8:
 
 	def run_opcode(self, instruction):
 		instruction &= 0xFFFF
+		(self.decode_cache[instruction] or self.decode_instruction(instruction))()
+
+	def clear_decode_cache(self):
+		"""Forget every predecoded handler, e.g. after swapping a handler method on the instance."""
+		self.decode_cache[:] = [None] * 0x10000
+		if self.recompiler:
+			self.recompiler.clear()
+
+	def decode_instruction(self, instruction):
+		"""Bind the handler for a 16-bit instruction to its operands and cache it.
+
+		The cache is keyed by instruction value rather than address, so it never
+		needs invalidating when RAM changes.
+		"""
 		opcode = instruction & 0xF000
 		X = (instruction & 0x0F00) >> 8
 		Y = (instruction & 0x00F0) >> 4
@@ -143,131 +666,547 @@ class Chip8:
 		N = instruction & 0x000F
 
 		if opcode == 0x0000:
-			if instruction == 0x00E0:
-				for i in range(len(self.Display)):
-					for j in range(len(self.Display[0])):
-						self.Display[i][j] = 0
-			elif instruction == 0x00EE:
-				if self.SP < 0:
-					return
-				self.PC = self.stack[self.SP]
-				self.SP -= 1
-		elif opcode == 0x1000:
-			self.PC = NNN
-		elif opcode == 0x2000:
-			self.SP = (self.SP + 1) % len(self.stack)
-			self.stack[self.SP] = self.PC
-			self.PC = NNN
-		elif opcode == 0x3000:
-			if self.V[X] == NN:
-				self.PC += 2
-		elif opcode == 0x4000:
-			if self.V[X] != NN:
-				self.PC += 2
-		elif opcode == 0x5000:
-			if (instruction & 0x000F) == 0 and self.V[X] == self.V[Y]:
-				self.PC += 2
-		elif opcode == 0x6000:
-			self.V[X] = NN
-		elif opcode == 0x7000:
-			self.V[X] = (self.V[X] + NN) & MAX8BIT
+			name = SYSTEM_OPCODES.get(instruction)
+			if name == "_op_00CN":
+				handler = partial(self._op_00CN, N)
+			else:
+				handler = getattr(self, name) if name else self._op_nop
+		elif opcode in (0x1000, 0x2000, 0xA000, 0xB000):
+			handler = partial(getattr(self, self.nnn_opcodes[opcode]), NNN)
+		elif opcode in (0x3000, 0x4000, 0x6000, 0x7000, 0xC000):
+			handler = partial(getattr(self, XNN_OPCODES[opcode]), X, NN)
+		elif opcode in (0x5000, 0x9000):
+			if N == 0:
+				handler = partial(self._op_5XY0 if opcode == 0x5000 else self._op_9XY0, X, Y)
+			else:
+				handler = self._op_nop
 		elif opcode == 0x8000:
-			last_nibble = instruction & 0x000F
-			if last_nibble == 0x0:
-				self.V[X] = self.V[Y]
-			elif last_nibble == 0x1:
-				self.V[X] = self.V[X] | self.V[Y]
-			elif last_nibble == 0x2:
-				self.V[X] = self.V[X] & self.V[Y]
-			elif last_nibble == 0x3:
-				self.V[X] = self.V[X] ^ self.V[Y]
-			elif last_nibble == 0x4:
-				result = self.V[X] + self.V[Y]
-				self.V[0xF] = 1 if result > MAX8BIT else 0
-				self.V[X] = result & MAX8BIT
-			elif last_nibble == 0x5:
-				self.V[0xF] = 1 if self.V[X] >= self.V[Y] else 0
-				self.V[X] = (self.V[X] - self.V[Y]) & MAX8BIT
-			elif last_nibble == 0x6:
-				self.V[0xF] = self.V[X] & 1
-				self.V[X] = (self.V[X] >> 1) & MAX8BIT
-			elif last_nibble == 0x7:
-				self.V[0xF] = 1 if self.V[Y] >= self.V[X] else 0
-				self.V[X] = (self.V[Y] - self.V[X]) & MAX8BIT
-			elif last_nibble == 0xE:
-				self.V[0xF] = 1 if (self.V[X] & 0x80) else 0
-				self.V[X] = (self.V[X] << 1) & MAX8BIT
-		elif opcode == 0x9000:
-			if (instruction & 0x000F) == 0 and self.V[X] != self.V[Y]:
-				self.PC += 2
-		elif opcode == 0xA000:
-			self.I = NNN
-		elif opcode == 0xB000:
-			self.PC = (self.V[0] + NNN) & 0xFFF
-		elif opcode == 0xC000:
-			random_number = random.randint(0, 255)
-			self.V[X] = random_number & NN
+			name = self.arithmetic_opcodes.get(N)
+			handler = partial(getattr(self, name), X, Y) if name else self._op_nop
 		elif opcode == 0xD000:
-			self.draw_sprite(X, Y, N)
+			handler = partial(getattr(self, self.sprite_handler if N else self.big_sprite_handler), X, Y, N)
 		elif opcode == 0xE000:
-			key_index = self.V[X] & 0xF
-			if NN == 0x9E:
-				if self.keys[key_index] == 1:
-					self.PC += 2
-			elif NN == 0xA1:
-				if self.keys[key_index] == 0:
-					self.PC += 2
-		elif opcode == 0xF000:
-			if NN == 0x07:
-				self.V[X] = self.DT
-			elif NN == 0x0A:
-				self.waiting_register = X
-			elif NN == 0x15:
-				self.DT = self.V[X]
-			elif NN == 0x18:
-				self.ST = self.V[X]
-			elif NN == 0x1E:
-				self.I += self.V[X]
-				if self.I > 0xFFF:
-					self.V[0xF] = 1
-					self.I &= 0xFFF
-				else:
-					self.V[0xF] = 0
-			elif NN == 0x29:
-				self.I = self.V[X] * 5
-			elif NN == 0x33:
-				number = self.V[X]
-				H = number // 100
-				T = (number // 10) % 10
-				O = number % 10
-				self.RAM[self.I] = H
-				self.RAM[self.I + 1] = T
-				self.RAM[self.I + 2] = O
-			elif NN == 0x55:
-				for i in range(X + 1):
-					self.RAM[self.I + i] = self.V[i]
-			elif NN == 0x65:
-				for i in range(X + 1):
-					# print(type(self.RAM[self.I + i]))
-					self.V[i] = int(self.RAM[self.I + i])
+			name = KEY_OPCODES.get(NN)
+			handler = partial(getattr(self, name), X) if name else self._op_nop
+		else:
+			name = self.misc_opcodes.get(NN)
+			handler = partial(getattr(self, name), X) if name else self._op_nop
+		self.decode_cache[instruction] = handler
+		return handler
+
+	def _op_nop(self):
+		pass
+
+	def _op_00E0(self):
+		self.display_rows[:] = BLANK_ROWS
+		self.display_changed = True
+		self.side_effects += 1
+
+	def _op_00EE(self):
+		if self.SP < 0:
+			return
+		self.PC = self.stack[self.SP]
+		self.SP -= 1
+
+	def _op_00CN(self, N):
+		# Scroll down N rows: one slice move of whole rows, then blank the top.
+		rows = self.display_rows
+		used = self.display_height * self.row_words
+		shift = min(N, self.display_height) * self.row_words
+		rows[shift:used] = rows[:used - shift]
+		rows[:shift] = BLANK_ROWS[:shift]
+		self.display_changed = True
+		self.side_effects += 1
+
+	def _op_00FB(self):
+		self.scroll_sideways(right=True)
+
+	def _op_00FC(self):
+		self.scroll_sideways(right=False)
+
+	def scroll_sideways(self, right):
+		"""Scroll the display SCROLL_STEP pixels right or left with one shift of the whole frame."""
+		used = self.display_height * self.row_words
+		frame = array("Q", self.display_rows[:used])
+		if sys.byteorder == "little":
+			frame.byteswap()
+		bits = int.from_bytes(frame, "big")
+		keep_right, keep_left = SCROLL_MASKS[(self.display_width, self.display_height)]
+		if right:
+			bits = (bits >> SCROLL_STEP) & keep_right
+		else:
+			bits = (bits << SCROLL_STEP) & keep_left
+		frame = array("Q")
+		frame.frombytes(bits.to_bytes(8 * used, "big"))
+		if sys.byteorder == "little":
+			frame.byteswap()
+		self.display_rows[:used] = frame
+		self.display_changed = True
+		self.side_effects += 1
+
+	def _op_00FD(self):
+		# SUPER-CHIP exit: stop running until the ROM is reloaded.
+		self.rom_loaded = False
+
+	def _op_00FE(self):
+		self.set_resolution(DISPLAY_WIDTH, DISPLAY_HEIGHT)
+
+	def _op_00FF(self):
+		self.set_resolution(HIRES_WIDTH, HIRES_HEIGHT)
+
+	def _op_0230(self):
+		# VIP hires programs clear their 64x64 screen by calling the machine-code routine at 0x230.
+		if self.display_height == VIP_HIRES_HEIGHT and self.row_words == 1:
+			self._op_00E0()
+
+	def _op_1NNN(self, NNN):
+		PC = self.PC
+		self.PC = NNN
+		if NNN < PC:
+			self.check_idle_loop(NNN)
+
+	def _op_2NNN(self, NNN):
+		self.SP = (self.SP + 1) % len(self.stack)
+		self.stack[self.SP] = self.PC
+		self.PC = NNN
+
+	def _op_3XNN(self, X, NN):
+		if self.V[X] == NN:
+			self.PC += 2
+
+	def _op_4XNN(self, X, NN):
+		if self.V[X] != NN:
+			self.PC += 2
+
+	def _op_5XY0(self, X, Y):
+		if self.V[X] == self.V[Y]:
+			self.PC += 2
+
+	def _op_6XNN(self, X, NN):
+		self.V[X] = NN
+
+	def _op_7XNN(self, X, NN):
+		V = self.V
+		V[X] = (V[X] + NN) & MAX8BIT
+
+	def _op_8XY0(self, X, Y):
+		self.V[X] = self.V[Y]
+
+	def _op_8XY1(self, X, Y):
+		self.V[X] |= self.V[Y]
+
+	def _op_8XY2(self, X, Y):
+		self.V[X] &= self.V[Y]
+
+	def _op_8XY3(self, X, Y):
+		self.V[X] ^= self.V[Y]
+
+	def _op_8XY1_vf_reset(self, X, Y):
+		V = self.V
+		V[X] |= V[Y]
+		V[0xF] = 0
+
+	def _op_8XY2_vf_reset(self, X, Y):
+		V = self.V
+		V[X] &= V[Y]
+		V[0xF] = 0
+
+	def _op_8XY3_vf_reset(self, X, Y):
+		V = self.V
+		V[X] ^= V[Y]
+		V[0xF] = 0
+
+	def _op_8XY4(self, X, Y):
+		V = self.V
+		result = V[X] + V[Y]
+		V[0xF] = 1 if result > MAX8BIT else 0
+		V[X] = result & MAX8BIT
+
+	def _op_8XY5(self, X, Y):
+		V = self.V
+		V[0xF] = 1 if V[X] >= V[Y] else 0
+		V[X] = (V[X] - V[Y]) & MAX8BIT
+
+	def _op_8XY6(self, X, Y):
+		V = self.V
+		V[0xF] = V[X] & 1
+		V[X] = (V[X] >> 1) & MAX8BIT
+
+	def _op_8XY7(self, X, Y):
+		V = self.V
+		V[0xF] = 1 if V[Y] >= V[X] else 0
+		V[X] = (V[Y] - V[X]) & MAX8BIT
+
+	def _op_8XYE(self, X, Y):
+		V = self.V
+		V[0xF] = 1 if (V[X] & 0x80) else 0
+		V[X] = (V[X] << 1) & MAX8BIT
+
+	def _op_8XY6_vy(self, X, Y):
+		V = self.V
+		flag = V[Y] & 1
+		V[X] = V[Y] >> 1
+		V[0xF] = flag
+
+	def _op_8XYE_vy(self, X, Y):
+		V = self.V
+		flag = V[Y] >> 7
+		V[X] = (V[Y] << 1) & MAX8BIT
+		V[0xF] = flag
+
+	def _op_9XY0(self, X, Y):
+		if self.V[X] != self.V[Y]:
+			self.PC += 2
+
+	def _op_ANNN(self, NNN):
+		self.I = NNN
+
+	def _op_BNNN(self, NNN):
+		self.PC = (self.V[0] + NNN) & 0xFFF
+
+	def _op_BXNN(self, NNN):
+		self.PC = (self.V[NNN >> 8] + NNN) & 0xFFF
+
+	def _op_CXNN(self, X, NN):
+		self.V[X] = self.rng.getrandbits(8) & NN
+		self.side_effects += 1
+
+	def _op_EX9E(self, X):
+		if self.keys[self.V[X] & 0xF] == 1:
+			self.PC += 2
+
+	def _op_EXA1(self, X):
+		if self.keys[self.V[X] & 0xF] == 0:
+			self.PC += 2
+
+	def _op_FX07(self, X):
+		self.V[X] = self.DT
+
+	def _op_FX0A(self, X):
+		self.waiting_register = X
+
+	def _op_FX15(self, X):
+		self.DT = self.V[X]
+
+	def _op_FX18(self, X):
+		self.ST = self.V[X]
+
+	def _op_FX1E(self, X):
+		self.I += self.V[X]
+		if self.I > 0xFFF:
+			self.V[0xF] = 1
+			self.I &= 0xFFF
+		else:
+			self.V[0xF] = 0
+
+	def _op_FX1E_no_flag(self, X):
+		self.I = (self.I + self.V[X]) & 0xFFF
+
+	def _op_FX29(self, X):
+		# Only the low nibble picks the digit, as on the VIP; the big font starts straight after the small one.
+		self.I = (self.V[X] & 0xF) * 5
+
+	def _op_FX30(self, X):
+		self.I = BIG_FONT_ADDRESS + 10 * (self.V[X] & 0xF)
+
+	def _op_FX33(self, X):
+		number = self.V[X]
+		self.RAM[self.I] = number // 100
+		self.RAM[self.I + 1] = (number // 10) % 10
+		self.RAM[self.I + 2] = number % 10
+		self.notify_memory_write(self.I, self.I + 3)
+		self.side_effects += 1
+
+	def _op_FX55(self, X):
+		for i in range(X + 1):
+			self.RAM[self.I + i] = self.V[i]
+		self.notify_memory_write(self.I, self.I + X + 1)
+		self.side_effects += 1
+
+	def _op_FX65(self, X):
+		for i in range(X + 1):
+			self.V[i] = int(self.RAM[self.I + i])
+
+	def _op_FX55_advance(self, X):
+		self._op_FX55(X)
+		self.I = (self.I + X + 1) & 0xFFF
+
+	def _op_FX65_advance(self, X):
+		self._op_FX65(X)
+		self.I = (self.I + X + 1) & 0xFFF
+
+	def _op_FX55_advance_x(self, X):
+		self._op_FX55(X)
+		self.I = (self.I + X) & 0xFFF
+
+	def _op_FX65_advance_x(self, X):
+		self._op_FX65(X)
+		self.I = (self.I + X) & 0xFFF
+
+	def _op_FX75(self, X):
+		self.rpl_flags[:X + 1] = self.V[:X + 1]
+		self.side_effects += 1
+
+	def _op_FX85(self, X):
+		self.V[:X + 1] = self.rpl_flags[:X + 1]
+
+	def save_state(self):
+		"""Serialize the full machine state into a compact ``bytes`` image."""
+		waiting = NO_WAITING_REGISTER if self.waiting_register is None else self.waiting_register
+		header = STATE_HEADER.pack(
+			STATE_MAGIC, STATE_VERSION, self.PC, self.I, self.SP, self.DT, self.ST, waiting,
+			self.timer_accumulator, self.cycle_accumulator, self.display_width, self.display_height
+		)
+		stack = self.stack
+		rows = self.display_rows
+		rng = array("I", self.rng.getstate()[1])
+		if sys.byteorder == "big":
+			stack = array("H", stack)
+			stack.byteswap()
+			rows = array("Q", rows)
+			rows.byteswap()
+			rng.byteswap()
+		return b"".join((header, self.RAM, self.V, self.rpl_flags, stack.tobytes(), rows.tobytes(), rng.tobytes()))
+
+	def load_state(self, data):
+		if len(data) != STATE_SIZE:
+			raise ValueError(f"Save state is {len(data)} bytes, expected {STATE_SIZE}")
+		(magic, version, PC, I, SP, DT, ST, waiting, timer_accumulator, cycle_accumulator,
+			width, height) = STATE_HEADER.unpack_from(data)
+		if magic != STATE_MAGIC or version != STATE_VERSION:
+			raise ValueError("Not a Chip-8 save state, or one written by an incompatible version")
+		if (width, height) not in RESOLUTIONS:
+			raise ValueError(f"Save state has an unsupported {width}x{height} display")
+		view = memoryview(data)
+		offset = STATE_HEADER.size
+		self.RAM[:] = view[offset:offset + MEMORY_SIZE]
+		offset += MEMORY_SIZE
+		self.V[:] = view[offset:offset + 16]
+		offset += 16
+		self.rpl_flags[:] = view[offset:offset + RPL_FLAG_COUNT]
+		offset += RPL_FLAG_COUNT
+		stack = array("H")
+		stack.frombytes(view[offset:offset + 2 * len(self.stack)])
+		offset += 2 * len(self.stack)
+		rows = array("Q")
+		rows.frombytes(view[offset:offset + 8 * DISPLAY_WORDS])
+		offset += 8 * DISPLAY_WORDS
+		rng = array("I")
+		rng.frombytes(view[offset:])
+		if sys.byteorder == "big":
+			stack.byteswap()
+			rows.byteswap()
+			rng.byteswap()
+		self.rng.setstate((random.Random.VERSION, tuple(rng), None))
+		self.stack[:] = stack
+		self.display_rows[:] = rows
+		self.display_width = width
+		self.display_height = height
+		self.row_words = width // DISPLAY_WIDTH
+		self.PC = PC
+		self.I = I
+		self.SP = SP
+		self.DT = DT
+		self.ST = ST
+		self.waiting_register = None if waiting == NO_WAITING_REGISTER else waiting
+		self.timer_accumulator = timer_accumulator
+		self.cycle_accumulator = cycle_accumulator
+		self.display_changed = True
+		self.rom_loaded = True
+		self.notify_memory_write(0, MEMORY_SIZE)
+
+	def snapshot(self):
+		"""Return read-only memoryviews over the live machine state without copying it.
+
+		The views track the running machine; copy them (``bytes(view)``) to
+		keep a frozen image. ``video`` holds the native-endian 64-bit words of
+		``display_rows``; ``width`` and ``height`` give the display mode they
+		were packed in.
+		"""
+		return MachineSnapshot(self)
+
+	def frame_rows(self):
+		"""The visible frame as one ``display_width``-bit int per row."""
+		return visible_rows(self.display_rows, self.display_width, self.display_height)
+
+	@property
+	def Display(self):
+		"""Row/column view of the current frame: ``Display[y][x]`` is 0 or 1."""
+		return DisplayView(self.frame_rows(), self.display_width)
+
+	def get_pixel(self, x, y):
+		return (self.frame_rows()[y] >> (self.display_width - 1 - x)) & 1
 
 	def draw_sprite(self, X, Y, N):
-		self.V[0xF] = 0
-		start_x = self.V[X] % DISPLAY_WIDTH
-		start_y = self.V[Y] % DISPLAY_HEIGHT
+		if self.row_words != 1 or not N:
+			self.draw_wide_sprite(X, Y, N)
+			return
+		V = self.V
+		V[0xF] = 0
+		height = self.display_height
+		start_x = V[X] % DISPLAY_WIDTH
+		start_y = V[Y] % height
+		rows = self.display_rows
+		RAM = self.RAM
+		I = self.I
+		shift = SPRITE_SHIFT - start_x
+		self.display_changed = True
+		self.side_effects += 1
 		for i in range(N):
-			# if Y + i >= 32:
-			#     break
-			number = self.RAM[self.I + i]
-			byte = '{:08b}'.format(number)
-			for j in range(8):
-				# if X + j >= 64:
-				#     break
-				bit = byte[j]
-				if bit == "0":
-					continue
-				row = (start_y + i) % DISPLAY_HEIGHT
-				col = (start_x + j) % DISPLAY_WIDTH
-				if self.Display[row][col] == 1:
-					self.V[0xF] = 1
-				self.Display[row][col] ^= 1
+			byte = RAM[I + i]
+			if not byte:
+				continue
+			if shift >= 0:
+				bits = byte << shift
+			else:
+				# The sprite runs off the right edge, so rotate the overflow back to column 0.
+				bits = ((byte >> -shift) | (byte << (DISPLAY_WIDTH + shift))) & ROW_MASK
+			row = (start_y + i) % height
+			current = rows[row]
+			if current & bits:
+				V[0xF] = 1
+			rows[row] = current ^ bits
+
+	def clip_sprite(self, X, Y, N):
+		"""DXYN for quirk profiles that cut sprites off at the right and bottom edges instead of wrapping."""
+		if self.row_words != 1 or not N:
+			self.draw_wide_sprite(X, Y, N, clip=True)
+			return
+		V = self.V
+		V[0xF] = 0
+		height = self.display_height
+		start_x = V[X] % DISPLAY_WIDTH
+		start_y = V[Y] % height
+		rows = self.display_rows
+		RAM = self.RAM
+		I = self.I
+		shift = SPRITE_SHIFT - start_x
+		self.display_changed = True
+		self.side_effects += 1
+		for i in range(min(N, height - start_y)):
+			byte = RAM[I + i]
+			if not byte:
+				continue
+			bits = byte << shift if shift >= 0 else byte >> -shift
+			row = start_y + i
+			current = rows[row]
+			if current & bits:
+				V[0xF] = 1
+			rows[row] = current ^ bits
+
+	def hires_big_sprite(self, X, Y, N):
+		"""DXY0 for the VIP and CHIP-48: a 16x16 sprite only in the 128x64 mode, nothing in lores."""
+		if self.row_words == 2:
+			self.draw_wide_sprite(X, Y, N, clip=self.quirks["clip"])
+		else:
+			self.V[0xF] = 0
+
+	def draw_wide_sprite(self, X, Y, N, clip=False):
+		"""DXYN on the 128-pixel SUPER-CHIP display, and the 16x16 DXY0 sprite in any mode."""
+		V = self.V
+		V[0xF] = 0
+		width = self.display_width
+		height = self.display_height
+		start_x = V[X] % width
+		start_y = V[Y] % height
+		rows = self.display_rows
+		RAM = self.RAM
+		I = self.I
+		wide = self.row_words == 2
+		if N:
+			sprite_width, sprite_rows = 8, N
+		else:
+			sprite_width, sprite_rows = 16, 16
+		shift = width - sprite_width - start_x
+		row_mask = (1 << width) - 1
+		if clip:
+			sprite_rows = min(sprite_rows, height - start_y)
+		self.display_changed = True
+		self.side_effects += 1
+		for i in range(sprite_rows):
+			if N:
+				bits = RAM[I + i]
+			else:
+				bits = (RAM[I + 2 * i] << 8) | RAM[I + 2 * i + 1]
+			if not bits:
+				continue
+			if shift >= 0:
+				bits <<= shift
+			elif clip:
+				bits >>= -shift
+			else:
+				bits = ((bits >> -shift) | (bits << (width + shift))) & row_mask
+			row = (start_y + i) % height
+			if wide:
+				index = 2 * row
+				current = (rows[index] << 64) | rows[index + 1]
+				if current & bits:
+					V[0xF] = 1
+				current ^= bits
+				rows[index] = current >> 64
+				rows[index + 1] = current & ROW_MASK
+			else:
+				current = rows[row]
+				if current & bits:
+					V[0xF] = 1
+				rows[row] = current ^ bits
+
+
+def visible_rows(words, width, height):
+	"""Unpack ``height`` rows of packed display words into one ``width``-bit int per row."""
+	if width == DISPLAY_WIDTH:
+		return words[:height]
+	return [(words[index] << 64) | words[index + 1] for index in range(0, 2 * height, 2)]
+
+
+class MachineSnapshot:
+	def __init__(self, chip8):
+		self.ram = memoryview(chip8.RAM).toreadonly()
+		self.registers = memoryview(chip8.V).toreadonly()
+		self.stack = memoryview(chip8.stack).toreadonly()
+		self.keys = memoryview(chip8.keys).toreadonly()
+		self.video = memoryview(chip8.display_rows).toreadonly()
+		self.width = chip8.display_width
+		self.height = chip8.display_height
+		self.PC = chip8.PC
+		self.I = chip8.I
+		self.SP = chip8.SP
+		self.DT = chip8.DT
+		self.ST = chip8.ST
+
+
+class DisplayView:
+	"""Read-only ``[row][column]`` access to a list of frame rows."""
+
+	def __init__(self, rows, width=DISPLAY_WIDTH):
+		self.rows = rows
+		self.width = width
+
+	def __len__(self):
+		return len(self.rows)
+
+	def __getitem__(self, y):
+		return DisplayRowView(self.rows[y], self.width)
+
+	def __iter__(self):
+		return (DisplayRowView(row, self.width) for row in self.rows)
+
+
+class DisplayRowView:
+	def __init__(self, bits, width=DISPLAY_WIDTH):
+		self.bits = bits
+		self.width = width
+
+	def __len__(self):
+		return self.width
+
+	def __getitem__(self, x):
+		if x < 0:
+			x += self.width
+		if not 0 <= x < self.width:
+			raise IndexError("display column out of range")
+		return (self.bits >> (self.width - 1 - x)) & 1
+
+	def __iter__(self):
+		bits = self.bits
+		return ((bits >> shift) & 1 for shift in range(self.width - 1, -1, -1))
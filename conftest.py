@@ -0,0 +1,14 @@
+# Lets the tests import the top-level modules when pytest runs from the repository root.
+import pytest
+
+from chip8emulator import Chip8
+
+
+@pytest.fixture
+def boot():
+    """Factory for an interpreter-run Chip8 with a short program loaded at 0x200."""
+    def boot(program, **kwargs):
+        cpu = Chip8(engine="interpreter", seed=0, **kwargs)
+        cpu.load_ROM(bytes(program))
+        return cpu
+    return boot
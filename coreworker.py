@@ -0,0 +1,219 @@
+import threading
+from array import array
+from multiprocessing import shared_memory
+
+from chip8emulator import DISPLAY_WIDTH, DISPLAY_WORDS, visible_rows
+from scheduler import FrameScheduler
+
+KEY_RING_CAPACITY = 256
+
+
+class SharedFramebuffer:
+    """Double-buffered display words in a ``multiprocessing.shared_memory`` block.
+
+    The block holds 64-bit words: the number of the latest published frame,
+    then two slots of ``[sequence, width << 16 | height, display words...]``,
+    each big enough for the largest display mode. Frame ``n`` is
+    written to slot ``n & 1``; the slot's sequence is odd while it is being
+    written and ``2 * n`` once it is complete, so a reader that copies a slot
+    while the writer laps it notices and retries. The writer never waits for
+    the reader.
+    """
+
+    def __init__(self, words=DISPLAY_WORDS, name=None):
+        self.words_per_frame = words
+        self.owner = name is None
+        size = 8 * (1 + 2 * (2 + words))
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.words = self.memory.buf.cast("Q")
+        self.published = self.words[0]
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def slot(self, number):
+        return 1 + (number & 1) * (2 + self.words_per_frame)
+
+    def publish(self, display_rows, width, height):
+        number = self.published + 1
+        words = self.words
+        base = self.slot(number)
+        words[base] = 2 * number - 1
+        words[base + 1] = (width << 16) | height
+        words[base + 2:base + 2 + self.words_per_frame] = display_rows
+        words[base] = 2 * number
+        words[0] = number
+        self.published = number
+
+    def frame_number(self):
+        return self.words[0]
+
+    def read(self):
+        """Return ``(frame number, rows, width)`` for the latest complete frame.
+
+        ``rows`` holds one ``width``-bit int per row, as from ``Chip8.frame_rows``.
+        Before the first frame this is ``(0, None, DISPLAY_WIDTH)``.
+        """
+        words = self.words
+        while True:
+            number = words[0]
+            if number == 0:
+                return 0, None, DISPLAY_WIDTH
+            base = self.slot(number)
+            sequence = words[base]
+            geometry = words[base + 1]
+            frame = array("Q", words[base + 2:base + 2 + self.words_per_frame])
+            if sequence == 2 * number and words[base] == sequence:
+                width = geometry >> 16
+                return number, visible_rows(frame, width, geometry & 0xFFFF), width
+
+    def close(self):
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class KeyRing:
+    """Single-producer, single-consumer ring of key events in shared memory.
+
+    The GUI only ever advances the head and the core only ever advances the
+    tail, so neither side takes a lock. Each event is one byte: the key index
+    shifted left once, with the pressed bit at the bottom. Alongside it goes
+    the ``time.perf_counter()`` time the GUI saw the event, as a double.
+    """
+
+    def __init__(self, capacity=KEY_RING_CAPACITY, name=None):
+        self.capacity = capacity
+        self.owner = name is None
+        size = 16 + 9 * capacity
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.indices = self.memory.buf[:16].cast("Q")
+        self.timestamps = self.memory.buf[16:16 + 8 * capacity].cast("d")
+        self.events = self.memory.buf[16 + 8 * capacity:16 + 9 * capacity]
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def push(self, key_index, pressed, timestamp=0.0):
+        """Queue one event; returns False (dropping it) if the core has fallen a full ring behind."""
+        head = self.indices[0]
+        if head - self.indices[1] >= self.capacity:
+            return False
+        self.events[head % self.capacity] = ((key_index & 0xF) << 1) | (1 if pressed else 0)
+        self.timestamps[head % self.capacity] = timestamp
+        self.indices[0] = head + 1
+        return True
+
+    def drain(self):
+        head = self.indices[0]
+        tail = self.indices[1]
+        drained = []
+        while tail < head:
+            event = self.events[tail % self.capacity]
+            drained.append((event >> 1, bool(event & 1), self.timestamps[tail % self.capacity]))
+            tail += 1
+        self.indices[1] = tail
+        return drained
+
+    def close(self):
+        self.indices.release()
+        self.timestamps.release()
+        self.events.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class CoreWorker:
+    """Runs a Chip8 and its FrameScheduler on a background thread.
+
+    Finished frames go out through a SharedFramebuffer and key events come in
+    through a KeyRing, so the Tk thread never touches the running core for
+    either. Anything else that reads or replaces machine state (loading ROMs,
+    save states, rewind, the profiler) must hold ``lock``, which the worker
+    only holds while it is running a tick. Like ``Main.run`` inline, the
+    worker sleeps until ``wake`` is called when the machine is waiting for
+    input.
+
+    The worker also stands in for the Chip8 the GUI talks to:
+    ``queue_key_event``, ``load_rom_from_path`` and ``reload_current_rom``
+    forward to the core. ``on_publish``, if given, is called on the worker
+    thread with the framebuffer's frame number after each publish.
+    """
+
+    def __init__(self, chip8, on_frame=None, on_publish=None):
+        self.chip8 = chip8
+        self.on_publish = on_publish
+        self.framebuffer = SharedFramebuffer(len(chip8.display_rows))
+        self.keys = KeyRing()
+        self.scheduler = FrameScheduler(chip8, self.publish_frame, on_frame=on_frame)
+        self.lock = threading.RLock()
+        self.condition = threading.Condition()
+        self.wake_pending = False
+        self.suspended = False
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, name="chip8-core", daemon=True)
+
+    def start(self):
+        self.scheduler.restart()
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread.is_alive():
+            self.thread.join()
+        self.framebuffer.close()
+        self.keys.close()
+
+    def wake(self):
+        """Make the worker run its next tick now, ending any suspension."""
+        with self.condition:
+            self.wake_pending = True
+            self.suspended = False
+            self.condition.notify()
+
+    def run(self):
+        while not self.stopping:
+            with self.lock:
+                for key_index, pressed, timestamp in self.keys.drain():
+                    self.chip8.queue_key_event(key_index, pressed, timestamp or None)
+                delay = self.scheduler.tick()
+                waiting = self.chip8.is_waiting_for_input()
+            with self.condition:
+                # Checking wake_pending under the condition means a wake that
+                # arrives after the tick can never be missed, and `suspended`
+                # is only ever seen as True while the worker really is parked.
+                if not self.wake_pending and not self.stopping:
+                    self.suspended = waiting
+                    self.condition.wait(None if waiting else delay)
+                resumed = waiting and self.wake_pending
+                self.suspended = False
+                self.wake_pending = False
+            if resumed:
+                with self.lock:
+                    self.scheduler.restart()
+
+    def publish_frame(self):
+        chip8 = self.chip8
+        self.framebuffer.publish(chip8.display_rows, chip8.display_width, chip8.display_height)
+        if self.on_publish:
+            self.on_publish(self.framebuffer.published)
+
+    def queue_key_event(self, key_index, pressed, timestamp=None):
+        self.keys.push(key_index, pressed, timestamp or 0.0)
+        self.wake()
+
+    def load_rom_from_path(self, path):
+        with self.lock:
+            self.chip8.load_rom_from_path(path)
+        self.wake()
+
+    def reload_current_rom(self):
+        with self.lock:
+            self.chip8.reload_current_rom()
+        self.wake()
@@ -0,0 +1,176 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from beeper import Beeper, WavSink
+from capture import FrameCapture, open_writer
+from chip8emulator import ENGINES, QUIRK_PROFILE_NAMES, TIMINGS, Chip8
+from imaging import encode_png, frame_bytes
+from profiler import Profiler
+
+DEFAULT_FRAMES = 600
+PNG_SCALE = 4
+CAPTURE_SUFFIXES = {"gif": ".gif", "raw": ".c8v", "png": ""}
+
+
+def find_roms(paths):
+    """``(path, name)`` for every ROM; ``name`` is the path under the directory searched, without the extension,
+    and is unique, so ROMs of the same name in different folders get their own output files."""
+    roms = []
+    used = set()
+    for path in map(Path, paths):
+        if path.is_dir():
+            found = [(rom, rom.relative_to(path).with_suffix("")) for rom in sorted(path.rglob("*.ch8"))]
+        else:
+            found = [(path, Path(path.stem))]
+        for rom, name in found:
+            unique = name
+            copy = 1
+            while unique.as_posix() in used:
+                copy += 1
+                unique = name.with_name(f"{name.name} ({copy})")
+            used.add(unique.as_posix())
+            roms.append((rom, unique.as_posix()))
+    return roms
+
+
+def run_rom(job):
+    """Run one ROM with no GUI and return its result record. Runs inside a worker process."""
+    rom_path, name, options = job
+    result = {"rom": str(rom_path), "name": name, "engine": options["engine"], "seed": options["seed"]}
+    cpu = Chip8(engine=options["engine"], seed=options["seed"], timing=options["timing"],
+                quirks=options["quirks"])
+    profiler = Profiler(cpu) if options["profile"] else None
+    if profiler:
+        profiler.attach()
+    output_dir = Path(options["output"])
+    (output_dir / name).parent.mkdir(parents=True, exist_ok=True)
+    beeper = Beeper(WavSink(output_dir / f"{name}.wav"), realtime=False) if options["wav"] else None
+    capture_path = output_dir / (name + CAPTURE_SUFFIXES[options["capture"]]) if options["capture"] else None
+    capture = FrameCapture(open_writer(capture_path, options["scale"]), realtime=False) if capture_path else None
+    started = time.perf_counter()
+    frames = 0
+    try:
+        cpu.load_rom_from_path(rom_path)
+        max_frames = options["frames"]
+        max_cycles = options["cycles"]
+        while (max_cycles is None and frames < max_frames) or (max_cycles is not None and cpu.cycle_count < max_cycles):
+            cpu.run_frame()
+            if beeper:
+                beeper.on_frame(cpu)
+            if capture:
+                capture.on_frame(cpu)
+            frames += 1
+            if not cpu.rom_loaded:
+                # 00FD stopped the ROM; nothing will run any more, so stop waiting for the limit.
+                result["exited"] = True
+                break
+    except Exception as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    wall_time = time.perf_counter() - started
+    if capture:
+        try:
+            capture.close()
+            result["capture"] = str(capture_path)
+            result["capture_frames"] = capture.report()
+        except Exception as exc:
+            result.setdefault("error", f"{type(exc).__name__}: {exc}")
+    if beeper:
+        beeper.close()
+        result["wav"] = str(output_dir / f"{name}.wav")
+        result["audio"] = beeper.report()
+    result.update({
+        "engine": cpu.engine,
+        "timing": cpu.timing,
+        "quirks": cpu.quirk_profile,
+        "frames": frames,
+        "cycles": cpu.cycle_count,
+        "wall_time": wall_time,
+        # Cycles of emulated time, including those skipped in idle loops or spent blocked on FX0A;
+        # --profile counts the instructions actually executed.
+        "emulated_cycles_per_second": cpu.cycle_count / wall_time if wall_time > 0 else 0.0,
+        "idle_cycles_skipped": cpu.idle_cycles_skipped,
+        "resolution": f"{cpu.display_width}x{cpu.display_height}",
+        "framebuffer_sha1": hashlib.sha1(frame_bytes(cpu.frame_rows(), cpu.display_width)).hexdigest(),
+    })
+    if profiler:
+        profile_path = output_dir / f"{name}.profile.json"
+        profiler.export_json(profile_path)
+        result["profile"] = str(profile_path)
+    if options["png"]:
+        png_path = output_dir / f"{name}.png"
+        png_path.write_bytes(encode_png(cpu.frame_rows(), cpu.display_width, options["scale"] or PNG_SCALE))
+        result["png"] = str(png_path)
+    (output_dir / f"{name}.json").write_text(json.dumps(result, indent=2))
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run Chip-8 ROMs without a display and report per-ROM results as JSON.")
+    parser.add_argument("paths", nargs="+", help="ROM files or directories to search for *.ch8")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help=f"60 Hz frames to run per ROM (default {DEFAULT_FRAMES})")
+    limit.add_argument("--cycles", type=int, help="run each ROM until this many CPU cycles have executed")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="execution engine (default: picked per ROM)")
+    parser.add_argument("--timing", choices=TIMINGS, default="fixed", help="instruction pacing: 'fixed' clock or COSMAC VIP cycle costs")
+    parser.add_argument("--quirks", choices=QUIRK_PROFILE_NAMES, default="auto", help="quirk profile (default: picked per ROM)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument("--output", default="batch_results", help="directory for the per-ROM JSON and PNG files")
+    parser.add_argument("--png", action="store_true", help="also dump the final framebuffer as a PNG")
+    parser.add_argument("--scale", type=int, help=f"pixel scale for PNG dumps (default {PNG_SCALE}) and captures")
+    parser.add_argument("--seed", type=int, default=0, help="random seed used for CXNN in every ROM")
+    parser.add_argument("--profile", action="store_true", help="write per-opcode and per-PC counts to <name>.profile.json")
+    parser.add_argument("--capture", choices=CAPTURE_SUFFIXES, help="record every distinct frame to <name>.gif, <name>.c8v or a <name>/ PNG directory")
+    parser.add_argument("--wav", action="store_true", help="record the sound timer's beeps to <name>.wav")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    roms = find_roms(args.paths)
+    if not roms:
+        print("No ROMs found.", file=sys.stderr)
+        return 1
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+    options = {
+        "engine": args.engine,
+        "timing": args.timing,
+        "quirks": args.quirks,
+        "frames": args.frames,
+        "cycles": args.cycles,
+        "output": args.output,
+        "png": args.png,
+        "scale": args.scale,
+        "seed": args.seed,
+        "profile": args.profile,
+        "wav": args.wav,
+        "capture": args.capture,
+    }
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for result in pool.map(run_rom, [(rom, name, options) for rom, name in roms]):
+            results.append(result)
+            status = result.get("error", f"{result['emulated_cycles_per_second']:,.0f} emulated cycles/s")
+            print(f"{result['name']}: {result['cycles']} cycles in {result['wall_time']:.3f}s, {status}")
+    wall_time = time.perf_counter() - started
+    summary = {
+        "roms": len(results),
+        "errors": sum(1 for result in results if "error" in result),
+        "workers": args.workers,
+        "wall_time": wall_time,
+        "total_cycles": sum(result["cycles"] for result in results),
+        "results": results,
+    }
+    (Path(args.output) / "summary.json").write_text(json.dumps(summary, indent=2))
+    print(f"{len(results)} ROMs, {summary['errors']} errors, {wall_time:.2f}s wall with {args.workers} workers")
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
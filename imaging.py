@@ -0,0 +1,44 @@
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Maps the characters of a binary string to 8-bit greyscale pixels.
+BITS_TO_GREY = bytes.maketrans(b"01", b"\x00\xff")
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def encode_png(rows, width, scale=1):
+    """Encode packed framebuffer rows (leftmost pixel in the top bit) as a greyscale PNG.
+
+    At scale 1 the rows are already in PNG's 1-bit greyscale layout and are
+    written as they are; larger scales widen each pixel into an 8-bit block.
+    """
+    height = len(rows) * scale
+    if scale == 1:
+        bit_depth = 1
+        row_bytes = (width + 7) // 8
+        padding = row_bytes * 8 - width
+        scanlines = [b"\x00" + (row << padding).to_bytes(row_bytes, "big") for row in rows]
+    else:
+        bit_depth = 8
+        scanlines = []
+        for row in rows:
+            pixels = format(row, f"0{width}b").encode().translate(BITS_TO_GREY)
+            line = b"\x00" + bytes(pixel for pixel in pixels for _ in range(scale))
+            scanlines.extend([line] * scale)
+    header = struct.pack(">IIBBBBB", width * scale, height, bit_depth, 0, 0, 0, 0)
+    return b"".join((
+        PNG_SIGNATURE,
+        png_chunk(b"IHDR", header),
+        png_chunk(b"IDAT", zlib.compress(b"".join(scanlines), 9)),
+        png_chunk(b"IEND", b""),
+    ))
+
+
+def frame_bytes(rows, width):
+    """Canonical big-endian packing of the framebuffer, independent of host byte order."""
+    row_bytes = (width + 7) // 8
+    return b"".join(row.to_bytes(row_bytes, "big") for row in rows)
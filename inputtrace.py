@@ -0,0 +1,166 @@
+import argparse
+import hashlib
+import struct
+import sys
+from pathlib import Path
+
+from chip8emulator import ENGINES, QUIRK_PROFILES, TIMINGS, Chip8
+
+TRACE_MAGIC = b"C8IT"
+TRACE_VERSION = 4
+# magic, version, seed, clock_hz, end cycle, event count, ROM size, SHA-1 of the final save state,
+# timing model, quirk profile
+TRACE_HEADER = struct.Struct("<4sBQIQIH20sBB")
+TRACE_QUIRK_PROFILES = tuple(QUIRK_PROFILES)
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class InputTrace:
+    """A recorded session: the ROM image, the RNG seed and every key event.
+
+    Events are ``(cycle, key, pressed)`` where ``cycle`` is ``Chip8.cycle_count``
+    at the moment ``set_key_state`` was called. On disk each event is a varint
+    cycle delta followed by one byte holding the key and the pressed bit, so a
+    typical event costs two or three bytes.
+    """
+
+    def __init__(self, rom, seed, clock_hz, events=None, end_cycle=0, final_state_sha1=bytes(20), timing="fixed", quirks="modern"):
+        self.rom = bytes(rom)
+        self.seed = seed
+        self.clock_hz = clock_hz
+        self.timing = timing
+        self.quirks = quirks
+        self.events = events if events is not None else []
+        self.end_cycle = end_cycle
+        self.final_state_sha1 = final_state_sha1
+
+    def to_bytes(self):
+        out = bytearray(TRACE_HEADER.pack(
+            TRACE_MAGIC, TRACE_VERSION, self.seed, self.clock_hz, self.end_cycle,
+            len(self.events), len(self.rom), self.final_state_sha1,
+            TIMINGS.index(self.timing), TRACE_QUIRK_PROFILES.index(self.quirks)
+        ))
+        out += self.rom
+        previous = 0
+        for cycle, key, pressed in self.events:
+            write_varint(out, cycle - previous)
+            out.append(((key & 0xF) << 1) | (1 if pressed else 0))
+            previous = cycle
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        (magic, version, seed, clock_hz, end_cycle, event_count, rom_size, final_state_sha1,
+         timing, quirks) = TRACE_HEADER.unpack_from(data)
+        if (magic != TRACE_MAGIC or version != TRACE_VERSION or timing >= len(TIMINGS)
+                or quirks >= len(TRACE_QUIRK_PROFILES)):
+            raise ValueError("Not a Chip-8 input trace, or one written by an incompatible version")
+        offset = TRACE_HEADER.size
+        rom = data[offset:offset + rom_size]
+        offset += rom_size
+        events = []
+        cycle = 0
+        for _ in range(event_count):
+            delta, offset = read_varint(data, offset)
+            cycle += delta
+            packed = data[offset]
+            offset += 1
+            events.append((cycle, packed >> 1, bool(packed & 1)))
+        return cls(rom, seed, clock_hz, events, end_cycle, final_state_sha1, TIMINGS[timing], TRACE_QUIRK_PROFILES[quirks])
+
+    def save(self, path):
+        Path(path).write_bytes(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_bytes(Path(path).read_bytes())
+
+
+class InputRecorder:
+    """Records every ``set_key_state`` call on a Chip8 into an InputTrace.
+
+    ``start`` swaps a recording wrapper in for the instance's ``set_key_state``
+    and ``stop`` removes it again, so a machine that is not being recorded
+    pays nothing.
+    """
+
+    def __init__(self):
+        self.chip8 = None
+        self.trace = None
+
+    def start(self, chip8):
+        """Begin a trace at the current point, which must be straight after a ROM load or reset."""
+        self.stop()
+        self.chip8 = chip8
+        self.trace = InputTrace(chip8.loaded_rom_bytes or b"", chip8.seed, chip8.clock_hz, timing=chip8.timing,
+                                  quirks=chip8.quirk_profile)
+        set_key_state = chip8.set_key_state
+        events = self.trace.events
+
+        def record_key_state(key_index, pressed):
+            events.append((chip8.cycle_count, key_index, bool(pressed)))
+            set_key_state(key_index, pressed)
+
+        chip8.set_key_state = record_key_state
+
+    def stop(self):
+        """Detach from the machine and return the finished trace (or None if not recording)."""
+        if self.chip8 is None:
+            return None
+        chip8 = self.chip8
+        vars(chip8).pop("set_key_state", None)
+        trace = self.trace
+        trace.end_cycle = chip8.cycle_count
+        trace.final_state_sha1 = hashlib.sha1(chip8.save_state()).digest()
+        self.chip8 = None
+        self.trace = None
+        return trace
+
+
+def replay(trace, engine="interpreter"):
+    """Run a trace with no GUI and return the machine in its final state."""
+    cpu = Chip8(engine=engine, seed=trace.seed, timing=trace.timing, quirks=trace.quirks)
+    cpu.clock_hz = trace.clock_hz
+    cpu.reset()
+    cpu.load_ROM(trace.rom)
+    for cycle, key, pressed in trace.events:
+        while cpu.cycle_count < cycle:
+            cpu.run_frame()
+        cpu.set_key_state(key, pressed)
+    while cpu.cycle_count < trace.end_cycle:
+        cpu.run_frame()
+    return cpu
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded Chip-8 input trace without a GUI.")
+    parser.add_argument("trace", help="trace written by main.py --record-input")
+    parser.add_argument("--engine", choices=ENGINES, default="interpreter")
+    args = parser.parse_args(argv)
+    trace = InputTrace.load(args.trace)
+    cpu = replay(trace, engine=args.engine)
+    matches = hashlib.sha1(cpu.save_state()).digest() == trace.final_state_sha1
+    print(f"{len(trace.events)} key events, {cpu.cycle_count} cycles, final state {'matches' if matches else 'DIFFERS'}")
+    return 0 if matches else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+from array import array
+
+from beeper import percentile
+
+STAGES = ("queued", "emulated", "presented", "total")
+# Upper edges, in milliseconds, of the histogram buckets; one more bucket holds everything slower.
+LATENCY_BUCKETS_MS = (4, 8, 12, 17, 25, 33, 50, 67, 100, 150, 250, 500)
+# A key event that has not changed the display within this many frames is counted as having no visible effect.
+MAX_EFFECT_FRAMES = 30
+HISTOGRAM_WIDTH = 40
+
+
+def histogram(values_ms, buckets=LATENCY_BUCKETS_MS):
+    counts = [0] * (len(buckets) + 1)
+    for value in values_ms:
+        for index, edge in enumerate(buckets):
+            if value <= edge:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+    return counts
+
+
+class LatencyTracer:
+    """Measures input-to-photon latency: from a key event to the redrawn screen.
+
+    Each key event carries the ``time.perf_counter()`` time the GUI saw it
+    (``Chip8.queue_key_event``) and is applied at the start of the next
+    frame. The tracer ties it to the first frame after that whose display
+    words differ from the frame before, then waits for that frame to reach
+    the window. Four numbers come out per event: ``queued`` (seen to
+    applied), ``emulated`` (applied to the end of the changing frame),
+    ``presented`` (frame to screen) and ``total``. Anything else that
+    changes the screen in the meantime, such as an animation, ends the
+    wait just the same, so a busy screen understates the latency of keys
+    the game reacts to late.
+
+    ``attach`` swaps wrappers for ``apply_input_events`` and ``run_frame``
+    onto the Chip8 instance and ``detach`` removes them, as the profiler
+    does. Whoever shows frames calls ``frame_ready`` on the emulation thread
+    as a frame is handed over, and ``presented`` with the number it returned
+    once the window has drawn it.
+    """
+
+    def __init__(self, chip8):
+        self.chip8 = chip8
+        self.attached = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            # [seen, applied, frames waited] for events whose effect has not shown yet.
+            self.applied = []
+            self.changed = []
+            self.ready = []
+            self.samples = {stage: [] for stage in STAGES}
+            self.no_effect = 0
+            self.serial = 0
+
+    def attach(self):
+        if self.attached:
+            return
+        chip8 = self.chip8
+        apply_input_events = chip8.apply_input_events
+        run_frame = chip8.run_frame
+
+        def traced_apply_input_events():
+            applied = time.perf_counter()
+            self.applied.extend([seen, applied, 0] for _, _, seen in chip8.input_events if seen is not None)
+            apply_input_events()
+
+        def traced_run_frame():
+            if not self.applied and not chip8.input_events:
+                run_frame()
+                return
+            before = (array("Q", chip8.display_rows), chip8.display_width, chip8.display_height)
+            run_frame()
+            if not self.applied:
+                return
+            if before == (chip8.display_rows, chip8.display_width, chip8.display_height):
+                for event in self.applied:
+                    event[2] += 1
+                waiting = [event for event in self.applied if event[2] < MAX_EFFECT_FRAMES]
+                self.no_effect += len(self.applied) - len(waiting)
+                self.applied = waiting
+                return
+            changed = time.perf_counter()
+            with self.lock:
+                self.changed.extend((seen, applied, changed) for seen, applied, _ in self.applied)
+            self.applied = []
+
+        chip8.apply_input_events = traced_apply_input_events
+        chip8.run_frame = traced_run_frame
+        self.attached = True
+
+    def detach(self):
+        if not self.attached:
+            return
+        vars(self.chip8).pop("apply_input_events", None)
+        vars(self.chip8).pop("run_frame", None)
+        self.attached = False
+
+    def frame_ready(self, serial=None):
+        """Hand the frames changed so far to the display; returns the number to pass to ``presented``."""
+        with self.lock:
+            if serial is None:
+                serial = self.serial + 1
+            self.serial = serial
+            if self.changed:
+                self.ready.extend((serial,) + event for event in self.changed)
+                self.changed = []
+        return serial
+
+    def presented(self, serial):
+        """Record every traced event whose frame, or a later one, is now on screen."""
+        now = time.perf_counter()
+        with self.lock:
+            shown = [event for event in self.ready if event[0] <= serial]
+            if not shown:
+                return
+            self.ready = [event for event in self.ready if event[0] > serial]
+            samples = self.samples
+            for _, seen, applied, changed in shown:
+                samples["queued"].append(applied - seen)
+                samples["emulated"].append(changed - applied)
+                samples["presented"].append(now - changed)
+                samples["total"].append(now - seen)
+
+    def report(self):
+        with self.lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+            no_effect = self.no_effect
+        report = {"events": len(samples["total"]), "no_visible_effect": no_effect, "stages": {}}
+        for stage, values in samples.items():
+            if not values:
+                continue
+            values_ms = [1000 * value for value in values]
+            report["stages"][stage] = {
+                "mean": sum(values_ms) / len(values_ms),
+                "p50": percentile(values_ms, 0.5),
+                "p90": percentile(values_ms, 0.9),
+                "p99": percentile(values_ms, 0.99),
+                "max": max(values_ms),
+                "histogram_ms": dict(zip([str(edge) for edge in LATENCY_BUCKETS_MS] + ["inf"], histogram(values_ms))),
+            }
+        return report
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def histogram_text(self):
+        """The percentiles of each stage and a bar chart of the total, for a terminal."""
+        report = self.report()
+        lines = [f"{report['events']} key events traced, {report['no_visible_effect']} with no visible effect"]
+        for stage in STAGES:
+            values = report["stages"].get(stage)
+            if values:
+                lines.append(f"{stage:>10}: p50 {values['p50']:7.2f}  p90 {values['p90']:7.2f}  p99 {values['p99']:7.2f}  max {values['max']:7.2f} ms")
+        total = report["stages"].get("total")
+        if total:
+            counts = total["histogram_ms"]
+            largest = max(counts.values())
+            for edge, count in counts.items():
+                label = f"<= {edge} ms" if edge != "inf" else f"> {LATENCY_BUCKETS_MS[-1]} ms"
+                bar = "#" * round(HISTOGRAM_WIDTH * count / largest) if largest else ""
+                lines.append(f"{label:>10} {bar} {count}")
+        return "\n".join(lines)
@@ -1,46 +1,332 @@
+import argparse
+import queue
 import time
+from contextlib import nullcontext
 from pathlib import Path
 
 from GUI import GUI
-from chip8emulator import Chip8
+from beeper import Beeper, open_sink
+from capture import FrameCapture, open_writer
+from chip8emulator import ENGINES, QUIRK_PROFILE_NAMES, TIMINGS, Chip8
+from coreworker import CoreWorker
+from inputtrace import InputRecorder
+from latency import LatencyTracer
+from profiler import Profiler
+from rewind import RewindBuffer
+from scheduler import FrameScheduler
+from spectator import SpectatorServer, parse_address
 
 DEFAULT_ROM = Path("ROMs/IBM_Logo.ch8")
+SAVE_STATE_DIR = Path("saves")
+PROFILER_REFRESH_SECONDS = 0.5
+FRAME_POLL_MS = 8
 
 
 class Main:
-    def __init__(self, rom_path=None):
-        self.CPU = Chip8()
-        self.application = GUI(self.CPU, on_rom_loaded=self.load_rom, on_reset=self.reload_rom)
+    def __init__(self, rom_path=None, engine="auto", seed=None, record_input=None, threaded=False, sound="device", timing="fixed",
+                 speed=1.0, uncapped=False, quirks="auto", capture=None, spectate=None, spectator_input=False,
+                 latency_report=None):
+        self.CPU = Chip8(engine=engine, seed=seed, timing=timing, quirks=quirks)
+        self.beeper = Beeper(open_sink(sound))
+        self.capture = None
+        self.remote_keys = queue.SimpleQueue()
+        self.spectator = None
+        if spectate:
+            self.spectator = SpectatorServer(parse_address(spectate), on_key=self.queue_remote_key if spectator_input else None)
+        self.record_input = record_input
+        self.latency_report = latency_report
+        self.latency = LatencyTracer(self.CPU) if latency_report else None
+        if self.latency:
+            self.latency.attach()
+        self.recorder = InputRecorder() if record_input else None
+        # With --threaded the core runs on its own thread and the GUI only sees
+        # the worker, which forwards keys and ROM loads to it.
+        self.worker = CoreWorker(self.CPU, on_frame=self.record_frame,
+                                 on_publish=self.latency.frame_ready if self.latency else None) if threaded else None
+        self.lock = self.worker.lock if self.worker else nullcontext()
+        self.frame_shown = 0
+        self.application = GUI(
+            self.worker or self.CPU,
+            on_rom_loaded=self.load_rom,
+            on_reset=self.reload_rom,
+            on_save_state=self.save_state,
+            on_load_state=self.load_state,
+            on_rewind=self.rewind,
+            on_profiler_toggled=self.toggle_profiler,
+            on_export_profile=self.export_profile,
+            on_key_event=self.resume,
+            on_speed_changed=self.set_speed,
+            on_uncapped_toggled=self.set_uncapped,
+            on_fast_forward=self.fast_forward,
+            on_timing_changed=self.set_timing,
+            on_quirks_changed=self.set_quirks,
+            on_remember_quirks=self.remember_quirks,
+            on_start_recording=self.start_capture,
+            on_stop_recording=self.stop_capture,
+            on_latency_report=self.latency.histogram_text if self.latency else None,
+            timing=timing,
+            quirks=quirks,
+        )
+        self.application.speed.set(speed)
+        self.application.uncapped.set(uncapped)
+        self.uncapped = uncapped
+        self.fast_forwarding = False
+        self.profiler = Profiler(self.CPU)
+        self.profiler_refresh_due = 0.0
         self.current_rom = None
-        self.last_tick = time.perf_counter()
+        self.suspended = False
+        self.rewind_buffer = RewindBuffer()
+        if self.worker:
+            self.scheduler = self.worker.scheduler
+        else:
+            self.scheduler = FrameScheduler(self.CPU, self.present_frame, on_frame=self.record_frame)
+        self.scheduler.set_speed(speed)
+        self.scheduler.set_uncapped(uncapped)
+        if capture:
+            self.start_capture(capture)
+            self.application.set_recording(True)
         initial_rom = rom_path or (str(DEFAULT_ROM) if DEFAULT_ROM.exists() else None)
         if initial_rom:
             try:
                 self.load_rom(initial_rom)
             except Exception:
                 pass
-        self.application.after(1, self.run)
+        if self.worker:
+            self.worker.start()
+            self.application.after(1, self.poll_frames)
+        else:
+            self.scheduler.restart()
+            self.application.after(1, self.run)
+        if spectator_input:
+            self.application.after(FRAME_POLL_MS, self.poll_remote_keys)
         self.application.mainloop()
+        if self.worker:
+            self.worker.stop()
+        self.beeper.close()
+        self.stop_capture()
+        if self.spectator:
+            self.spectator.close()
+        self.finish_recording()
+        if self.latency:
+            self.latency.export_json(self.latency_report)
+            print(self.latency.histogram_text())
 
     def load_rom(self, path):
-        self.CPU.load_rom_from_path(path)
-        self.current_rom = path
+        with self.lock:
+            self.CPU.load_rom_from_path(path)
+            self.current_rom = path
+            self.rewind_buffer.clear()
+            self.start_recording()
         self.application.update_window_title(path)
+        self.resume()
 
     def reload_rom(self):
         if self.current_rom:
-            self.CPU.reload_current_rom()
+            with self.lock:
+                self.CPU.reload_current_rom()
+                self.rewind_buffer.clear()
+                self.start_recording()
+            self.resume()
         elif DEFAULT_ROM.exists():
             self.load_rom(str(DEFAULT_ROM))
 
+    def save_state_path(self):
+        if not self.current_rom:
+            raise RuntimeError("Load a ROM before using save states.")
+        return SAVE_STATE_DIR / (Path(self.current_rom).stem + ".c8s")
+
+    def save_state(self):
+        path = self.save_state_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            data = self.CPU.save_state()
+        path.write_bytes(data)
+
+    def load_state(self):
+        path = self.save_state_path()
+        if not path.exists():
+            raise RuntimeError(f"No save state found for {Path(self.current_rom).name}.")
+        data = path.read_bytes()
+        with self.lock:
+            self.finish_recording()
+            self.CPU.load_state(data)
+            self.rewind_buffer.clear()
+        self.resume()
+
+    def rewind(self):
+        with self.lock:
+            self.finish_recording()
+            self.rewind_buffer.rewind(self.CPU)
+        self.resume()
+
+    def start_recording(self):
+        if self.recorder:
+            self.recorder.start(self.CPU)
+
+    def finish_recording(self):
+        # A trace replays from the ROM boot, so it ends at the first state load or rewind.
+        with self.lock:
+            trace = self.recorder.stop() if self.recorder else None
+        if trace:
+            trace.save(self.record_input)
+
+    def record_frame(self):
+        self.rewind_buffer.record(self.CPU)
+        self.beeper.on_frame(self.CPU)
+        if self.capture:
+            self.capture.on_frame(self.CPU)
+        if self.spectator:
+            self.spectator.on_frame(self.CPU)
+
+    def start_capture(self, path):
+        capture = FrameCapture(open_writer(path))
+        with self.lock:
+            self.stop_capture()
+            self.capture = capture
+
+    def stop_capture(self):
+        with self.lock:
+            capture = self.capture
+            self.capture = None
+        if capture:
+            capture.close()
+
     def run(self):
-        now = time.perf_counter()
-        delta_ms = (now - self.last_tick) * 1000.0
-        self.last_tick = now
-        self.CPU.update(delta_ms)
-        self.application.update_canvas(self.CPU.Display)
-        self.application.after(1, self.run)
+        delay = self.scheduler.tick()
+        self.refresh_profiler_overlay(self.scheduler.next_frame)
+        if self.CPU.is_waiting_for_input():
+            # Nothing can happen until a key event or a new ROM/state, so stop polling.
+            self.suspended = True
+            return
+        self.application.after(max(1, int(delay * 1000)), self.run)
+
+    def poll_frames(self):
+        # Read the flag first: once the worker reports itself parked, its last frame is already published.
+        worker_suspended = self.worker.suspended
+        if self.worker.framebuffer.frame_number() != self.frame_shown:
+            self.frame_shown, rows, width = self.worker.framebuffer.read()
+            self.application.update_canvas(rows, width)
+            if self.latency:
+                # Tk redraws the canvas from an idle callback queued by the update; this one runs after it.
+                self.application.after_idle(self.latency.presented, self.frame_shown)
+        self.refresh_profiler_overlay(time.perf_counter())
+        if worker_suspended:
+            self.suspended = True
+            return
+        self.application.after(FRAME_POLL_MS, self.poll_frames)
+
+    def queue_remote_key(self, key_index, pressed):
+        self.remote_keys.put((key_index, pressed))
+
+    def poll_remote_keys(self):
+        # Spectator keys arrive on the server's thread; apply them here, like keys from the window.
+        pressed = False
+        while True:
+            try:
+                key_index, down = self.remote_keys.get_nowait()
+            except queue.Empty:
+                break
+            (self.worker or self.CPU).queue_key_event(key_index, down)
+            pressed = True
+        if pressed:
+            self.resume()
+        self.application.after(FRAME_POLL_MS, self.poll_remote_keys)
+
+    def refresh_profiler_overlay(self, now):
+        if self.profiler.attached and now >= self.profiler_refresh_due:
+            self.application.update_profiler_overlay(self.profiler.overlay_text())
+            self.profiler_refresh_due = now + PROFILER_REFRESH_SECONDS
+
+    def resume(self):
+        if self.worker:
+            self.worker.wake()
+        if not self.suspended:
+            return
+        self.suspended = False
+        if self.worker:
+            self.poll_frames()
+            return
+        # Don't replay the time spent suspended as catch-up frames.
+        self.scheduler.restart()
+        self.run()
+
+    def set_speed(self, speed):
+        with self.lock:
+            self.scheduler.set_speed(speed)
+
+    def set_uncapped(self, uncapped):
+        self.uncapped = uncapped
+        self.apply_uncapped()
+
+    def fast_forward(self, held):
+        self.fast_forwarding = held
+        self.apply_uncapped()
+
+    def apply_uncapped(self):
+        with self.lock:
+            self.scheduler.set_uncapped(self.uncapped or self.fast_forwarding)
+        self.resume()
+
+    def set_timing(self, timing):
+        with self.lock:
+            # A trace replays with one timing model throughout, so it ends here.
+            self.finish_recording()
+            self.CPU.set_timing(timing)
+
+    def set_quirks(self, profile):
+        with self.lock:
+            self.finish_recording()
+            self.CPU.set_quirks(profile)
+
+    def remember_quirks(self):
+        from analyzer import save_quirk_override
+        if not self.current_rom:
+            raise RuntimeError("Load a ROM before picking its quirk profile.")
+        with self.lock:
+            rom = self.CPU.loaded_rom_bytes
+            profile = self.CPU.quirk_profile
+        save_quirk_override(rom, profile, Path(self.current_rom).name)
+        return profile
+
+    def toggle_profiler(self, enabled):
+        with self.lock:
+            if enabled:
+                self.profiler.attach()
+            else:
+                self.profiler.detach()
+
+    def export_profile(self, path):
+        with self.lock:
+            self.profiler.export_json(path)
+
+    def present_frame(self):
+        self.application.update_canvas(self.CPU.frame_rows(), self.CPU.display_width)
+        if self.latency:
+            self.application.after_idle(self.latency.presented, self.latency.frame_ready())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chip-8 emulator")
+    parser.add_argument("rom", nargs="?", help="ROM to boot instead of the IBM logo")
+    parser.add_argument("--engine", choices=ENGINES, default="auto", help="CPU execution engine (default: picked per ROM)")
+    parser.add_argument("--seed", type=int, help="seed for the CXNN random number generator")
+    parser.add_argument("--record-input", metavar="TRACE", help="record key input to TRACE for replay with inputtrace.py")
+    parser.add_argument("--threaded", action="store_true", help="run the emulation core on a worker thread so a busy UI cannot stall it")
+    parser.add_argument("--sound", default="device", metavar="SINK", help="'device' (default), 'none', or a .wav file to record the beeper to")
+    parser.add_argument("--timing", choices=TIMINGS, default="fixed", help="'fixed' runs 700 instructions a second; 'vip' charges COSMAC VIP cycle costs")
+    parser.add_argument("--quirks", choices=QUIRK_PROFILE_NAMES, default="auto", help="quirk profile (default: picked per ROM)")
+    parser.add_argument("--capture", metavar="PATH", help="record video from the start: a .gif, a .c8v raw frame stream, or a directory for PNGs")
+    parser.add_argument("--spectate", metavar="ADDRESS", help="stream the display to spectator.py clients on HOST:PORT, a local port or unix:PATH")
+    parser.add_argument("--spectator-input", action="store_true", help="let spectators press keys too")
+    parser.add_argument("--latency-report", metavar="PATH", help="trace key-to-screen latency and write percentiles and histograms to PATH on exit")
+    parser.add_argument("--speed", type=float, default=1.0, help="emulated time per second of real time (default 1.0)")
+    parser.add_argument("--uncapped", action="store_true", help="run as fast as the host allows; hold Tab to do this for a moment")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    Main()
\ No newline at end of file
+    args = parse_args()
+    Main(args.rom, engine=args.engine, seed=args.seed, record_input=args.record_input, threaded=args.threaded, sound=args.sound,
+         timing=args.timing, speed=args.speed, uncapped=args.uncapped, quirks=args.quirks, capture=args.capture,
+         spectate=args.spectate, spectator_input=args.spectator_input,
+         latency_report=args.latency_report)
\ No newline at end of file
@@ -0,0 +1,172 @@
+import json
+import time
+from array import array
+
+from chip8emulator import ARITHMETIC_OPCODES, KEY_OPCODES, MEMORY_SIZE, MISC_OPCODES, SYSTEM_OPCODES, IdleLoop
+
+FAMILY_NAMES = {
+    0x1: "1NNN", 0x2: "2NNN", 0x3: "3XNN", 0x4: "4XNN", 0x5: "5XY0", 0x6: "6XNN", 0x7: "7XNN",
+    0x9: "9XY0", 0xA: "ANNN", 0xB: "BNNN", 0xC: "CXNN", 0xD: "DXYN",
+}
+HOT_PC_LIMIT = 32
+
+
+def opcode_family(instruction):
+    """Mnemonic pattern such as ``8XY4`` or ``FX33`` for a 16-bit instruction."""
+    nibble = instruction >> 12
+    if nibble == 0x0:
+        name = SYSTEM_OPCODES.get(instruction)
+    elif nibble == 0x8:
+        name = ARITHMETIC_OPCODES.get(instruction & 0xF)
+    elif nibble == 0xE:
+        name = KEY_OPCODES.get(instruction & 0xFF)
+    elif nibble == 0xF:
+        name = MISC_OPCODES.get(instruction & 0xFF)
+    else:
+        return FAMILY_NAMES[nibble]
+    return name[len("_op_"):] if name else "unknown"
+
+
+class Profiler:
+    """Counts executed instructions per opcode and per PC, and times drawing and timers.
+
+    ``attach`` swaps instrumented versions of ``run_cycles``, ``draw_sprite``
+    and ``_update_timers`` onto the Chip8 instance; ``detach`` puts the
+    originals back. Nothing in the normal execution path checks whether the
+    profiler is on. While attached, instructions always run through the
+    interpreter, whichever engine is selected.
+    """
+
+    def __init__(self, chip8):
+        self.chip8 = chip8
+        self.attached = False
+        self.reset()
+
+    def reset(self):
+        self.instruction_counts = array("Q", bytes(8 * 0x10000))
+        self.pc_counts = array("Q", bytes(8 * MEMORY_SIZE))
+        self.instructions = 0
+        self.draw_calls = 0
+        self.draw_seconds = 0.0
+        self.timer_calls = 0
+        self.timer_seconds = 0.0
+        self.started = time.perf_counter()
+        self.window_started = self.started
+        self.window_instructions = 0
+
+    def attach(self):
+        if self.attached:
+            return
+        chip8 = self.chip8
+        original_update_timers = chip8._update_timers
+
+        def timed_draw(original_draw):
+            def draw(X, Y, N):
+                started = time.perf_counter()
+                original_draw(X, Y, N)
+                self.draw_seconds += time.perf_counter() - started
+                self.draw_calls += 1
+            return draw
+
+        def update_timers(ms_delay):
+            started = time.perf_counter()
+            original_update_timers(ms_delay)
+            self.timer_seconds += time.perf_counter() - started
+            self.timer_calls += 1
+
+        chip8.run_cycles = self.run_cycles
+        # Wrap both DXYN handlers so switching quirk profile while attached keeps the timings.
+        chip8.draw_sprite = timed_draw(chip8.draw_sprite)
+        chip8.clip_sprite = timed_draw(chip8.clip_sprite)
+        chip8._update_timers = update_timers
+        # Predecoded DXYN handlers are bound to the old draw_sprite.
+        chip8.clear_decode_cache()
+        self.attached = True
+        self.reset()
+
+    def detach(self):
+        if not self.attached:
+            return
+        chip8 = self.chip8
+        chip8.run_cycles = chip8.engine_runner
+        vars(chip8).pop("draw_sprite", None)
+        vars(chip8).pop("clip_sprite", None)
+        vars(chip8).pop("_update_timers", None)
+        chip8.clear_decode_cache()
+        self.attached = False
+
+    def run_cycles(self, cycles):
+        cpu = self.chip8
+        RAM = cpu.RAM
+        decode_cache = cpu.decode_cache
+        instruction_counts = self.instruction_counts
+        pc_counts = self.pc_counts
+        cpu.loop_fingerprint = None
+        cpu.idle = False
+        executed = 0
+        try:
+            for _ in range(cycles):
+                if cpu.waiting_register is not None or not cpu.rom_loaded:
+                    break
+                PC = cpu.PC
+                instruction = (RAM[PC] << 8) | RAM[PC + 1]
+                instruction_counts[instruction] += 1
+                pc_counts[PC] += 1
+                cpu.PC = PC + 2
+                executed += 1
+                (decode_cache[instruction] or cpu.decode_instruction(instruction))()
+        except IdleLoop:
+            cpu.skip_idle_loop(cycles - executed)
+        self.instructions += executed
+        self.window_instructions += executed
+
+    def opcode_counts(self):
+        families = {}
+        for instruction, count in enumerate(self.instruction_counts):
+            if count:
+                family = opcode_family(instruction)
+                families[family] = families.get(family, 0) + count
+        return dict(sorted(families.items(), key=lambda item: item[1], reverse=True))
+
+    def hot_pcs(self, limit=HOT_PC_LIMIT):
+        counted = [(address, count) for address, count in enumerate(self.pc_counts) if count]
+        counted.sort(key=lambda item: item[1], reverse=True)
+        return counted[:limit]
+
+    def sample_rate(self):
+        """Instructions per second since the previous call."""
+        now = time.perf_counter()
+        elapsed = now - self.window_started
+        rate = self.window_instructions / elapsed if elapsed > 0 else 0.0
+        self.window_started = now
+        self.window_instructions = 0
+        return rate
+
+    def report(self):
+        wall_time = time.perf_counter() - self.started
+        return {
+            "instructions": self.instructions,
+            "wall_time": wall_time,
+            "instructions_per_second": self.instructions / wall_time if wall_time > 0 else 0.0,
+            "clock_hz": self.chip8.clock_hz,
+            "timing": self.chip8.timing,
+            "opcodes": self.opcode_counts(),
+            "hot_pcs": [{"pc": f"{address:#05x}", "count": count} for address, count in self.hot_pcs()],
+            "pc_counts": {f"{address:#05x}": count for address, count in enumerate(self.pc_counts) if count},
+            "draw_sprite": {"calls": self.draw_calls, "seconds": self.draw_seconds},
+            "timers": {"calls": self.timer_calls, "seconds": self.timer_seconds},
+        }
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def overlay_text(self):
+        rate = self.sample_rate()
+        clock_hz = self.chip8.clock_hz
+        top = ", ".join(f"{family} {count}" for family, count in list(self.opcode_counts().items())[:4])
+        if self.chip8.timing == "vip":
+            target = "VIP timing"
+        else:
+            target = f"{clock_hz} Hz ({100.0 * rate / clock_hz:.0f}%)"
+        return f"{rate:,.0f} ips / {target} | draw {self.draw_seconds * 1000:.1f} ms | {top}"
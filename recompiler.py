@@ -0,0 +1,186 @@
+from chip8emulator import IdleLoop
+
+MAX_BLOCK_LENGTH = 32
+
+# Instructions that change PC. A block always ends after one of these.
+BRANCH_FAMILIES = (0x1000, 0x2000, 0x3000, 0x4000, 0x5000, 0x9000, 0xB000, 0xE000)
+
+
+class BlockRecompiler:
+    """Translates straight-line runs of Chip-8 code into Python functions.
+
+    A block starts at a PC and continues until the first instruction that
+    branches, blocks on input or writes memory, or until it reaches
+    MAX_BLOCK_LENGTH instructions. Each block is compiled once into a
+    function that runs every instruction in it, so dispatch costs one dict
+    lookup per block instead of one per instruction.
+
+    Each block remembers the bytes it was translated from. When RAM is
+    replaced wholesale (a reset, a ROM reload, a save state) only the blocks
+    whose bytes changed are dropped, so reloading a ROM keeps its code.
+    """
+
+    def __init__(self, chip8):
+        self.chip8 = chip8
+        self.blocks = {}
+        self.sources = {}
+        self.address_blocks = {}
+
+    def run(self, cycles):
+        cpu = self.chip8
+        cpu.loop_fingerprint = None
+        cpu.idle = False
+        blocks = self.blocks
+        remaining = cycles
+        try:
+            while remaining > 0:
+                if cpu.waiting_register is not None or not cpu.rom_loaded:
+                    return
+                block = blocks.get(cpu.PC) or self.translate(cpu.PC)
+                function, length = block
+                if length > remaining:
+                    # Finish the slice one instruction at a time so a slice always
+                    # runs the same instructions that the interpreter would.
+                    cpu._run_interpreted(remaining)
+                    return
+                remaining -= length
+                function(cpu)
+        except IdleLoop:
+            cpu.skip_idle_loop(remaining)
+
+    def invalidate(self, start, end):
+        if start <= 0 and end >= len(self.chip8.RAM):
+            self.revalidate()
+            return
+        address_blocks = self.address_blocks
+        blocks = self.blocks
+        sources = self.sources
+        for address in range(start, end):
+            starts = address_blocks.pop(address, None)
+            if starts:
+                for block_start in starts:
+                    blocks.pop(block_start, None)
+                    sources.pop(block_start, None)
+
+    def revalidate(self):
+        """Drop the blocks whose bytes in RAM no longer match what they were translated from."""
+        RAM = self.chip8.RAM
+        address_blocks = self.address_blocks
+        for start, source in list(self.sources.items()):
+            end = start + len(source)
+            if RAM[start:end] != source:
+                del self.blocks[start]
+                del self.sources[start]
+                for covered in range(start, end):
+                    starts = address_blocks.get(covered)
+                    if starts:
+                        starts.discard(start)
+
+    def clear(self):
+        """Forget every block, e.g. because the handlers they captured were swapped."""
+        self.blocks.clear()
+        self.sources.clear()
+        self.address_blocks.clear()
+
+    def translate(self, start):
+        cpu = self.chip8
+        RAM = cpu.RAM
+        namespace = {}
+        lines = ["def block(cpu):", "    V = cpu.V"]
+        address = start
+        length = 0
+        while length < MAX_BLOCK_LENGTH and address + 1 < len(RAM):
+            instruction = (RAM[address] << 8) | RAM[address + 1]
+            length += 1
+            address += 2
+            ends_block = self.emit(lines, namespace, instruction, address)
+            if ends_block:
+                break
+        if length == 0:
+            # Not enough memory left for a full instruction; let the
+            # interpreter raise exactly as it would have.
+            return type(cpu).one_tick, 1
+        if not ends_block:
+            lines.append(f"    cpu.PC = {address}")
+        exec(compile("\n".join(lines), f"<chip8 block {start:#05x}>", "exec"), namespace)
+        block = (namespace["block"], length)
+        self.blocks[start] = block
+        self.sources[start] = bytes(RAM[start:address])
+        for covered in range(start, address):
+            self.address_blocks.setdefault(covered, set()).add(start)
+        return block
+
+    def emit(self, lines, namespace, instruction, next_pc):
+        """Append the source for one instruction and report whether it ends the block."""
+        opcode = instruction & 0xF000
+        X = (instruction & 0x0F00) >> 8
+        Y = (instruction & 0x00F0) >> 4
+        NNN = instruction & 0x0FFF
+        NN = instruction & 0x00FF
+        N = instruction & 0x000F
+
+        if opcode == 0x1000:
+            lines.append(f"    cpu.PC = {NNN}")
+            if NNN < next_pc:
+                lines.append(f"    cpu.check_idle_loop({NNN})")
+            return True
+        if opcode == 0x3000:
+            lines.append(f"    cpu.PC = {next_pc + 2} if V[{X}] == {NN} else {next_pc}")
+            return True
+        if opcode == 0x4000:
+            lines.append(f"    cpu.PC = {next_pc + 2} if V[{X}] != {NN} else {next_pc}")
+            return True
+        if opcode == 0x5000 and N == 0:
+            lines.append(f"    cpu.PC = {next_pc + 2} if V[{X}] == V[{Y}] else {next_pc}")
+            return True
+        if opcode == 0x9000 and N == 0:
+            lines.append(f"    cpu.PC = {next_pc + 2} if V[{X}] != V[{Y}] else {next_pc}")
+            return True
+        if opcode == 0x6000:
+            lines.append(f"    V[{X}] = {NN}")
+            return False
+        if opcode == 0x7000:
+            lines.append(f"    V[{X}] = (V[{X}] + {NN}) & 255")
+            return False
+        if opcode == 0x8000 and (N == 0x0 or (N in (0x1, 0x2, 0x3) and not self.chip8.quirks["vf_reset"])):
+            operator = ("", "|", "&", "^")[N]
+            lines.append(f"    V[{X}] {operator}= V[{Y}]")
+            return False
+        if opcode == 0x8000 and N == 0x4:
+            lines.append(f"    result = V[{X}] + V[{Y}]")
+            lines.append(f"    V[15] = 1 if result > 255 else 0")
+            lines.append(f"    V[{X}] = result & 255")
+            return False
+        if opcode == 0x8000 and N in (0x5, 0x7) and 0xF not in (X, Y):
+            minuend, subtrahend = (X, Y) if N == 0x5 else (Y, X)
+            lines.append(f"    result = V[{minuend}] - V[{subtrahend}]")
+            lines.append(f"    V[15] = 1 if result >= 0 else 0")
+            lines.append(f"    V[{X}] = result & 255")
+            return False
+        if opcode == 0xA000:
+            lines.append(f"    cpu.I = {NNN}")
+            return False
+        if opcode == 0xF000 and NN == 0x07:
+            lines.append(f"    V[{X}] = cpu.DT")
+            return False
+        if opcode == 0xF000 and NN == 0x15:
+            lines.append(f"    cpu.DT = V[{X}]")
+            return False
+        if opcode == 0xF000 and NN == 0x18:
+            lines.append(f"    cpu.ST = V[{X}]")
+            return False
+
+        # Everything else goes through the interpreter's predecoded handler.
+        name = f"h{len(namespace)}"
+        namespace[name] = self.chip8.decode_cache[instruction] or self.chip8.decode_instruction(instruction)
+        if opcode in BRANCH_FAMILIES or instruction in (0x00EE, 0x00FD):
+            lines.append(f"    cpu.PC = {next_pc}")
+            lines.append(f"    {name}()")
+            return True
+        lines.append(f"    {name}()")
+        if opcode == 0xF000 and NN in (0x0A, 0x33, 0x55):
+            # Fx0A may block the CPU and Fx33/Fx55 may have rewritten code
+            # that follows, so hand control back to the dispatcher.
+            lines.append(f"    cpu.PC = {next_pc}")
+            return True
+        return False
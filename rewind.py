@@ -0,0 +1,86 @@
+import zlib
+from collections import deque
+
+DEFAULT_INTERVAL_FRAMES = 6
+DEFAULT_KEYFRAME_INTERVAL = 30
+DEFAULT_MEMORY_LIMIT = 4 * 1024 * 1024
+COMPRESSION_LEVEL = 1
+
+
+def xor_bytes(first, second):
+    size = len(first)
+    return (int.from_bytes(first, "little") ^ int.from_bytes(second, "little")).to_bytes(size, "little")
+
+
+class RewindBuffer:
+    """Memory-bounded history of ``Chip8.save_state`` images.
+
+    Every ``interval_frames`` frames a state is captured. Captures are grouped
+    behind a keyframe; the rest of the group is stored as the zlib-compressed
+    XOR against that keyframe, which is almost all zeros between nearby frames.
+    When the compressed total passes ``memory_limit`` the oldest group is
+    evicted as a whole.
+    """
+
+    def __init__(self, interval_frames=DEFAULT_INTERVAL_FRAMES, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, memory_limit=DEFAULT_MEMORY_LIMIT):
+        self.interval_frames = interval_frames
+        self.keyframe_interval = keyframe_interval
+        self.memory_limit = memory_limit
+        self.groups = deque()
+        self.memory_used = 0
+        self.frames_until_capture = interval_frames
+        self.keyframe = None
+
+    def __len__(self):
+        return sum(1 + len(deltas) for _, deltas in self.groups)
+
+    def clear(self):
+        self.groups.clear()
+        self.memory_used = 0
+        self.frames_until_capture = self.interval_frames
+        self.keyframe = None
+
+    def record(self, chip8):
+        """Call once per emulated frame; captures a state every ``interval_frames`` frames."""
+        self.frames_until_capture -= 1
+        if self.frames_until_capture > 0:
+            return
+        self.frames_until_capture = self.interval_frames
+        self.push(chip8.save_state())
+
+    def push(self, state):
+        if self.keyframe is None or len(self.groups[-1][1]) + 1 >= self.keyframe_interval:
+            packed = zlib.compress(state, COMPRESSION_LEVEL)
+            self.groups.append((packed, []))
+            self.keyframe = state
+        else:
+            packed = zlib.compress(xor_bytes(state, self.keyframe), COMPRESSION_LEVEL)
+            self.groups[-1][1].append(packed)
+        self.memory_used += len(packed)
+        while self.memory_used > self.memory_limit and len(self.groups) > 1:
+            keyframe, deltas = self.groups.popleft()
+            self.memory_used -= len(keyframe) + sum(len(delta) for delta in deltas)
+
+    def pop(self):
+        """Remove and return the most recent state, or None when the history is empty."""
+        if not self.groups:
+            return None
+        keyframe, deltas = self.groups[-1]
+        if deltas:
+            packed = deltas.pop()
+            self.memory_used -= len(packed)
+            return xor_bytes(zlib.decompress(packed), self.keyframe)
+        self.groups.pop()
+        self.memory_used -= len(keyframe)
+        state = self.keyframe
+        self.keyframe = zlib.decompress(self.groups[-1][0]) if self.groups else None
+        return state
+
+    def rewind(self, chip8):
+        """Restore the most recent captured state. Returns False when there is nothing left."""
+        state = self.pop()
+        if state is None:
+            return False
+        chip8.load_state(state)
+        self.frames_until_capture = self.interval_frames
+        return True
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+ROM_LIBRARY_ROOT = Path("ROMs")
+INDEX_NAME = ".index.json"
+INDEX_VERSION = 1
+ROM_SUFFIX = ".ch8"
+NOTES_SUFFIX = ".txt"
+PREFERRED_CATEGORIES = ("Games", "Demos", "Other")
+
+
+def categorize_rom(relative):
+    """Library category for a ROM path relative to the library root."""
+    if len(relative.parts) > 1:
+        return relative.parts[0].replace("_", " ").title()
+    name = relative.stem.lower()
+    if any(keyword in name for keyword in ("demo", "logo", "intro")):
+        return "Demos"
+    if any(keyword in name for keyword in ("test", "opcode", "bench")):
+        return "Other"
+    return "Games"
+
+
+def sorted_categories(categories):
+    ordered = [category for category in PREFERRED_CATEGORIES if category in categories]
+    remaining = sorted({category for category in categories if category not in PREFERRED_CATEGORIES})
+    return ordered + remaining
+
+
+def read_notes(path):
+    """Text of a sidecar ``.txt`` file; these are plain ASCII-ish notes of unknown encoding."""
+    return path.read_bytes().decode("utf-8", errors="replace").strip()
+
+
+class RomLibrary:
+    """Index of the ROMs under ``root``, cached on disk between runs.
+
+    Entries are keyed by path relative to ``root`` and hold the category,
+    display name, size, SHA-1 of the contents and the text of a sidecar
+    ``.txt`` file with the same stem, if there is one. A file is only read
+    again when its size or mtime (or its sidecar's) has changed, so an
+    unchanged library costs one ``stat`` per file.
+
+    ``scan`` walks the tree a slice at a time: given a time budget it stops
+    when the budget runs out and the next call carries on where it left
+    off. Until the first full pass finishes, ``categories`` and ``entries``
+    answer from the index saved by the previous run.
+    """
+
+    def __init__(self, root=ROM_LIBRARY_ROOT, index_path=None):
+        self.root = Path(root)
+        self.index_path = Path(index_path) if index_path else self.root / INDEX_NAME
+        self.entries_by_path = {}
+        self.by_category = None
+        self.walk = None
+        self.seen = set()
+        self.dirty = False
+        self.load_index()
+
+    def load_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Anything but an index this version wrote is ignored and the library rescanned.
+        if isinstance(index, dict) and index.get("version") == INDEX_VERSION and isinstance(index.get("roms"), dict):
+            self.entries_by_path = index["roms"]
+
+    def save_index(self):
+        index = {"version": INDEX_VERSION, "roms": self.entries_by_path}
+        try:
+            temporary = self.index_path.with_name(self.index_path.name + ".tmp")
+            with open(temporary, "w") as f:
+                json.dump(index, f, separators=(",", ":"))
+            os.replace(temporary, self.index_path)
+        except OSError:
+            # A read-only library still works; it just gets rescanned next time.
+            pass
+
+    def scan(self, budget=None):
+        """Bring the index up to date; returns True once a full pass has finished.
+
+        With ``budget`` (seconds) the pass may stop early and return False;
+        call again to continue it.
+        """
+        deadline = None if budget is None else time.perf_counter() + budget
+        if self.walk is None:
+            self.walk = self.walk_files()
+            self.seen = set()
+        for _ in self.walk:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+        self.walk = None
+        removed = self.entries_by_path.keys() - self.seen
+        for key in removed:
+            del self.entries_by_path[key]
+        if removed:
+            self.dirty = True
+        if self.dirty:
+            self.save_index()
+            self.dirty = False
+            self.by_category = None
+        return True
+
+    def walk_files(self):
+        """Generator that indexes one file per step."""
+        if not self.root.is_dir():
+            return
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as scanned:
+                    children = sorted(scanned, key=lambda child: child.name)
+            except OSError:
+                continue
+            names = {child.name for child in children}
+            for child in children:
+                if child.name.startswith("."):
+                    continue
+                if child.is_dir():
+                    pending.append(child.path)
+                elif child.name.endswith(ROM_SUFFIX):
+                    notes_name = child.name[:-len(ROM_SUFFIX)] + NOTES_SUFFIX
+                    self.index_file(child, os.path.join(directory, notes_name) if notes_name in names else None)
+                    yield
+
+    def index_file(self, child, notes_path):
+        key = Path(child.path).relative_to(self.root).as_posix()
+        self.seen.add(key)
+        try:
+            stat = child.stat()
+            notes_mtime = os.stat(notes_path).st_mtime_ns if notes_path else None
+        except OSError:
+            return
+        entry = self.entries_by_path.get(key)
+        if (entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["notes_mtime_ns"] == notes_mtime):
+            return
+        try:
+            contents = Path(child.path).read_bytes()
+            notes = read_notes(Path(notes_path)) if notes_path else ""
+        except OSError:
+            return
+        relative = Path(key)
+        self.entries_by_path[key] = {
+            "category": categorize_rom(relative),
+            "name": relative.stem.replace("_", " ").title(),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha1": hashlib.sha1(contents).hexdigest(),
+            "notes_mtime_ns": notes_mtime,
+            "notes": notes,
+        }
+        self.dirty = True
+        self.by_category = None
+
+    def grouped(self):
+        if self.by_category is None:
+            grouped = {}
+            for key, entry in self.entries_by_path.items():
+                grouped.setdefault(entry["category"], []).append((entry["name"], str(self.root / key)))
+            for values in grouped.values():
+                values.sort(key=lambda item: item[0].lower())
+            self.by_category = grouped
+        return self.by_category
+
+    def categories(self):
+        return sorted_categories(list(self.grouped()))
+
+    def entries(self, category):
+        """``(display name, path)`` pairs in one category, sorted by name."""
+        return self.grouped().get(category, [])
+
+    def lookup(self, path):
+        """The index entry for a ROM path, or None if it is not in the library."""
+        try:
+            key = Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+        except (OSError, ValueError):
+            return None
+        return self.entries_by_path.get(key)
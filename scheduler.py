@@ -0,0 +1,106 @@
+import time
+
+FRAME_RATE = 60
+MAX_CATCH_UP_FRAMES = 6
+
+
+class FrameScheduler:
+    """Runs the CPU in fixed 60 Hz frames and presents at most once per frame.
+
+    Each frame runs ``clock_hz / 60`` cycles through ``Chip8.run_frame``, so
+    emulated speed no longer depends on how often the host timer fires. When
+    the host falls behind, the missed frames are run back to back but only the
+    last one is presented. After a long stall (a modal dialog, a dragged
+    window) at most ``max_catch_up_frames`` are replayed and the rest are
+    dropped instead of fast-forwarding the game.
+
+    ``speed`` scales emulated time against the host clock: at 2.0 every host
+    frame runs two emulated frames, at 0.5 every other host frame runs one.
+    With ``uncapped`` set, a tick runs emulated frames back to back for one
+    host frame's worth of wall time and then presents, so the core goes as
+    fast as the host allows while the UI still refreshes. Either way the
+    timers still count down once per emulated frame, so the game sees
+    exactly the same machine as at normal speed.
+    """
+
+    def __init__(self, chip8, present, frame_rate=FRAME_RATE, max_catch_up_frames=MAX_CATCH_UP_FRAMES, on_frame=None):
+        self.chip8 = chip8
+        self.present = present
+        self.on_frame = on_frame
+        self.frame_seconds = 1.0 / frame_rate
+        self.max_catch_up_frames = max_catch_up_frames
+        self.speed = 1.0
+        self.uncapped = False
+        self.frame_credit = 0.0
+        self.next_frame = time.perf_counter()
+        self.frames_run = 0
+        self.frames_presented = 0
+        self.frames_skipped = 0
+        self.frames_dropped = 0
+
+    def restart(self):
+        self.next_frame = time.perf_counter()
+        self.frame_credit = 0.0
+
+    def set_speed(self, speed):
+        if speed <= 0:
+            raise ValueError("Speed must be positive")
+        self.speed = speed
+        self.frame_credit = 0.0
+
+    def set_uncapped(self, uncapped):
+        if uncapped == self.uncapped:
+            return
+        self.uncapped = uncapped
+        # Going back to real time must not replay the uncapped stretch as catch-up frames.
+        self.restart()
+
+    def tick(self, now=None):
+        """Run every frame that is due and return the seconds until the next one."""
+        if now is None:
+            now = time.perf_counter()
+        if self.uncapped:
+            return self.tick_uncapped(now)
+        if now < self.next_frame:
+            return self.next_frame - now
+        due = int((now - self.next_frame) / self.frame_seconds) + 1
+        if due > self.max_catch_up_frames:
+            self.frames_dropped += due - self.max_catch_up_frames
+            due = self.max_catch_up_frames
+            self.next_frame = now - (due - 1) * self.frame_seconds
+        self.next_frame += due * self.frame_seconds
+        if self.speed != 1.0:
+            self.frame_credit += due * self.speed
+            due = int(self.frame_credit)
+            self.frame_credit -= due
+        self.run_frames(due)
+        return max(0.0, self.next_frame - time.perf_counter())
+
+    def tick_uncapped(self, now):
+        deadline = now + self.frame_seconds
+        frames = 0
+        while True:
+            self.run_frames(1, present=False)
+            frames += 1
+            if time.perf_counter() >= deadline or self.chip8.is_waiting_for_input():
+                break
+        self.present_if_changed(frames)
+        self.next_frame = time.perf_counter()
+        return 0.0
+
+    def run_frames(self, count, present=True):
+        if not count:
+            return
+        for _ in range(count):
+            self.chip8.run_frame()
+            if self.on_frame:
+                self.on_frame()
+        self.frames_run += count
+        if present:
+            self.present_if_changed(count)
+
+    def present_if_changed(self, count):
+        if self.chip8.consume_display_changed():
+            self.present()
+            self.frames_presented += 1
+            self.frames_skipped += count - 1
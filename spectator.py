@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import os
+import socket
+import stat
+import struct
+import sys
+import threading
+import zlib
+from array import array
+
+from chip8emulator import DISPLAY_WIDTH, visible_rows
+
+DEFAULT_PORT = 8064
+SPECTATOR_MAGIC = b"C8SP"
+SPECTATOR_VERSION = 1
+# magic, version, flags
+HELLO = struct.Struct("!4sBB")
+HELLO_INPUT = 0x01
+# kind, emulated frame number, width, height, payload length
+FRAME = struct.Struct("!BIHHI")
+KEYFRAME = 0
+DELTA = 1
+# A keyframe payload is the zlib-compressed display words; a delta payload is
+# zlib-compressed (word index, XOR mask) pairs for the words that changed.
+DELTA_WORD = struct.Struct("!HQ")
+# key index, pressed
+KEY_EVENT = struct.Struct("!BB")
+# Bytes a client may have waiting in its socket buffer before frames to it are dropped.
+CLIENT_BUFFER_BYTES = 64 * 1024
+
+
+def parse_address(text):
+    """``unix:PATH``, ``HOST:PORT`` or a bare port (on localhost) to ``(host, port)`` or ``("unix", path)``."""
+    if text.startswith("unix:"):
+        return "unix", text[5:]
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def remove_stale_socket(path):
+    """Delete a unix socket file left behind by a server that is no longer running."""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except OSError:
+        return
+    probe = socket.socket(socket.AF_UNIX)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    except OSError:
+        pass
+    finally:
+        probe.close()
+
+
+def word_bytes(words):
+    data = array("Q", words)
+    if sys.byteorder == "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def bytes_words(data):
+    words = array("Q", data)
+    if sys.byteorder == "little":
+        words.byteswap()
+    return words
+
+
+def frame_message(kind, frame, width, height, payload):
+    return FRAME.pack(kind, frame, width, height, len(payload)) + payload
+
+
+class Spectator:
+    def __init__(self, writer):
+        self.writer = writer
+        self.needs_keyframe = True
+        self.catching_up = False
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        writer.transport.set_write_buffer_limits(high=CLIENT_BUFFER_BYTES)
+
+    def backed_up(self):
+        return self.catching_up or self.writer.transport.get_write_buffer_size() > CLIENT_BUFFER_BYTES
+
+
+class SpectatorServer:
+    """Streams the display of a running session to any number of local clients.
+
+    ``on_frame`` is called on the emulation thread after every frame and only
+    copies the visible display words into a one-frame mailbox; an asyncio
+    loop on its own thread picks up the newest one, so frames the loop has
+    not reached yet are coalesced, never queued. Each published frame is
+    turned into one compressed delta, the words that changed since the
+    last published frame, which is shared by every client, so the work per
+    frame follows the number of changed pixels rather than the number of
+    clients. A client only gets a full keyframe when it connects, when the
+    display mode changes, or after it fell behind: a client whose socket
+    buffer is over CLIENT_BUFFER_BYTES has its frames dropped until the
+    buffer drains, and is then sent the newest frame as a keyframe.
+
+    With ``on_key``, clients may send key events; they are passed on from
+    the loop thread as ``on_key(key_index, pressed)``.
+    """
+
+    def __init__(self, address, on_key=None):
+        self.address = address
+        self.on_key = on_key
+        self.clients = set()
+        self.mailbox_lock = threading.Lock()
+        self.mailbox = None
+        self.publish_pending = False
+        self.frame = 0
+        self.last = None
+        self.published = None
+        self.keyframe = None
+        self.frames_published = 0
+        self.bytes_published = 0
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        started = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self.serve, args=(started,), name="chip8-spectator", daemon=True)
+        self.thread.start()
+        started.wait()
+        if self.error is not None:
+            raise self.error
+
+    def serve(self, started):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(self.listen())
+        except OSError as exc:
+            self.error = exc
+            started.set()
+            self.loop.close()
+            return
+        started.set()
+        self.loop.run_forever()
+        self.server.close()
+        for client in list(self.clients):
+            client.writer.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+        if self.address[0] == "unix":
+            try:
+                os.unlink(self.address[1])
+            except OSError:
+                pass
+
+    async def listen(self):
+        if self.address[0] == "unix":
+            remove_stale_socket(self.address[1])
+            return await asyncio.start_unix_server(self.handle_client, self.address[1])
+        host, port = self.address
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    @property
+    def port(self):
+        """The TCP port actually bound, useful when listening on port 0."""
+        return self.server.sockets[0].getsockname()[1]
+
+    def on_frame(self, chip8):
+        frame = self.frame
+        self.frame += 1
+        width = chip8.display_width
+        height = chip8.display_height
+        words = chip8.display_rows[:height * chip8.row_words]
+        if self.last is not None and self.last == (words, width, height):
+            return
+        self.last = (words, width, height)
+        with self.mailbox_lock:
+            self.mailbox = (frame, words, width, height)
+            # With nobody watching, the mailbox just keeps the newest frame for the first client.
+            if self.publish_pending or not self.clients:
+                return
+            self.publish_pending = True
+        self.loop.call_soon_threadsafe(self.publish)
+
+    def publish(self):
+        with self.mailbox_lock:
+            frame, words, width, height = self.mailbox
+            self.publish_pending = False
+        previous = self.published
+        if previous is not None and previous[0] == frame:
+            return
+        self.published = (frame, words, width, height)
+        self.keyframe = None
+        if previous is None or previous[2:] != (width, height):
+            for client in self.clients:
+                client.needs_keyframe = True
+            delta = None
+        else:
+            changes = b"".join(
+                DELTA_WORD.pack(index, old ^ new) for index, (old, new) in enumerate(zip(previous[1], words)) if old != new
+            )
+            delta = frame_message(DELTA, frame, width, height, zlib.compress(changes))
+        self.frames_published += 1
+        for client in self.clients:
+            if client.backed_up():
+                client.needs_keyframe = True
+                client.frames_dropped += 1
+                if not client.catching_up:
+                    client.catching_up = True
+                    self.loop.create_task(self.catch_up(client))
+                continue
+            message = self.keyframe_message() if client.needs_keyframe else delta
+            client.writer.write(message)
+            client.needs_keyframe = False
+            client.frames_sent += 1
+            self.bytes_published += len(message)
+
+    async def catch_up(self, client):
+        try:
+            await client.writer.drain()
+        except ConnectionError:
+            return
+        client.catching_up = False
+        if client in self.clients and client.needs_keyframe:
+            message = self.keyframe_message()
+            client.writer.write(message)
+            client.needs_keyframe = False
+            client.frames_sent += 1
+            self.bytes_published += len(message)
+
+    def keyframe_message(self):
+        """The current frame in full, encoded once however many clients need it."""
+        if self.keyframe is None:
+            frame, words, width, height = self.published
+            self.keyframe = frame_message(KEYFRAME, frame, width, height, zlib.compress(word_bytes(words)))
+        return self.keyframe
+
+    async def handle_client(self, reader, writer):
+        client = Spectator(writer)
+        writer.write(HELLO.pack(SPECTATOR_MAGIC, SPECTATOR_VERSION, HELLO_INPUT if self.on_key else 0))
+        self.clients.add(client)
+        if self.mailbox is not None:
+            # Catch up with frames that arrived while nobody was watching.
+            self.publish()
+        if client.needs_keyframe and self.published is not None:
+            writer.write(self.keyframe_message())
+            client.needs_keyframe = False
+            client.frames_sent += 1
+        held = set()
+        try:
+            while True:
+                event = await reader.readexactly(KEY_EVENT.size)
+                if self.on_key:
+                    key_index, pressed = KEY_EVENT.unpack(event)
+                    key_index &= 0xF
+                    (held.add if pressed else held.discard)(key_index)
+                    self.on_key(key_index, bool(pressed))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+            # A client that hangs up mid-press must not leave its keys held down.
+            for key_index in held:
+                self.on_key(key_index, False)
+
+    def report(self):
+        return {
+            "frames": self.frame,
+            "published": self.frames_published,
+            "bytes": self.bytes_published,
+            "clients": len(self.clients),
+        }
+
+    def close(self):
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+
+class SpectatorClient:
+    """Rebuilds the streamed display from a SpectatorServer's keyframes and deltas."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.input_allowed = False
+        self.frame = None
+        self.words = None
+        self.width = DISPLAY_WIDTH
+        self.height = 0
+        self.keyframes = 0
+        self.deltas = 0
+        self.bytes_received = 0
+
+    @classmethod
+    async def connect(cls, address):
+        if address[0] == "unix":
+            reader, writer = await asyncio.open_unix_connection(address[1])
+        else:
+            reader, writer = await asyncio.open_connection(*address)
+        client = cls(reader, writer)
+        magic, version, flags = HELLO.unpack(await reader.readexactly(HELLO.size))
+        if magic != SPECTATOR_MAGIC or version != SPECTATOR_VERSION:
+            writer.close()
+            raise ValueError("Not a Chip-8 spectator server, or one running an incompatible version")
+        client.input_allowed = bool(flags & HELLO_INPUT)
+        return client
+
+    async def next_frame(self):
+        """Wait for the next frame; returns its emulated frame number, or None once the server hangs up."""
+        try:
+            header = await self.reader.readexactly(FRAME.size)
+            kind, frame, width, height, length = FRAME.unpack(header)
+            payload = zlib.decompress(await self.reader.readexactly(length))
+        except asyncio.IncompleteReadError:
+            return None
+        self.bytes_received += FRAME.size + length
+        if kind == KEYFRAME:
+            self.words = bytes_words(payload)
+            self.keyframes += 1
+        else:
+            words = self.words
+            for index, change in DELTA_WORD.iter_unpack(payload):
+                words[index] ^= change
+            self.deltas += 1
+        self.frame = frame
+        self.width = width
+        self.height = height
+        return frame
+
+    def rows(self):
+        return visible_rows(self.words, self.width, self.height)
+
+    def send_key(self, key_index, pressed):
+        self.writer.write(KEY_EVENT.pack(key_index, 1 if pressed else 0))
+
+    def close(self):
+        self.writer.close()
+
+
+def render_text(rows, width):
+    return "\n".join(format(row, f"0{width}b").replace("0", " ").replace("1", "#") for row in rows)
+
+
+async def watch(args):
+    client = await SpectatorClient.connect(parse_address(args.address))
+    received = 0
+    try:
+        while args.frames is None or received < args.frames:
+            frame = await client.next_frame()
+            if frame is None:
+                break
+            received += 1
+            if args.show:
+                print(f"\x1b[H\x1b[2J{render_text(client.rows(), client.width)}\nframe {frame}", flush=True)
+    finally:
+        client.close()
+    if args.png and client.words is not None:
+        from imaging import encode_png
+        with open(args.png, "wb") as f:
+            f.write(encode_png(client.rows(), client.width))
+    print(f"{received} frames ({client.keyframes} keyframes, {client.deltas} deltas), {client.bytes_received} bytes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a session streamed by main.py --spectate.")
+    parser.add_argument("address", nargs="?", default=str(DEFAULT_PORT), help=f"HOST:PORT, a port on localhost, or unix:PATH (default {DEFAULT_PORT})")
+    parser.add_argument("--frames", type=int, help="stop after this many frames")
+    parser.add_argument("--show", action="store_true", help="draw each frame in the terminal")
+    parser.add_argument("--png", metavar="PATH", help="save the last frame received as a PNG")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(watch(args))
+    except (OSError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+import analyzer
+from analyzer import load_analysis, load_quirk_overrides, save_quirk_override
+
+
+def test_data_paths_do_not_depend_on_the_working_directory():
+    roms = Path(analyzer.__file__).resolve().parent / "ROMs"
+    assert analyzer.ANALYSIS_CACHE_DIR == roms / ".analysis"
+    assert analyzer.QUIRK_OVERRIDES_PATH == roms / "quirks.json"
+
+
+def test_saving_an_override_replaces_the_cached_file(tmp_path):
+    path = tmp_path / "quirks.json"
+    assert load_quirk_overrides(path) == {}
+    save_quirk_override(b"\x12\x00", "vip", "loop.ch8", path)
+    first = load_quirk_overrides(path)
+    assert load_quirk_overrides(path) is first
+    save_quirk_override(b"\x12\x00", "schip", "loop.ch8", path)
+    assert list(load_quirk_overrides(path).values()) == [{"profile": "schip", "rom": "loop.ch8"}]
+    assert first != load_quirk_overrides(path)
+
+
+def test_analysis_cache_is_written_whole_and_reused(tmp_path):
+    rom = bytes([0x60, 0x01, 0x12, 0x02])
+    analysis = load_analysis(rom, tmp_path)
+    assert [path.name for path in tmp_path.iterdir()] == [f"{analysis['sha1']}.json"]
+    assert load_analysis(rom, tmp_path) == analysis
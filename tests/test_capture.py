@@ -0,0 +1,26 @@
+import pytest
+
+from capture import FrameCapture, RawWriter, read_raw
+from chip8emulator import Chip8
+
+
+def test_a_failing_writer_still_closes_its_file(tmp_path):
+    writer = RawWriter(tmp_path / "out.c8v")
+
+    def fail(frame, rows, width, height):
+        raise OSError("disk full")
+
+    writer.write = fail
+    capture = FrameCapture(writer, realtime=False)
+    capture.on_frame(Chip8(seed=0))
+    with pytest.raises(OSError):
+        capture.close()
+    assert writer.file.closed
+
+
+def test_raw_stream_round_trip(tmp_path):
+    path = tmp_path / "out.c8v"
+    writer = RawWriter(path, frame_rate=30)
+    writer.write(3, [0b1010, 0b0101], 4, 2)
+    writer.close(4)
+    assert read_raw(path) == (30, [(3, [0b1010, 0b0101], 4, 2)])
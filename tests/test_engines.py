@@ -0,0 +1,27 @@
+from pathlib import Path
+
+import pytest
+
+from chip8emulator import Chip8
+
+ROMS_DIR = Path(__file__).resolve().parent.parent / "ROMs"
+FRAMES = 300
+# Frames each key is held for; the keys are pressed in turn so ROMs waiting for input get going.
+KEY_HOLD_FRAMES = 12
+
+
+@pytest.mark.parametrize("rom", sorted(ROMS_DIR.rglob("*.ch8")), ids=lambda rom: rom.relative_to(ROMS_DIR).as_posix())
+def test_recompiler_runs_in_lockstep_with_the_interpreter(rom):
+    engines = [Chip8(engine=engine, seed=0) for engine in ("interpreter", "recompiler")]
+    for cpu in engines:
+        cpu.clock_hz = 2000
+        cpu.load_rom_from_path(rom)
+    for frame in range(FRAMES):
+        if frame % KEY_HOLD_FRAMES == 0:
+            key = frame // KEY_HOLD_FRAMES % 16
+            for cpu in engines:
+                cpu.set_key_state((key - 1) % 16, False)
+                cpu.set_key_state(key, True)
+        for cpu in engines:
+            cpu.run_frame()
+        assert engines[0].save_state() == engines[1].save_state(), f"engines diverge in frame {frame}"
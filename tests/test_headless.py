@@ -0,0 +1,22 @@
+from headless import find_roms, parse_args, run_rom
+
+
+def run(tmp_path, program, *args):
+    rom = tmp_path / "program.ch8"
+    rom.write_bytes(bytes(program))
+    options = vars(parse_args([str(rom), "--output", str(tmp_path), *args]))
+    return run_rom((rom, "program", options))
+
+
+def test_exit_stops_a_cycle_limited_run(tmp_path):
+    result = run(tmp_path, [0x00, 0xFD], "--cycles", "1000")
+    assert result["exited"]
+    assert "error" not in result
+
+
+def test_roms_with_the_same_name_get_their_own_outputs(tmp_path):
+    for folder in ("", "games/"):
+        (tmp_path / folder).mkdir(exist_ok=True)
+        (tmp_path / f"{folder}Coin Flipping.ch8").write_bytes(bytes([0x00, 0xFD]))
+    names = [name for _, name in find_roms([tmp_path, tmp_path / "Coin Flipping.ch8"])]
+    assert names == ["Coin Flipping", "games/Coin Flipping", "Coin Flipping (2)"]
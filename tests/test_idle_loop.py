@@ -0,0 +1,12 @@
+def test_one_tick_steps_through_a_self_jump(boot):
+    cpu = boot([0x12, 0x00])
+    for _ in range(5):
+        cpu.one_tick()
+    assert cpu.PC == 0x200
+
+
+def test_idle_self_jump_is_skipped_and_reported(boot):
+    cpu = boot([0x12, 0x00])
+    cpu.run_frame()
+    assert cpu.idle
+    assert cpu.is_waiting_for_input()
@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+from chip8emulator import Chip8
+from inputtrace import InputRecorder, InputTrace, replay
+
+ROM = Path(__file__).resolve().parent.parent / "ROMs" / "games" / "Brix [Andreas Gustafsson, 1990].ch8"
+
+
+def record_session(frames=400):
+    cpu = Chip8(engine="interpreter", seed=11, quirks="modern")
+    cpu.load_rom_from_path(ROM)
+    recorder = InputRecorder()
+    recorder.start(cpu)
+    for frame in range(frames):
+        if frame % 15 == 0:
+            # Keys arrive between frames, the way the GUI queues them.
+            cpu.queue_key_event(4 if frame % 30 else 6, True)
+            cpu.queue_key_event(6 if frame % 30 else 4, False)
+        cpu.run_frame()
+    return cpu, recorder.stop()
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "recompiler"])
+def test_replay_reproduces_a_recorded_session(engine):
+    cpu, trace = record_session()
+    assert trace.events
+    loaded = InputTrace.from_bytes(trace.to_bytes())
+    assert loaded.events == trace.events
+    replayed = replay(loaded, engine=engine)
+    assert replayed.cycle_count == cpu.cycle_count
+    assert replayed.save_state() == cpu.save_state()
+
+
+def test_replay_without_the_keys_ends_elsewhere():
+    cpu, trace = record_session()
+    trace.events = []
+    assert replay(trace).save_state() != cpu.save_state()
@@ -0,0 +1,69 @@
+import pytest
+
+# What each platform does, written out rather than read back from QUIRK_PROFILES.
+EXPECTED = {
+    "vip": {"shift": 0x03, "load_store_I": 0x302, "jump_PC": 0x220, "vf_reset": 0, "fx1e_VF": 0, "wraps": False},
+    "chip48": {"shift": 0x00, "load_store_I": 0x301, "jump_PC": 0x230, "vf_reset": 1, "fx1e_VF": 0, "wraps": False},
+    "schip": {"shift": 0x00, "load_store_I": 0x300, "jump_PC": 0x230, "vf_reset": 1, "fx1e_VF": 0, "wraps": False},
+    "modern": {"shift": 0x00, "load_store_I": 0x300, "jump_PC": 0x220, "vf_reset": 1, "fx1e_VF": 1, "wraps": True},
+}
+
+
+def run(boot, quirks, program):
+    cpu = boot(program, quirks=quirks)
+    for _ in range(len(program) // 2):
+        cpu.one_tick()
+    return cpu
+
+
+@pytest.mark.parametrize("quirks", EXPECTED)
+def test_shift_source(boot, quirks):
+    # V0 = 1, V1 = 6; 8016 shifts V1 into V0 on the VIP and V0 itself elsewhere.
+    cpu = run(boot, quirks, [0x60, 0x01, 0x61, 0x06, 0x80, 0x16])
+    assert cpu.V[0] == EXPECTED[quirks]["shift"]
+
+
+@pytest.mark.parametrize("quirks", EXPECTED)
+def test_load_store_moves_i(boot, quirks):
+    cpu = run(boot, quirks, [0xA3, 0x00, 0xF1, 0x55])
+    assert cpu.I == EXPECTED[quirks]["load_store_I"]
+
+
+@pytest.mark.parametrize("quirks", EXPECTED)
+def test_jump_register(boot, quirks):
+    # V0 = 0x10, V2 = 0x20, then B210: BNNN adds V0, BXNN adds V2.
+    cpu = run(boot, quirks, [0x60, 0x10, 0x62, 0x20, 0xB2, 0x10])
+    assert cpu.PC == EXPECTED[quirks]["jump_PC"]
+
+
+@pytest.mark.parametrize("quirks", EXPECTED)
+def test_logic_ops_reset_vf(boot, quirks):
+    cpu = run(boot, quirks, [0x6F, 0x01, 0x80, 0x11])
+    assert cpu.V[0xF] == EXPECTED[quirks]["vf_reset"]
+
+
+@pytest.mark.parametrize("quirks", EXPECTED)
+def test_fx1e_overflow_flag(boot, quirks):
+    cpu = run(boot, quirks, [0xAF, 0xFF, 0x60, 0x02, 0xF0, 0x1E])
+    assert cpu.I == 0x001
+    assert cpu.V[0xF] == EXPECTED[quirks]["fx1e_VF"]
+
+
+@pytest.mark.parametrize("quirks", EXPECTED)
+def test_sprites_wrap_or_clip_at_the_right_edge(boot, quirks):
+    # The top row of the 0 glyph (1111) drawn at x = 62 covers columns 62, 63 and, wrapped, 0 and 1.
+    cpu = run(boot, quirks, [0x60, 0x3E, 0x61, 0x00, 0xA0, 0x00, 0xD0, 0x11])
+    assert cpu.get_pixel(63, 0) == 1
+    assert cpu.get_pixel(0, 0) == EXPECTED[quirks]["wraps"]
+
+
+def test_switching_profiles_redecodes_cached_instructions(boot):
+    cpu = boot([0x60, 0x01, 0x61, 0x06, 0x80, 0x16, 0x12, 0x00], quirks="modern")
+    for _ in range(3):
+        cpu.one_tick()
+    assert cpu.V[0] == 0x00
+    cpu.use_quirks("vip")
+    cpu.PC = 0x200
+    for _ in range(3):
+        cpu.one_tick()
+    assert cpu.V[0] == 0x03
@@ -0,0 +1,13 @@
+import json
+
+from romlibrary import RomLibrary
+
+
+def test_an_index_that_is_not_an_object_is_rescanned(tmp_path):
+    (tmp_path / "Pong.ch8").write_bytes(bytes([0x12, 0x00]))
+    index_path = tmp_path / ".index.json"
+    index_path.write_text(json.dumps(["not", "an", "index"]))
+    library = RomLibrary(tmp_path)
+    assert library.scan()
+    assert list(library.entries_by_path) == ["Pong.ch8"]
+    assert json.loads(index_path.read_text())["roms"].keys() == {"Pong.ch8"}
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import pytest
+
+from chip8emulator import Chip8
+
+ROM = Path(__file__).resolve().parent.parent / "ROMs" / "games" / "Brix [Andreas Gustafsson, 1990].ch8"
+
+
+def play(cpu, frames, key=4):
+    for frame in range(frames):
+        cpu.set_key_state(key, frame % 20 < 10)
+        cpu.run_frame()
+
+
+def test_loading_a_save_state_resumes_the_same_session():
+    cpu = Chip8(engine="interpreter", seed=7)
+    cpu.load_rom_from_path(ROM)
+    play(cpu, 120)
+    saved = cpu.save_state()
+    play(cpu, 90)
+    expected = cpu.save_state()
+
+    cpu.load_state(saved)
+    assert cpu.save_state() == saved
+    play(cpu, 90)
+    assert cpu.save_state() == expected
+
+    # A fresh machine with only the ROM loaded picks the session up the same way.
+    other = Chip8(engine="interpreter", seed=7)
+    other.load_rom_from_path(ROM)
+    other.load_state(saved)
+    play(other, 90)
+    assert other.save_state() == expected
+
+
+def test_a_truncated_save_state_is_rejected():
+    cpu = Chip8(seed=0)
+    with pytest.raises(ValueError):
+        cpu.load_state(cpu.save_state()[:-1])
+
+
+def test_a_loaded_state_draws_the_same_random_numbers(boot):
+    cpu = boot([0xC0, 0xFF, 0xC1, 0xFF, 0x12, 0x00])
+    cpu.one_tick()
+    saved = cpu.save_state()
+    cpu.one_tick()
+    expected = cpu.V[1]
+    cpu.one_tick()
+    cpu.one_tick()
+    cpu.load_state(saved)
+    cpu.one_tick()
+    assert cpu.V[1] == expected
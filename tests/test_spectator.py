@@ -0,0 +1,18 @@
+import socket
+
+from spectator import SpectatorServer
+
+
+def test_unix_socket_is_removed_on_close_and_stale_ones_replaced(tmp_path):
+    path = tmp_path / "spectate.sock"
+    server = SpectatorServer(("unix", str(path)))
+    assert path.exists()
+    server.close()
+    assert not path.exists()
+    # A socket file whose server died without cleaning up.
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(str(path))
+    stale.close()
+    server = SpectatorServer(("unix", str(path)))
+    server.close()
+    assert not path.exists()
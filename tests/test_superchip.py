@@ -0,0 +1,26 @@
+def test_fx29_only_uses_the_low_nibble(boot):
+    # Clock Program asks for the glyph of 16; the VIP hands back the one for 0 rather than big-font bytes.
+    cpu = boot([0x66, 0x10, 0xF6, 0x29])
+    cpu.one_tick()
+    cpu.one_tick()
+    assert cpu.I == 0
+
+
+def test_fx75_counts_as_progress_in_a_loop(boot):
+    # Counts in V0 through the RPL flags; V0 is reset each pass, so only FX75 tells the passes apart.
+    cpu = boot([0xF0, 0x85, 0x70, 0x01, 0xF0, 0x75, 0x60, 0x00, 0x12, 0x00])
+    cpu.clock_hz = 6000
+    for _ in range(10):
+        cpu.run_frame()
+    assert cpu.rpl_flags[0] == 200
+    assert not cpu.is_waiting_for_input()
+
+
+def test_lores_dxy0_follows_the_quirk_profile(boot):
+    # I points at the 0 glyph; DXY0 at the top left.
+    program = [0x60, 0x00, 0xF0, 0x29, 0xD0, 0x00]
+    for quirks, drawn in (("vip", False), ("chip48", False), ("schip", True), ("modern", True)):
+        cpu = boot(program, quirks=quirks)
+        for _ in range(3):
+            cpu.one_tick()
+        assert any(cpu.frame_rows()) == drawn, quirks
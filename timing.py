@@ -0,0 +1,48 @@
+from array import array
+
+# The VIP's CDP1802 runs at 1.7609 MHz and takes 8 clocks per machine cycle, which is
+# about 3668 machine cycles per 60 Hz frame. The display interrupt and the DMA that
+# fetches 128 scanlines of 8 bytes take roughly 1100 of them, leaving the rest for
+# the CHIP-8 interpreter.
+VIP_CYCLES_PER_FRAME = 3668
+VIP_DISPLAY_CYCLES_PER_FRAME = 1100
+VIP_INTERPRETER_CYCLES_PER_FRAME = VIP_CYCLES_PER_FRAME - VIP_DISPLAY_CYCLES_PER_FRAME
+# Every instruction pays for the interpreter's fetch and dispatch before its own work.
+VIP_FETCH_CYCLES = 40
+VIP_SPRITE_ROW_CYCLES = 68
+
+# Approximate machine cycles each instruction spends past fetch and dispatch. They are
+# averages: the real interpreter's costs also vary a little with the operands (skips
+# taken or not, sprite alignment, BCD digits), which a per-instruction table ignores.
+VIP_SYSTEM_CYCLES = {0x00E0: 3078, 0x00EE: 10}
+VIP_FAMILY_CYCLES = {
+    0x1000: 12, 0x2000: 26, 0x3000: 10, 0x4000: 10, 0x5000: 14, 0x6000: 6, 0x7000: 10,
+    0x8000: 44, 0x9000: 14, 0xA000: 12, 0xB000: 22, 0xC000: 36, 0xD000: 34, 0xE000: 14,
+}
+VIP_MISC_CYCLES = {0x07: 10, 0x0A: 19, 0x15: 10, 0x18: 10, 0x1E: 16, 0x29: 16, 0x33: 84}
+VIP_REGISTER_CYCLES = 14
+
+
+def vip_cycle_cost(instruction):
+    """Approximate COSMAC VIP machine cycles for one instruction, fetch included.
+
+    Opcodes the VIP interpreter never had (the SUPER-CHIP and XO-CHIP
+    additions) cost only the fetch and dispatch.
+    """
+    family = instruction & 0xF000
+    if family == 0x0000:
+        work = VIP_SYSTEM_CYCLES.get(instruction, 0)
+    elif family == 0xD000:
+        work = VIP_FAMILY_CYCLES[family] + VIP_SPRITE_ROW_CYCLES * (instruction & 0xF)
+    elif family == 0xF000:
+        NN = instruction & 0xFF
+        if NN in (0x55, 0x65):
+            work = VIP_REGISTER_CYCLES * (((instruction >> 8) & 0xF) + 1)
+        else:
+            work = VIP_MISC_CYCLES.get(NN, 0)
+    else:
+        work = VIP_FAMILY_CYCLES[family]
+    return VIP_FETCH_CYCLES + work
+
+
+VIP_CYCLE_COSTS = array("H", map(vip_cycle_cost, range(0x10000)))